@@ -0,0 +1,170 @@
+"""
+OpenAI-compatible stand-in for the Gemini endpoint, for benchmarking.
+
+Serves /embeddings, /chat/completions (plain and streaming) and /models with
+configurable latency and token rate, so the backend can be load-tested
+without spending API quota. Embeddings are deterministic hashed
+bag-of-words vectors: texts sharing terms get similar vectors, which keeps
+retrieval against a corpus embedded the same way meaningful.
+
+Usage:
+    python benchmarks/fake_gemini.py --port 8100 --chat-latency-ms 300 --tokens-per-second 80
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.lexical_index import tokenize
+
+EMBEDDING_DIM = 768
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Returns a unit-length feature-hashed bag-of-words vector for text."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokenize(text):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def create_app(
+    embed_latency_ms: float = 20.0,
+    chat_latency_ms: float = 300.0,
+    tokens_per_second: float = 100.0,
+    response_tokens: int = 120,
+) -> FastAPI:
+    """
+    Builds the fake service.
+
+    Args:
+        embed_latency_ms: Fixed delay per embeddings call.
+        chat_latency_ms: Delay before the first generated token.
+        tokens_per_second: Generation rate after the first token.
+        response_tokens: Number of words in every generated answer.
+    """
+    app = FastAPI(title="Fake Gemini (OpenAI-compatible)")
+    token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+    words = ["robot"] + ["lorem", "ipsum", "actuator", "sensor", "policy", "torque"] * response_tokens
+    answer_tokens = [word + " " for word in words[:response_tokens]]
+
+    @app.get("/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "models/gemini-2.5-flash", "object": "model", "owned_by": "fake"}]}
+
+    @app.get("/models/{model_id:path}")
+    async def retrieve_model(model_id: str):
+        return {"id": model_id, "object": "model", "created": 0, "owned_by": "fake"}
+
+    @app.post("/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(embed_latency_ms / 1000.0)
+        return {
+            "object": "list",
+            "model": body.get("model", ""),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text).tolist()}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(answer_tokens),
+            "total_tokens": prompt_chars // 4 + len(answer_tokens),
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(chat_latency_ms / 1000.0 + token_delay * len(answer_tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(answer_tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        async def stream():
+            await asyncio.sleep(chat_latency_ms / 1000.0)
+            for i, token in enumerate(answer_tokens):
+                if i:
+                    await asyncio.sleep(token_delay)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake Gemini server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    args = parser.parse_args()
+
+    app = create_app(
+        embed_latency_ms=args.embed_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Recall-versus-latency report for Qdrant quantization and HNSW settings.
+
+Builds a clustered synthetic corpus (or the fake-embedded textbook corpus),
+computes exact top-k neighbours with numpy, loads the points into one
+collection per quantization mode, and measures recall@k and per-query
+latency across search settings (hnsw_ef, rescoring, oversampling), using
+the same SearchParams the backend sends.
+
+Without --url it runs against qdrant-client's in-memory mode. That mode
+accepts every config (so it validates collection creation and the search
+parameter plumbing) but always searches exactly, so recall is 1.0 and
+latency does not depend on the settings; point --url at a Qdrant server
+for representative numbers.
+
+    python benchmarks/quantization_report.py
+    python benchmarks/quantization_report.py --url http://localhost:6333 --points 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from typing import Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.qdrant_backend import QUANTIZATION_KINDS, collection_index_config, search_params
+from src.vector_db import SearchConfig
+
+COLLECTION_PREFIX = "quantization_report"
+INDEXING_TIMEOUT_SECONDS = 600
+
+
+def synthetic_corpus(points: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit vectors drawn around random cluster centres (embedding-like structure)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, points)] + 0.6 * rng.standard_normal((points, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def docs_corpus() -> np.ndarray:
+    from benchmarks.fake_gemini import fake_embedding
+    from benchmarks.run_benchmark import DOCS_PATH, build_corpus
+
+    vectors = np.stack([fake_embedding(chunk["text"]) for chunk in build_corpus(DOCS_PATH)]).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def vector_bytes(quantization: str, dim: int) -> int:
+    """Bytes per vector of the representation kept in RAM."""
+    return {"none": 4 * dim, "scalar": dim, "binary": (dim + 7) // 8}[quantization]
+
+
+def load_collection(client, name: str, vectors: np.ndarray, quantization: str, args) -> None:
+    from qdrant_client import models
+
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=vectors.shape[1], distance=models.Distance.COSINE),
+        **collection_index_config(quantization, hnsw_m=args.hnsw_m, hnsw_ef_construct=args.hnsw_ef_construct),
+    )
+    for start in range(0, vectors.shape[0], 512):
+        batch = vectors[start:start + 512]
+        client.upsert(
+            collection_name=name,
+            points=models.Batch(ids=list(range(start, start + batch.shape[0])), vectors=batch.tolist()),
+            wait=True,
+        )
+
+    # A server builds the HNSW graph (and quantized vectors) asynchronously
+    deadline = time.monotonic() + INDEXING_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if str(getattr(client.get_collection(name).status, "value", "green")) == "green":
+            return
+        time.sleep(1)
+    print(f"[WARN] Collection {name} still indexing; results may include unindexed segments.")
+
+
+def search_settings(quantization: str, args) -> List[SearchConfig]:
+    settings = [SearchConfig(hnsw_ef=ef) for ef in args.hnsw_ef]
+    if quantization != "none":
+        settings += [SearchConfig(hnsw_ef=args.hnsw_ef[-1], rescore=False)]
+        settings += [
+            SearchConfig(hnsw_ef=args.hnsw_ef[-1], rescore=True, oversampling=oversampling)
+            for oversampling in args.oversampling
+        ]
+    return settings
+
+
+def measure(client, name: str, queries: np.ndarray, truth: np.ndarray, config: SearchConfig, limit: int) -> Dict:
+    latencies, recalls = [], []
+    params = search_params(config)
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        points = client.query_points(
+            collection_name=name, query=query.tolist(), limit=limit, with_payload=False, search_params=params
+        ).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({point.id for point in points} & set(expected.tolist())) / limit)
+    return {
+        "hnsw_ef": config.hnsw_ef,
+        "rescore": config.rescore,
+        "oversampling": config.oversampling,
+        "recall": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall vs latency for Qdrant quantization and HNSW settings.")
+    parser.add_argument("--url", help="Qdrant server URL (default: qdrant-client in-memory mode)")
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_API_KEY"))
+    parser.add_argument("--source", choices=("synthetic", "docs"), default="synthetic")
+    parser.add_argument("--points", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--quantization", nargs="+", choices=QUANTIZATION_KINDS, default=list(QUANTIZATION_KINDS))
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construct", type=int, default=100)
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+
+def main():
+    from qdrant_client import QdrantClient
+
+    args = parse_args()
+    if args.source == "synthetic":
+        vectors = synthetic_corpus(args.points, args.dim, args.clusters, args.seed)
+    else:
+        vectors = docs_corpus()
+    rng = np.random.default_rng(args.seed + 1)
+    # Queries: perturbed corpus vectors, so each has a meaningful neighbourhood
+    queries = vectors[rng.integers(0, vectors.shape[0], args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    limit = min(args.limit, vectors.shape[0])
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :limit]
+
+    client = QdrantClient(url=args.url, api_key=args.api_key) if args.url else QdrantClient(":memory:")
+    if not args.url:
+        # Already stated in the banner below; don't repeat it per query
+        warnings.filterwarnings("ignore", message="Local mode performs exact")
+    mode = args.url or "in-memory (exact search; settings are validated, not exercised)"
+    print(f"[INFO] {vectors.shape[0]} points x {vectors.shape[1]} dims, {len(queries)} queries, target: {mode}")
+
+    report = {"target": args.url or ":memory:", "points": int(vectors.shape[0]), "dim": int(vectors.shape[1]),
+              "limit": limit, "hnsw_m": args.hnsw_m, "hnsw_ef_construct": args.hnsw_ef_construct, "results": []}
+    print(f"\n{'quantization':<13}{'bytes/vec':>10}{'hnsw_ef':>9}{'rescore':>9}{'oversmp':>9}"
+          f"{'recall@' + str(limit):>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for quantization in args.quantization:
+        name = f"{COLLECTION_PREFIX}_{quantization}"
+        load_collection(client, name, vectors, quantization, args)
+        for config in search_settings(quantization, args):
+            row = {"quantization": quantization, "vector_bytes": vector_bytes(quantization, vectors.shape[1]),
+                   **measure(client, name, queries, truth, config, limit)}
+            report["results"].append(row)
+            print(f"{quantization:<13}{row['vector_bytes']:>10}{row['hnsw_ef'] or 'default':>9}{str(row['rescore']):>9}"
+                  f"{row['oversampling'] or '-':>9}{row['recall']:>10.3f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}")
+        client.delete_collection(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[INFO] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
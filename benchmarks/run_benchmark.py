@@ -0,0 +1,488 @@
+"""
+Load-test harness for the RAG backend, running against local stand-ins.
+
+Starts the fake Gemini server (benchmarks/fake_gemini.py), seeds a vector
+index from the textbook docs with the same fake embeddings, starts main.py
+under uvicorn pointed at both, and drives the chat endpoints at a fixed
+concurrency. Reports p50/p95/p99 latency, throughput, and server CPU and
+memory per request, and writes everything to a JSON file so runs can be
+compared across commits.
+
+Usage:
+    python benchmarks/run_benchmark.py --concurrency 32 --requests 500
+    python benchmarks/run_benchmark.py --backend qdrant-local --endpoints query
+    python benchmarks/run_benchmark.py --compare benchmarks/results/baseline.json
+    python benchmarks/run_benchmark.py --env ANSWER_CACHE_ENABLED=false
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.fake_gemini import EMBEDDING_DIM, fake_embedding
+from src.chunk_store import publish_chunk_store
+from src.local_index import SnapshotWriter
+
+DOCS_PATH = os.path.join(PROJECT_ROOT, "docusaurus", "docs")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+COLLECTION_NAME = "benchmark_collection"
+CHUNK_CHARS = 1200
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+# --- Corpus and index seeding ---
+
+def build_corpus(docs_path: str, chunk_chars: int = CHUNK_CHARS) -> List[Dict]:
+    """Splits the markdown docs into paragraph-aligned chunks with payloads."""
+    chunks = []
+    for file_path in sorted(glob.glob(os.path.join(docs_path, "**", "*.md*"), recursive=True)):
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        rel_path = os.path.splitext(os.path.relpath(file_path, docs_path))[0]
+        heading = re.search(r"^#\s+(.+)$", content, re.MULTILINE)
+        title = heading.group(1).strip() if heading else os.path.basename(rel_path)
+
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", content):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) > chunk_chars:
+                chunks.append({"text": current, "title": title, "chapter_path": rel_path, "doc_id": rel_path})
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append({"text": current, "title": title, "chapter_path": rel_path, "doc_id": rel_path})
+
+    for number, chunk in enumerate(chunks):
+        chunk["chunk_number"] = number
+    return chunks
+
+
+def seed_local_index(base_dir: str, corpus: List[Dict]) -> None:
+    """Writes a local snapshot (VECTOR_BACKEND=local) for the corpus."""
+    writer = SnapshotWriter(base_dir, len(corpus), EMBEDDING_DIM)
+    vectors = np.stack([fake_embedding(chunk["text"]) for chunk in corpus])
+    writer.add(range(len(corpus)), vectors, corpus)
+    writer.commit({"source": "benchmark"})
+
+
+def seed_qdrant_local(path: str, corpus: List[Dict]) -> None:
+    """Writes an embedded Qdrant collection (QDRANT_PATH) for the corpus."""
+    from qdrant_client import QdrantClient, models
+
+    client = QdrantClient(path=path)
+    client.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config=models.VectorParams(size=EMBEDDING_DIM, distance=models.Distance.COSINE),
+    )
+    for start in range(0, len(corpus), 256):
+        batch = corpus[start:start + 256]
+        client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[
+                models.PointStruct(id=start + i, vector=fake_embedding(chunk["text"]).tolist(), payload=chunk)
+                for i, chunk in enumerate(batch)
+            ],
+        )
+    client.close()
+
+
+def build_queries(corpus: List[Dict], count: int, seed: int, words_per_query: int = 60) -> List[str]:
+    """
+    Derives questions from chunk text so most of them hit the index.
+
+    The fake embeddings are bag-of-words, so a query needs a sizeable share
+    of a chunk's terms to clear the relevance threshold.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(corpus, min(count, len(corpus))):
+        words = re.findall(r"[A-Za-z][A-Za-z0-9-]+", chunk["text"])
+        if len(words) > words_per_query:
+            start = rng.randrange(0, len(words) - words_per_query)
+            queries.append(f"What does the textbook say about {' '.join(words[start:start + words_per_query])}?")
+        elif words:
+            queries.append(f"What does the textbook say about {' '.join(words)}?")
+        else:
+            queries.append(f"Explain {chunk['title']}")
+    return queries
+
+
+# --- Process management ---
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, name: str) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup (code {process.returncode})")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{name} did not become ready at {url}")
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class ProcessSampler:
+    """Reads CPU time and RSS of a process from /proc (psutil if available)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss = 0
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self) -> float:
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the parenthesised command name; utime/stime are 14/15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._clock_ticks
+
+    def rss_bytes(self) -> int:
+        if self._process is not None:
+            rss = self._process.memory_info().rss
+        else:
+            rss = 0
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss = int(line.split()[1]) * 1024
+                        break
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    async def sample_peak(self, interval: float = 0.1) -> None:
+        while True:
+            self.rss_bytes()
+            await asyncio.sleep(interval)
+
+
+# --- Load generation ---
+
+async def run_query_request(client: httpx.AsyncClient, query: str) -> Dict:
+    start = time.perf_counter()
+    response = await client.post("/api/chat/query", json={"query": query, "chat_history": []})
+    elapsed = time.perf_counter() - start
+    return {"latency": elapsed, "ttft": None, "ok": response.status_code == 200, "status": response.status_code}
+
+
+async def run_stream_request(client: httpx.AsyncClient, query: str) -> Dict:
+    start = time.perf_counter()
+    ttft = None
+    ok = False
+    async with client.stream("POST", "/api/chat/stream", json={"query": query, "chat_history": []}) as response:
+        async for line in response.aiter_lines():
+            if ttft is None and line.startswith("event: token"):
+                ttft = time.perf_counter() - start
+            if line.startswith("event: done"):
+                ok = True
+            elif line.startswith("event: error"):
+                ok = False
+        status = response.status_code
+    return {"latency": time.perf_counter() - start, "ttft": ttft, "ok": ok and status == 200, "status": status}
+
+
+REQUEST_RUNNERS = {"query": run_query_request, "stream": run_stream_request}
+
+
+async def drive(base_url: str, endpoint: str, queries: List[str], total: int, concurrency: int, seed: int) -> List[Dict]:
+    """Closed-loop load: `concurrency` workers issue `total` requests."""
+    runner = REQUEST_RUNNERS[endpoint]
+    rng = random.Random(seed)
+    schedule = [rng.choice(queries) for _ in range(total)]
+    results: List[Dict] = []
+    next_index = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        async def worker():
+            nonlocal next_index
+            while next_index < len(schedule):
+                query = schedule[next_index]
+                next_index += 1
+                try:
+                    results.append(await runner(client, query))
+                except httpx.HTTPError as e:
+                    results.append({"latency": None, "ttft": None, "ok": False, "status": type(e).__name__})
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def summarize_latencies(values: List[float]) -> Dict:
+    if not values:
+        return {}
+    array = np.asarray(values) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(array, 50)), 2),
+        "p95_ms": round(float(np.percentile(array, 95)), 2),
+        "p99_ms": round(float(np.percentile(array, 99)), 2),
+        "mean_ms": round(float(array.mean()), 2),
+        "max_ms": round(float(array.max()), 2),
+    }
+
+
+async def benchmark_endpoint(base_url: str, endpoint: str, queries: List[str], args, sampler: ProcessSampler) -> Dict:
+    if args.warmup:
+        await drive(base_url, endpoint, queries, args.warmup, args.concurrency, args.seed + 1)
+
+    cpu_before = sampler.cpu_seconds()
+    rss_before = sampler.rss_bytes()
+    sampler.peak_rss = rss_before
+    peak_task = asyncio.create_task(sampler.sample_peak())
+    start = time.perf_counter()
+    try:
+        results = await drive(base_url, endpoint, queries, args.requests, args.concurrency, args.seed)
+    finally:
+        peak_task.cancel()
+    wall = time.perf_counter() - start
+    cpu_used = sampler.cpu_seconds() - cpu_before
+    rss_after = sampler.rss_bytes()
+
+    completed = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+
+    summary = {
+        "requests": len(results),
+        "succeeded": len(completed),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(completed) / wall, 2) if wall else 0.0,
+        "latency": summarize_latencies([r["latency"] for r in completed]),
+        "server": {
+            "cpu_seconds": round(cpu_used, 3),
+            "cpu_ms_per_request": round(cpu_used * 1000.0 / len(results), 3) if results else 0.0,
+            "rss_start_mb": round(rss_before / 2**20, 1),
+            "rss_end_mb": round(rss_after / 2**20, 1),
+            "rss_peak_mb": round(sampler.peak_rss / 2**20, 1),
+            "rss_growth_bytes_per_request": round((rss_after - rss_before) / len(results), 1) if results else 0.0,
+        },
+    }
+    ttfts = [r["ttft"] for r in completed if r["ttft"] is not None]
+    if ttfts:
+        summary["time_to_first_token"] = summarize_latencies(ttfts)
+    return summary
+
+
+# --- Reporting ---
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(report: Dict) -> None:
+    for endpoint, summary in report["results"].items():
+        latency = summary["latency"]
+        print(f"\n=== /api/chat/{endpoint} (concurrency {report['config']['concurrency']}) ===")
+        print(f"  requests: {summary['requests']}  ok: {summary['succeeded']}  errors: {summary['errors'] or 0}")
+        print(f"  throughput: {summary['rps']} req/s over {summary['wall_seconds']} s")
+        if latency:
+            print(f"  latency ms: p50 {latency['p50_ms']}  p95 {latency['p95_ms']}  p99 {latency['p99_ms']}  max {latency['max_ms']}")
+        if "time_to_first_token" in summary:
+            ttft = summary["time_to_first_token"]
+            print(f"  first token ms: p50 {ttft['p50_ms']}  p95 {ttft['p95_ms']}  p99 {ttft['p99_ms']}")
+        server = summary["server"]
+        print(f"  server cpu: {server['cpu_ms_per_request']} ms/request  rss peak: {server['rss_peak_mb']} MB")
+
+
+def compare_reports(baseline: Dict, current: Dict) -> None:
+    """Prints relative changes of the headline numbers against a baseline run."""
+    print(f"\n=== Comparison against {baseline.get('git_revision') or 'baseline'} ===")
+    for endpoint, summary in current["results"].items():
+        base = baseline.get("results", {}).get(endpoint)
+        if not base:
+            continue
+        rows = [("rps", base["rps"], summary["rps"])]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if key in base.get("latency", {}) and key in summary["latency"]:
+                rows.append((key, base["latency"][key], summary["latency"][key]))
+        rows.append(("cpu_ms_per_request", base["server"]["cpu_ms_per_request"], summary["server"]["cpu_ms_per_request"]))
+        print(f"  /api/chat/{endpoint}")
+        for name, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"    {name:<20} {old:>10} -> {new:<10} ({change})")
+
+
+# --- Main ---
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG backend against local stand-ins.")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(REQUEST_RUNNERS), default=["query", "stream"])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint")
+    parser.add_argument("--unique-queries", type=int, default=100, help="Distinct questions in the request mix")
+    parser.add_argument("--query-words", type=int, default=60, help="Chunk words copied into each query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=["local", "qdrant-local"], default="local")
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app (repeatable)")
+    parser.add_argument("--output", help="JSON result path (default: benchmarks/results/<time>-<rev>.json)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary index and logs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    processes = []
+
+    try:
+        print(f"[INFO] Building corpus from {DOCS_PATH}...")
+        corpus = build_corpus(DOCS_PATH)
+        queries = build_queries(corpus, args.unique_queries, args.seed, args.query_words)
+        print(f"[INFO] {len(corpus)} chunks, {len(queries)} distinct queries.")
+
+        app_env = {
+            **os.environ,
+            "GEMINI_API_KEY": "benchmark",
+            "PYTHONUNBUFFERED": "1",
+            # Keep artifacts of the app under test out of the real data/ directory
+            "RAG_INDEX_VERSION_PATH": os.path.join(workdir, "index_version"),
+        }
+        app_env.pop("EMBEDDING_CACHE_PATH", None)
+        if args.backend == "local":
+            index_dir = os.path.join(workdir, "local_index")
+            seed_local_index(index_dir, corpus)
+            app_env.update(VECTOR_BACKEND="local", LOCAL_INDEX_PATH=index_dir)
+        else:
+            qdrant_path = os.path.join(workdir, "qdrant")
+            seed_qdrant_local(qdrant_path, corpus)
+            # As ingestion does: payloads served from the chunk store (CHUNK_STORE_ENABLED=false to compare)
+            chunk_store_dir = os.path.join(workdir, "chunk_store")
+            publish_chunk_store(chunk_store_dir, enumerate(corpus), {"source": "benchmark"})
+            app_env.update(
+                VECTOR_BACKEND="qdrant",
+                QDRANT_PATH=qdrant_path,
+                QDRANT_COLLECTION_NAME=COLLECTION_NAME,
+                CHUNK_STORE_PATH=chunk_store_dir,
+            )
+        for item in args.env:
+            key, _, value = item.partition("=")
+            app_env[key] = value
+
+        fake_port = free_port()
+        fake_log = open(os.path.join(workdir, "fake_gemini.log"), "w")
+        processes.append(subprocess.Popen(
+            [
+                sys.executable, os.path.join(PROJECT_ROOT, "benchmarks", "fake_gemini.py"),
+                "--port", str(fake_port),
+                "--embed-latency-ms", str(args.embed_latency_ms),
+                "--chat-latency-ms", str(args.chat_latency_ms),
+                "--tokens-per-second", str(args.tokens_per_second),
+                "--response-tokens", str(args.response_tokens),
+            ],
+            stdout=fake_log, stderr=subprocess.STDOUT,
+        ))
+        wait_until_ready(f"http://127.0.0.1:{fake_port}/models", processes[-1], "fake Gemini")
+        app_env["GEMINI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/"
+
+        app_port = free_port()
+        app_log = open(os.path.join(workdir, "app.log"), "w")
+        app_process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=PROJECT_ROOT, env=app_env, stdout=app_log, stderr=subprocess.STDOUT,
+        )
+        processes.append(app_process)
+        base_url = f"http://127.0.0.1:{app_port}"
+        wait_until_ready(f"{base_url}/ping", app_process, "RAG backend")
+        print(f"[INFO] Backend ready at {base_url} (logs in {workdir}).")
+
+        sampler = ProcessSampler(app_process.pid)
+        results = {}
+        for endpoint in args.endpoints:
+            print(f"[INFO] Benchmarking /api/chat/{endpoint}...")
+            results[endpoint] = asyncio.run(benchmark_endpoint(base_url, endpoint, queries, args, sampler))
+
+        report = {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "config": {
+                key: getattr(args, key)
+                for key in ("endpoints", "concurrency", "requests", "warmup", "unique_queries", "query_words", "seed", "backend",
+                            "embed_latency_ms", "chat_latency_ms", "tokens_per_second", "response_tokens", "env")
+            },
+            "corpus_chunks": len(corpus),
+            "results": results,
+        }
+        print_summary(report)
+
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{report['git_revision'] or 'unknown'}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[INFO] Results written to {output}")
+
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                compare_reports(json.load(f), report)
+
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+        if args.keep_workdir:
+            print(f"[INFO] Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
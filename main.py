@@ -1,20 +1,69 @@
 # main.py
 import os
-from fastapi import FastAPI, HTTPException
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from src.rag_engine import RAGEngine
+from src.admission import (
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_ENABLED,
+    ADMISSION_SHORT_QUERY_WORDS,
+    FAST_LANE,
+    NORMAL_LANE,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_SECOND,
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTicket,
+    RateLimiter,
+)
+from src.health import HealthMonitor
+from src.metrics import METRICS_ENABLED, REGISTRY, MetricsMiddleware
+from src.rag_engine import BATCH_GENERATION_CONCURRENCY, BATCH_MAX_QUERIES, STARTUP_WARMUP_ENABLED, RAGEngine
+from src.resilience import breaker_states
+from src.vector_db import SearchScope
+
+# Built at startup by the lifespan, so importing this module stays cheap
+rag_engine: Optional[RAGEngine] = None
+# Dependency status for the health endpoints, refreshed in the background
+health_monitor: Optional[HealthMonitor] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the RAG engine and pre-warms its connections before the first
+    request, refreshes the health snapshot and purges expired sessions while
+    the app runs, and closes all clients on shutdown.
+    """
+    global rag_engine, health_monitor
+    rag_engine = RAGEngine()
+    health_monitor = HealthMonitor(rag_engine)
+    if STARTUP_WARMUP_ENABLED:
+        await rag_engine.warm_up()
+    health_monitor.start()
+    rag_engine.start()
+    try:
+        yield
+    finally:
+        await health_monitor.stop()
+        await rag_engine.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Physical AI & Humanoid Robotics RAG Backend",
     description="Intelligent textbook assistant powered by RAG",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware for frontend integration
@@ -24,10 +73,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize RAG Engine (singleton)
-rag_engine = RAGEngine()
+# Request latency metrics and optional Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+# Bounds concurrent chat pipelines (and optionally per-client request rates)
+admission = (
+    AdmissionController(
+        rate_limiter=RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SECOND > 0 else None
+    )
+    if ADMISSION_ENABLED
+    else None
+)
 
 # Request/Response models
 class ChatMessage(BaseModel):
@@ -36,7 +95,18 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     query: str
-    chat_history: List[ChatMessage] = []
+    chat_history: List[ChatMessage] = []  # Full history for stateless clients; with a session, only seeds a new one
+    session_id: Optional[str] = None  # Continue a server-side session
+    start_session: bool = False  # Start a server-side session (returns its session_id)
+    doc_ids: Optional[List[str]] = None  # Only retrieve from these documents
+    chapter_paths: Optional[List[str]] = None  # Only retrieve from these chapters (e.g. the page being read)
+
+class BatchChatRequest(BaseModel):
+    queries: List[str]
+    retrieval_only: bool = False  # Return context and citations without generating answers
+    stream: bool = True  # NDJSON in completion order; False returns all results in input order
+    doc_ids: Optional[List[str]] = None  # Scope for every query, as in ChatRequest
+    chapter_paths: Optional[List[str]] = None
 
 class Citation(BaseModel):
     title: str
@@ -47,6 +117,67 @@ class ChatResponse(BaseModel):
     response: str
     citations: List[Citation]
     has_textbook_context: bool = True  # Indicates if response used textbook or general knowledge
+    session_id: Optional[str] = None  # Send back on the next request instead of chat_history
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that frees its admission slot when the stream ends, however it ends."""
+
+    def __init__(self, *args, ticket: Optional[AdmissionTicket] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.ticket is not None:
+                self.ticket.release()
+
+
+def _client_id(http_request: Request) -> str:
+    if ADMISSION_CLIENT_HEADER:
+        client_id = http_request.headers.get(ADMISSION_CLIENT_HEADER)
+        if client_id:
+            return client_id
+    return http_request.client.host if http_request.client else "unknown"
+
+
+def _admission_lane(request: ChatRequest) -> str:
+    """Repeated and short, history-free questions are cheap, so they go first."""
+    if rag_engine.is_likely_cached(request.query):
+        return FAST_LANE
+    if not request.chat_history and len(request.query.split()) <= ADMISSION_SHORT_QUERY_WORDS:
+        return FAST_LANE
+    return NORMAL_LANE
+
+
+def _search_scope(request) -> Optional[SearchScope]:
+    """The request's retrieval scope, or None to search the whole textbook."""
+    return SearchScope.create(request.doc_ids, request.chapter_paths)
+
+
+async def admit(http_request: Request, lane: str = NORMAL_LANE, weight: int = 1) -> Optional[AdmissionTicket]:
+    """
+    Waits for `weight` pipeline slots for this request.
+
+    Raises:
+        HTTPException: 429 (client over its rate limit) or 503 (server at
+            capacity), with a Retry-After header.
+    """
+    if admission is None:
+        return None
+    try:
+        return await admission.admit(_client_id(http_request), lane, weight)
+    except AdmissionRejected as e:
+        detail = (
+            "Too many requests. Please slow down."
+            if e.status_code == 429
+            else "The service is at capacity. Please try again shortly."
+        )
+        raise HTTPException(
+            status_code=e.status_code, detail=detail, headers={"Retry-After": str(e.retry_after)}
+        )
 
 
 @app.get("/")
@@ -65,20 +196,37 @@ async def ping():
     return {"ok": True}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/api/chat/query", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Main chat endpoint for RAG-powered conversations.
+
+    Subject to admission control: when the server is at capacity the
+    request waits briefly for a slot, or is rejected with 429/503 and a
+    Retry-After header. `doc_ids` / `chapter_paths` restrict retrieval to
+    part of the textbook (e.g. the chapter the reader is on).
     
     Args:
         request: ChatRequest containing query and chat history
+        http_request: The raw request, used to identify the client
         
     Returns:
         ChatResponse with AI response, citations, and context indicator
     """
     if not request.query or not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
-    
+
+    ticket = await admit(http_request, _admission_lane(request))
     try:
         # Convert Pydantic models to dicts for RAG engine
         chat_history_dicts = [
@@ -89,87 +237,242 @@ async def chat(request: ChatRequest):
         # Execute RAG pipeline
         result = await rag_engine.chat_with_rag(
             query=request.query,
-            chat_history=chat_history_dicts
+            chat_history=chat_history_dicts,
+            session_id=request.session_id,
+            start_session=request.start_session,
+            scope=_search_scope(request)
         )
         
         return ChatResponse(
             response=result["response"],
             citations=result.get("citations", []),
-            has_textbook_context=result.get("has_textbook_context", False)
+            has_textbook_context=result.get("has_textbook_context", False),
+            session_id=result.get("session_id")
         )
         
+    except asyncio.TimeoutError:
+        print("[ERROR] Chat endpoint timed out.")
+        raise HTTPException(
+            status_code=504,
+            detail="The request took too long to process. Please try again."
+        )
     except Exception as e:
         print(f"[ERROR] Chat endpoint error: {e}")
         raise HTTPException(
             status_code=500,
             detail="An error occurred while processing your request"
         )
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+
+    Emits a `citations` event (with the session_id) as soon as retrieval
+    finishes, then one `token` event per generated text delta, and a final
+    `done` (or `error`) event.
+    Generation is cancelled when the client disconnects. Admission control
+    applies as for /api/chat/query; the slot is held until the stream ends.
+
+    Args:
+        request: ChatRequest containing query and chat history
+        http_request: The raw request, used to identify the client and detect disconnects
+
+    Returns:
+        A text/event-stream StreamingResponse
+    """
+    if not request.query or not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    chat_history_dicts = [
+        {"user": msg.user, "ai": msg.ai}
+        for msg in request.chat_history
+    ]
+    ticket = await admit(http_request, _admission_lane(request))
+
+    async def event_source():
+        events = rag_engine.stream_chat_with_rag(
+            query=request.query,
+            chat_history=chat_history_dicts,
+            session_id=request.session_id,
+            start_session=request.start_session,
+            scope=_search_scope(request)
+        )
+        try:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    print("[INFO] Client disconnected. Cancelling stream.")
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"[ERROR] Chat stream error: {e}")
+            error_event = {
+                "type": "error",
+                "message": "An error occurred while processing your request",
+            }
+            yield f"event: error\ndata: {json.dumps(error_event)}\n\n"
+        finally:
+            # Closes the upstream model stream so we stop paying for tokens
+            await events.aclose()
+
+    return AdmittedStreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        ticket=ticket,
+    )
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """
+    Answers many independent questions in one request.
+
+    Embeds all queries in one batched call, retrieves context for all of
+    them in one vector search, then generates answers with bounded
+    concurrency (BATCH_GENERATION_CONCURRENCY). With `retrieval_only`,
+    returns each query's context and citations without generating.
+
+    By default results stream back as NDJSON, one object per line in
+    completion order, each carrying its input `index`; with `stream: false`
+    they are returned together as {"results": [...]} in input order. A
+    batch holds one admission slot per concurrent generation while it runs.
+
+    Args:
+        request: BatchChatRequest with the queries and options
+        http_request: The raw request, used to identify the client and detect disconnects
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    empty = [i for i, query in enumerate(request.queries) if not query or not query.strip()]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Query cannot be empty (index {empty[0]})")
+
+    scope = _search_scope(request)
+    # Weighted by the generations the batch runs at once, so it takes its
+    # fair share of capacity; retrieval-only batches run one pipeline
+    weight = 1 if request.retrieval_only else min(BATCH_GENERATION_CONCURRENCY, len(request.queries))
+    ticket = await admit(http_request, weight=weight)
+
+    if not request.stream:
+        try:
+            results = [
+                result async for result in rag_engine.batch_chat(request.queries, request.retrieval_only, scope=scope)
+            ]
+        except Exception as e:
+            print(f"[ERROR] Batch endpoint error: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail="An error occurred while processing your request"
+            )
+        finally:
+            if ticket is not None:
+                ticket.release()
+        return {"results": sorted(results, key=lambda result: result["index"])}
+
+    async def result_lines():
+        results = rag_engine.batch_chat(request.queries, request.retrieval_only, scope=scope)
+        try:
+            async for result in results:
+                if await http_request.is_disconnected():
+                    print("[INFO] Client disconnected. Cancelling batch.")
+                    break
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            print(f"[ERROR] Batch stream error: {e}")
+            yield json.dumps({"error": "An error occurred while processing your request"}) + "\n"
+        finally:
+            # Cancels generations that have not finished
+            await results.aclose()
+
+    return AdmittedStreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        ticket=ticket,
+    )
 
 
 @app.get("/api/health")
-async def health_check():
+async def health_check(fresh: bool = False):
     """
     Comprehensive health check endpoint.
+
+    Served from the background health snapshot (see `snapshot_age_seconds`);
+    `?fresh=1` probes the dependencies synchronously first. Includes each
+    dependency's circuit breaker; an open breaker means calls to it are
+    currently skipped, which degrades the service.
     """
-    try:
-        # Check Qdrant connection
-        collection_info = await rag_engine.vector_db_client.get_collection_info()
-        
-        if collection_info:
-            return {
-                "status": "healthy",
-                "services": {
-                    "qdrant": "connected",
-                    "gemini": "available",
-                },
-                "collection": {
-                    "name": rag_engine.vector_db_client.collection_name,
-                    "points": collection_info.points_count,
-                    "status": collection_info.status
-                }
-            }
-        else:
-            return {
-                "status": "degraded",
-                "services": {
-                    "qdrant": "connection_failed",
-                    "gemini": "available",
-                },
-                "message": "Vector database connection failed, but chatbot can still answer with general knowledge"
-            }
-            
-    except Exception as e:
-        print(f"[ERROR] Health check failed: {e}")
-        return {
-            "status": "degraded",
-            "error": str(e),
-            "message": "Some services unavailable, but chatbot can still function with general knowledge"
+    vector_db = rag_engine.vector_db_client
+    snapshot = await health_monitor.get(fresh=fresh)
+    vector_status, gemini_probe = snapshot["vector_db"], snapshot["gemini"]
+    breakers = breaker_states()
+
+    if any(state["state"] != "closed" for name, state in breakers.items() if name.startswith("gemini")):
+        gemini_status = "circuit_open"
+    elif gemini_probe["reachable"] is False:
+        gemini_status = "unreachable"
+    else:
+        gemini_status = "available"
+    healthy = (
+        vector_status["reachable"]
+        and gemini_status == "available"
+        and all(state["state"] == "closed" for state in breakers.values())
+    )
+
+    body = {
+        "status": "healthy" if healthy else "degraded",
+        "services": {
+            vector_db.backend_name: "connected" if vector_status["reachable"] else "connection_failed",
+            "gemini": gemini_status,
+        },
+        "dependencies": {"vector_db": vector_status, "gemini": gemini_probe},
+        "circuit_breakers": breakers,
+        "checked_at": snapshot["checked_at"],
+        "snapshot_age_seconds": health_monitor.age_seconds(),
+    }
+    if vector_status["reachable"]:
+        collection = vector_status["collection"]
+        body["collection"] = {
+            "name": collection["name"],
+            "backend": vector_db.backend_name,
+            "points": collection["points_count"],
+            "status": collection["status"],
         }
+    else:
+        body["message"] = "Vector database connection failed, but chatbot can still answer with general knowledge"
+    return body
 
 
 @app.get("/api/collection-info")
-async def get_collection_info():
+async def get_collection_info(fresh: bool = False):
     """
-    Get information about the Qdrant collection.
+    Get information about the active vector collection.
+
+    Served from the background health snapshot; `?fresh=1` queries the
+    backend first.
     """
-    try:
-        info = await rag_engine.vector_db_client.get_collection_info()
-        if info:
-            return {
-                "collection_name": rag_engine.vector_db_client.collection_name,
-                "points_count": info.points_count,
-                "status": info.status,
-            }
-        else:
-            raise HTTPException(
-                status_code=503,
-                detail="Could not retrieve collection information"
-            )
-    except Exception as e:
+    vector_db = rag_engine.vector_db_client
+    vector_status = (await health_monitor.get(fresh=fresh))["vector_db"]
+    if not vector_status["reachable"]:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error retrieving collection info: {str(e)}"
+            status_code=503,
+            detail="Could not retrieve collection information"
         )
+    collection = vector_status["collection"]
+    return {
+        "collection_name": collection["name"],
+        "backend": vector_db.backend_name,
+        "points_count": collection["points_count"],
+        "status": collection["status"],
+        "snapshot_age_seconds": health_monitor.age_seconds(),
+    }
 
 
 # For running with uvicorn directly
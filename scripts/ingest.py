@@ -1,12 +1,28 @@
 import os
-import re
 from qdrant_client import models
 from qdrant_client.http.models import Distance, VectorParams
 from qdrant_client import QdrantClient
 import google.generativeai as genai
 from dotenv import load_dotenv
 from typing import List, Dict
+import argparse
+import asyncio
 import hashlib
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Make the backend's src package importable when run as `python scripts/ingest.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.chunk_store import CHUNK_STORE_ENABLED, CHUNK_STORE_PATH, publish_chunk_store
+from src.chunking import build_chunk_records
+from src.embedding_store import EmbeddingStore
+from src.local_index import LOCAL_INDEX_PATH, SnapshotWriter
+from src.qdrant_backend import PAYLOAD_INDEX_FIELDS, QUANTIZATION_KINDS, collection_index_config
 
 load_dotenv()
 
@@ -16,8 +32,17 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "rag_chatbot_collection")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Get project root directory
-# PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOCS_PATH = os.getenv("DOCS_PATH") or os.path.join(PROJECT_ROOT, "docusaurus", "docs")
+# Touched after every ingestion so the backend can invalidate its answer cache
+INDEX_VERSION_PATH = os.getenv("RAG_INDEX_VERSION_PATH") or os.path.join(PROJECT_ROOT, "data", "index_version")
+# File path -> content hash -> point IDs, used by --incremental
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH") or os.path.join(PROJECT_ROOT, "data", "ingest_manifest.json")
+# Files fully written by an in-progress run, used to resume after interruption
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH") or os.path.join(PROJECT_ROOT, "data", "ingest_checkpoint.json")
+# (model, chunk-text hash) -> vector, so rebuilds never re-embed unchanged text
+EMBEDDING_STORE_PATH = os.getenv("INGEST_EMBEDDING_STORE_PATH") or os.path.join(PROJECT_ROOT, "data", "embeddings.sqlite")
+EMBEDDING_STORE_ENABLED = os.getenv("INGEST_EMBEDDING_STORE", "true").lower() in ("1", "true", "yes")
 print(DOCS_PATH)
 
 # Debug
@@ -36,95 +61,438 @@ genai.configure(api_key=GEMINI_API_KEY)
 EMBEDDING_MODEL = "models/text-embedding-004"
 EMBEDDING_SIZE = 768
 
+# --- Embedding Pipeline Configuration ---
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "32"))
+EMBED_MIN_BATCH_SIZE = int(os.getenv("INGEST_EMBED_MIN_BATCH_SIZE", "4"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("INGEST_EMBED_MAX_BATCH_SIZE", "100"))  # API limit per request
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "6"))
+EMBED_BACKOFF_BASE = float(os.getenv("INGEST_EMBED_BACKOFF_BASE", "1.0"))
+EMBED_BACKOFF_MAX = float(os.getenv("INGEST_EMBED_BACKOFF_MAX", "60.0"))
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "128"))
+UPSERT_CONCURRENCY = int(os.getenv("INGEST_UPSERT_CONCURRENCY", "2"))
+
+# --- Parse/Chunk Stage Configuration ---
+# Worker processes for parsing and chunking (1 = inline, no pool)
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Hard-cap chunks at the chunk size; changes boundaries (and point IDs), so opt-in
+STRICT_CHUNKS = os.getenv("INGEST_STRICT_CHUNKS", "false").lower() in ("1", "true", "yes")
+
+# --- Collection Index Configuration ---
+# "scalar" (int8, 4x smaller) or "binary" (1 bit/dim, 32x smaller) quantization
+QUANTIZATION = os.getenv("INGEST_QUANTIZATION", "none").lower()
+# Keep quantized vectors in RAM even when the originals live on disk
+QUANTIZATION_ALWAYS_RAM = os.getenv("INGEST_QUANTIZATION_ALWAYS_RAM", "true").lower() in ("1", "true", "yes")
+# Store original vectors on disk (only quantized ones in RAM)
+VECTORS_ON_DISK = os.getenv("INGEST_VECTORS_ON_DISK", "false").lower() in ("1", "true", "yes")
+HNSW_M = int(os.getenv("INGEST_HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("INGEST_HNSW_EF_CONSTRUCT", "100"))
+
+# --- Lexical Index Configuration ---
+# Hybrid retrieval reads the BM25 index from the local snapshot, so with it
+# enabled (same switch as the backend) every run republishes the snapshot and
+# the lexical index always matches the collection.
+LEXICAL_INDEX_ENABLED = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+
 qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
 
-def get_embedding(text: str) -> List[float]:
-    """Generate embedding using Gemini."""
-    response = genai.embed_content(model=EMBEDDING_MODEL, content=text)
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for a batch of texts in a single request."""
+    response = genai.embed_content(model=EMBEDDING_MODEL, content=texts)
     return response['embedding']
 
-def chunk_text(text: str, chunk_size: int = 700, overlap: int = 100) -> List[str]:
-    """
-    Splits text into chunks of specified size with overlap.
-    
-    Args:
-        text: Input text to chunk
-        chunk_size: Target chunk size in words
-        overlap: Number of words to overlap between chunks
-    
-    Returns:
-        List of text chunks
-    """
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    # Split by sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
-    if not sentences:
-        return [text]
-
-    for sentence in sentences:
-        sentence_length = len(sentence.split())
-        
-        if current_length + sentence_length <= chunk_size:
-            # Sentence fits in current chunk
-            current_chunk.append(sentence)
-            current_length += sentence_length
-        else:
-            # Current chunk is full, save it
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-            
-            # Create new chunk with overlap
-            if overlap > 0 and current_chunk:
-                # Take last N words as overlap
-                chunk_text_str = " ".join(current_chunk)
-                words = chunk_text_str.split()
-                overlap_words = words[-overlap:] if len(words) > overlap else words
-                overlap_text = " ".join(overlap_words)
-                
-                current_chunk = [overlap_text, sentence]
-                current_length = len(overlap_text.split()) + sentence_length
-            else:
-                current_chunk = [sentence]
-                current_length = sentence_length
-    
-    # Add final chunk
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    
-    return chunks if chunks else [text]
-
-def extract_markdown_content(filepath: str) -> Dict:
-    """Extract content from markdown file."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    frontmatter_match = re.match(r'---\n(.*?)\n---\n(.*)', content, re.DOTALL)
-    if frontmatter_match:
-        frontmatter_str = frontmatter_match.group(1)
-        markdown_text = frontmatter_match.group(2).strip()
-        
-        # FIX: Correct regex pattern
-        doc_id_match = re.search(r'id:\s*(.*)', frontmatter_str)
-        title_match = re.search(r"title:\s*['\"]?(.*?)['\"]?", frontmatter_str)
-        
-        doc_id = doc_id_match.group(1).strip() if doc_id_match else os.path.splitext(os.path.basename(filepath))[0]
-        title = title_match.group(1).strip() if title_match else "No Title"
-
-        # FIX: Correct regex patterns (remove extra backslashes)
-        markdown_text = re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)
-        markdown_text = re.sub(r'\[.*?\]\(.*?\)', '', markdown_text)
-
-        return {"id": doc_id, "title": title, "text": markdown_text, "filepath": filepath}
-    
-    return {"id": os.path.splitext(os.path.basename(filepath))[0], "title": "No Title", "text": content.strip(), "filepath": filepath}
-
-def ingest_documents(docs_path: str):
-    """Ingest documents into Qdrant."""
-    
+def _error_status(error: Exception):
+    """Extract an HTTP status code from an API exception, if any."""
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and transport failures are worth retrying."""
+    status = _error_status(error)
+    if status is not None:
+        return status == 429 or 500 <= status < 600
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+class AdaptiveBatchSize:
+    """
+    AIMD batch sizing: grow by a few items after each success, halve when
+    the API throttles us.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+
+    def on_success(self):
+        self.size = min(self.maximum, self.size + max(1, self.size // 8))
+
+    def on_throttle(self):
+        self.size = max(self.minimum, self.size // 2)
+
+async def _call_with_retry(description: str, fn, *args, on_throttle=None, **kwargs):
+    """Run a blocking API call in a thread, retrying with exponential backoff on 429/5xx."""
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == EMBED_MAX_RETRIES:
+                raise
+            if _error_status(e) == 429 and on_throttle is not None:
+                on_throttle()
+            delay = min(EMBED_BACKOFF_MAX, EMBED_BACKOFF_BASE * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+            print(f"[WARN] {description} failed ({e}). Retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{EMBED_MAX_RETRIES})...")
+            await asyncio.sleep(delay)
+
+async def _embed_batch_with_retry(texts: List[str], sizer: AdaptiveBatchSize) -> List[List[float]]:
+    """Embed one batch, shrinking the adaptive batch size when throttled."""
+    embeddings = await _call_with_retry(
+        "Embedding batch", get_embeddings, texts, on_throttle=sizer.on_throttle
+    )
+    if len(embeddings) != len(texts):
+        raise RuntimeError(
+            f"Embedding API returned {len(embeddings)} vectors for {len(texts)} inputs"
+        )
+    sizer.on_success()
+    return embeddings
+
+class IngestPipeline:
+    """
+    Streams file jobs through embedding and upsert stages with bounded memory.
+
+    Each job is a dict with a "key" (the file's relative path), the
+    "records" to embed and optional "refresh" records whose payload only
+    needs updating. Records are cut into adaptive embedding batches and
+    then into fixed-size upsert batches; at most EMBED_CONCURRENCY embedding
+    and UPSERT_CONCURRENCY upsert requests are in flight, and the producer
+    blocks when they are all busy. `on_file_done(key)` fires once every
+    point of a file has been written, which is what checkpoints hook into.
+    """
+
+    def __init__(self, on_file_done, embedding_store: EmbeddingStore = None):
+        self.on_file_done = on_file_done
+        self.embedding_store = embedding_store
+        self.sizer = AdaptiveBatchSize(EMBED_BATCH_SIZE, EMBED_MIN_BATCH_SIZE, EMBED_MAX_BATCH_SIZE)
+        self.embed_slots = asyncio.Semaphore(EMBED_CONCURRENCY)
+        self.upsert_slots = asyncio.Semaphore(UPSERT_CONCURRENCY)
+        self.outstanding: Dict[str, int] = {}
+        self.embed_queue = []
+        self.upsert_queue = []
+        self.tasks = set()
+        self.error = None
+        self.embedded = 0
+        self.reused = 0
+        self.upserted = 0
+
+    async def run(self, jobs):
+        """Consume an async iterable of jobs and wait until every point is written."""
+        try:
+            async for job in jobs:
+                self._raise_if_failed()
+                key = job["key"]
+                refresh = job.get("refresh") or []
+                self.outstanding[key] = len(job["records"]) + (1 if refresh else 0)
+                if not self.outstanding[key]:
+                    self._complete(key, 0)
+                    continue
+
+                if refresh:
+                    self._spawn(self._refresh(key, refresh))
+                await self._enqueue(key, job["records"])
+                while len(self.embed_queue) >= self.sizer.size:
+                    await self._dispatch_embed()
+
+            while self.embed_queue:
+                await self._dispatch_embed()
+            await self._drain()
+            while self.upsert_queue:
+                await self._dispatch_upsert()
+            await self._drain()
+            self._raise_if_failed()
+        except BaseException:
+            for task in self.tasks:
+                task.cancel()
+            raise
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None and self.error is None:
+            self.error = task.exception()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise self.error
+
+    async def _drain(self):
+        while self.tasks:
+            await asyncio.wait(set(self.tasks))
+            self._raise_if_failed()
+
+    def _complete(self, key: str, count: int):
+        self.outstanding[key] -= count
+        if self.outstanding[key] == 0:
+            del self.outstanding[key]
+            self.on_file_done(key)
+
+    async def _enqueue(self, key: str, records: List[Dict]):
+        """Queue records for embedding, reusing stored vectors where possible."""
+        if self.embedding_store is None or not records:
+            self.embed_queue.extend((key, record) for record in records)
+            return
+
+        stored = self.embedding_store.get_many(
+            EMBEDDING_MODEL, [record["text_hash"] for record in records]
+        )
+        for record in records:
+            vector = stored.get(record["text_hash"])
+            if vector is None:
+                self.embed_queue.append((key, record))
+                continue
+            self.reused += 1
+            self.upsert_queue.append(
+                (key, models.PointStruct(id=record["id"], vector=vector.tolist(), payload=record["payload"]))
+            )
+
+        while len(self.upsert_queue) >= UPSERT_BATCH_SIZE:
+            await self._dispatch_upsert()
+
+    async def _dispatch_embed(self):
+        await self.embed_slots.acquire()
+        self._raise_if_failed()
+        batch = self.embed_queue[:self.sizer.size]
+        del self.embed_queue[:len(batch)]
+        self._spawn(self._embed(batch))
+
+    async def _embed(self, batch):
+        try:
+            embeddings = await _embed_batch_with_retry(
+                [record["payload"]["text"] for _, record in batch], self.sizer
+            )
+            self.embedded += len(batch)
+            print(f"Embedded {self.embedded} chunks (batch of {len(batch)}).")
+            if self.embedding_store is not None:
+                self.embedding_store.put_many(
+                    EMBEDDING_MODEL,
+                    [(record["text_hash"], embedding) for (_, record), embedding in zip(batch, embeddings) if embedding],
+                )
+
+            for (key, record), embedding in zip(batch, embeddings):
+                if embedding:
+                    self.upsert_queue.append(
+                        (key, models.PointStruct(id=record["id"], vector=embedding, payload=record["payload"]))
+                    )
+                else:
+                    self._complete(key, 1)
+
+            while len(self.upsert_queue) >= UPSERT_BATCH_SIZE:
+                await self._dispatch_upsert()
+        finally:
+            self.embed_slots.release()
+
+    async def _dispatch_upsert(self):
+        await self.upsert_slots.acquire()
+        batch = self.upsert_queue[:UPSERT_BATCH_SIZE]
+        del self.upsert_queue[:len(batch)]
+        self._spawn(self._upsert(batch))
+
+    async def _upsert(self, batch):
+        try:
+            await _call_with_retry(
+                "Upsert batch",
+                qdrant_client.upsert,
+                collection_name=QDRANT_COLLECTION_NAME,
+                wait=True,
+                points=[point for _, point in batch],
+            )
+            self.upserted += len(batch)
+            print(f"Upserted {self.upserted} points.")
+            for key, _ in batch:
+                self._complete(key, 1)
+        finally:
+            self.upsert_slots.release()
+
+    async def _refresh(self, key: str, records: List[Dict]):
+        await _call_with_retry(
+            "Payload refresh",
+            qdrant_client.batch_update_points,
+            collection_name=QDRANT_COLLECTION_NAME,
+            wait=True,
+            update_operations=[
+                models.SetPayloadOperation(
+                    set_payload=models.SetPayload(payload=record["payload"], points=[record["id"]])
+                )
+                for record in records
+            ],
+        )
+        self._complete(key, 1)
+
+class IngestCheckpoint:
+    """
+    Records files whose points are fully written, so an interrupted run can
+    resume where it stopped. Removed once a run completes.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.files: Dict[str, Dict] = {}
+        if os.path.exists(CHECKPOINT_PATH):
+            with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get("collection") == QDRANT_COLLECTION_NAME and saved.get("mode") == mode:
+                self.files = saved.get("files", {})
+                print(f"Resuming from checkpoint: {len(self.files)} files already ingested.")
+
+    def mark_done(self, relative_path: str, entry: Dict):
+        self.files[relative_path] = entry
+        os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+        tmp_path = f"{CHECKPOINT_PATH}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"collection": QDRANT_COLLECTION_NAME, "mode": self.mode, "files": self.files}, f)
+        os.replace(tmp_path, CHECKPOINT_PATH)
+
+    def clear(self):
+        if os.path.exists(CHECKPOINT_PATH):
+            os.remove(CHECKPOINT_PATH)
+
+def mark_index_updated():
+    """Records a new index version so cached answers are invalidated."""
+    os.makedirs(os.path.dirname(INDEX_VERSION_PATH), exist_ok=True)
+    with open(INDEX_VERSION_PATH, 'w', encoding='utf-8') as f:
+        f.write(f"{time.time()}\n")
+
+def load_manifest() -> Dict:
+    """Load the ingestion manifest (file path -> content hash -> point IDs)."""
+    empty = {"version": 1, "collection": QDRANT_COLLECTION_NAME, "files": {}}
+    if not os.path.exists(MANIFEST_PATH):
+        return empty
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("collection") != QDRANT_COLLECTION_NAME:
+        print(f"[WARN] Manifest belongs to collection '{manifest.get('collection')}'. Ignoring it.")
+        return empty
+    return manifest
+
+def save_manifest(manifest: Dict):
+    """Atomically write the ingestion manifest."""
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def iter_doc_files(docs_path: str):
+    """Yield (filepath, relative_path) for every markdown file, in a stable order."""
+    for root, dirs, files in os.walk(docs_path):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(".md") or file.endswith(".mdx"):
+                filepath = os.path.join(root, file)
+                yield filepath, os.path.relpath(filepath, docs_path)
+
+def file_content_hash(filepath: str) -> str:
+    """SHA-256 of the raw file bytes."""
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _chunking_mode(strict_chunks: bool) -> str:
+    """Name recorded in the manifest for the chunk boundary rules in use."""
+    return "strict" if strict_chunks else "compat"
+
+async def parse_files(items, workers: int = PARSE_WORKERS, strict_chunks: bool = STRICT_CHUNKS):
+    """
+    Parse and chunk files across a process pool, yielding results in input order.
+
+    `items` are tuples starting with (filepath, relative_path); each is
+    yielded back with its chunk records. At most 2 * workers files are in
+    flight, so memory stays bounded and the embedding stage receives files
+    as soon as they (and everything before them) are chunked.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, build_chunk_records(item[0], item[1], strict_chunks)
+        return
+
+    loop = asyncio.get_running_loop()
+    # Fork where available: the workers only need src.chunking, and spawning
+    # would re-run this script's module-level setup in every worker.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append((item, loop.run_in_executor(
+                executor, build_chunk_records, item[0], item[1], strict_chunks
+            )))
+            if len(in_flight) >= workers * 2:
+                done_item, future = in_flight.popleft()
+                yield done_item, await future
+        while in_flight:
+            done_item, future = in_flight.popleft()
+            yield done_item, await future
+
+def _index_config_summary(index_config: Dict) -> str:
+    return (
+        f"quantization={index_config['quantization']}, hnsw m={index_config['hnsw_m']}, "
+        f"ef_construct={index_config['hnsw_ef_construct']}, vectors_on_disk={index_config['vectors_on_disk']}"
+    )
+
+def default_index_config() -> Dict:
+    return {
+        "quantization": QUANTIZATION,
+        "hnsw_m": HNSW_M,
+        "hnsw_ef_construct": HNSW_EF_CONSTRUCT,
+        "vectors_on_disk": VECTORS_ON_DISK,
+    }
+
+def ensure_payload_indexes():
+    """
+    Create keyword payload indexes on the fields scoped searches filter by
+    (doc_id, chapter_path), if missing, so Qdrant can apply the filter
+    while traversing the HNSW graph.
+    """
+    schema = qdrant_client.get_collection(QDRANT_COLLECTION_NAME).payload_schema or {}
+    for field in PAYLOAD_INDEX_FIELDS:
+        if field in schema:
+            continue
+        qdrant_client.create_payload_index(
+            collection_name=QDRANT_COLLECTION_NAME,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+            wait=True,
+        )
+        print(f"Created keyword payload index on '{field}'.")
+
+def ensure_collection(recreate: bool = False, index_config: Dict = None, update_index_config: bool = False):
+    """
+    Create the collection if it does not exist yet (or drop and recreate it).
+
+    `index_config` (quantization, HNSW m / ef_construct, on-disk vectors)
+    applies when the collection is created; with `update_index_config` it
+    is also applied to an existing collection, which Qdrant re-indexes in
+    the background.
+    """
+    index_config = index_config or default_index_config()
+    qdrant_index_config = collection_index_config(
+        quantization=index_config["quantization"],
+        hnsw_m=index_config["hnsw_m"],
+        hnsw_ef_construct=index_config["hnsw_ef_construct"],
+        always_ram=QUANTIZATION_ALWAYS_RAM,
+    )
+
+    if recreate and qdrant_client.collection_exists(QDRANT_COLLECTION_NAME):
+        print(f"Dropping collection '{QDRANT_COLLECTION_NAME}' for rebuild...")
+        qdrant_client.delete_collection(QDRANT_COLLECTION_NAME)
+
     # FIX: Check if collection exists instead of recreating
     try:
         qdrant_client.get_collection(QDRANT_COLLECTION_NAME)
@@ -132,57 +500,351 @@ def ingest_documents(docs_path: str):
     except:
         qdrant_client.create_collection(
             collection_name=QDRANT_COLLECTION_NAME,
-            vectors_config=VectorParams(size=EMBEDDING_SIZE, distance=Distance.COSINE),
+            vectors_config=VectorParams(
+                size=EMBEDDING_SIZE, distance=Distance.COSINE, on_disk=index_config["vectors_on_disk"]
+            ),
+            **qdrant_index_config,
         )
-        print(f"Collection '{QDRANT_COLLECTION_NAME}' created.")
+        print(f"Collection '{QDRANT_COLLECTION_NAME}' created ({_index_config_summary(index_config)}).")
+        ensure_payload_indexes()
+        return
 
-    points = []
-    for root, _, files in os.walk(docs_path):
-        for file in files:
-            if file.endswith(".md") or file.endswith(".mdx"):
-                filepath = os.path.join(root, file)
-                doc_info = extract_markdown_content(filepath)
-                
-                relative_path = os.path.relpath(filepath, DOCS_PATH)
-                display_path = re.sub(r'^\d{2}-', '', os.path.splitext(relative_path)[0])
-
-                doc_chunks = chunk_text(doc_info["text"])
-                print(f"Processing '{filepath}': {len(doc_chunks)} chunks.")
-
-                for i, chunk in enumerate(doc_chunks):
-                    chunk_id_str = f"{doc_info['id']}-{i}-{hashlib.md5(chunk.encode()).hexdigest()[:8]}"
-                    point_id = int(hashlib.sha256(chunk_id_str.encode()).hexdigest(), 16) % (10**9)
-
-                    embedding = get_embedding(chunk)
-                    if embedding:
-                        points.append(
-                            models.PointStruct(
-                                id=point_id,
-                                vector=embedding,
-                                payload={
-                                    "text": chunk,
-                                    "doc_id": doc_info["id"],
-                                    "title": doc_info["title"],
-                                    "chapter_path": display_path,
-                                    "chunk_number": i,
-                                }
-                            )
-                        )
-    
-    if points:
-        print(f"Upserting {len(points)} points to Qdrant...")
-        qdrant_client.upsert(
+    ensure_payload_indexes()
+    if update_index_config:
+        qdrant_client.update_collection(
             collection_name=QDRANT_COLLECTION_NAME,
-            wait=True,
-            points=points
+            vectors_config={"": models.VectorParamsDiff(on_disk=index_config["vectors_on_disk"])},
+            hnsw_config=qdrant_index_config["hnsw_config"],
+            quantization_config=qdrant_index_config["quantization_config"] or models.Disabled.DISABLED,
         )
-        print("Document ingestion complete.")
+        print(f"Updated index config of '{QDRANT_COLLECTION_NAME}' ({_index_config_summary(index_config)}).")
+
+def ingest_documents(
+    docs_path: str,
+    embedding_store: EmbeddingStore = None,
+    recreate: bool = False,
+    parse_workers: int = PARSE_WORKERS,
+    strict_chunks: bool = STRICT_CHUNKS,
+    index_config: Dict = None,
+    update_index_config: bool = False,
+):
+    """
+    Ingest documents into Qdrant.
+
+    Files stream through parse -> chunk -> embed -> upsert, so memory stays
+    flat regardless of corpus size. Progress is checkpointed per file and an
+    interrupted run resumes from the checkpoint. Vectors already in the
+    embedding store are reused, so rebuilding an unchanged corpus costs no
+    embedding calls. Parsing and chunking run on `parse_workers` processes.
+    """
+    ensure_collection(recreate=recreate, index_config=index_config, update_index_config=update_index_config)
+
+    checkpoint = IngestCheckpoint("full")
+    if recreate:
+        checkpoint.files.clear()
+    manifest = {
+        "version": 1,
+        "collection": QDRANT_COLLECTION_NAME,
+        "chunking": _chunking_mode(strict_chunks),
+        "files": {},
+    }
+    pending_entries = {}
+
+    def files_to_parse():
+        for filepath, relative_path in iter_doc_files(docs_path):
+            content_hash = file_content_hash(filepath)
+            done = checkpoint.files.get(relative_path)
+            if done and done["hash"] == content_hash:
+                manifest["files"][relative_path] = done
+                continue
+            yield filepath, relative_path, content_hash
+
+    async def jobs():
+        parsed = parse_files(files_to_parse(), workers=parse_workers, strict_chunks=strict_chunks)
+        async for (filepath, relative_path, content_hash), records in parsed:
+            pending_entries[relative_path] = {
+                "hash": content_hash,
+                "point_ids": [record["id"] for record in records],
+            }
+            yield {"key": relative_path, "records": records}
+
+    def on_file_done(relative_path: str):
+        entry = pending_entries.pop(relative_path)
+        manifest["files"][relative_path] = entry
+        checkpoint.mark_done(relative_path, entry)
+
+    pipeline = IngestPipeline(on_file_done, embedding_store)
+    asyncio.run(pipeline.run(jobs()))
+
+    if manifest["files"]:
+        save_manifest(manifest)
+        checkpoint.clear()
+        mark_index_updated()
+        print(f"Document ingestion complete ({pipeline.upserted} points written, "
+              f"{pipeline.embedded} embedded, {pipeline.reused} reused from the embedding store).")
     else:
         print("No documents found for ingestion.")
 
+def ingest_documents_incremental(
+    docs_path: str,
+    embedding_store: EmbeddingStore = None,
+    parse_workers: int = PARSE_WORKERS,
+    strict_chunks: bool = STRICT_CHUNKS,
+    index_config: Dict = None,
+    update_index_config: bool = False,
+):
+    """
+    Ingest only what changed since the last run.
+
+    Files whose content hash matches the manifest are skipped without
+    parsing. For changed or new files, only chunks whose point ID is not
+    already indexed are embedded; retained chunks just get their payload
+    refreshed. Points that no longer belong to any file are deleted after
+    the new points are written, so queries never see a gap.
+    """
+    ensure_collection(index_config=index_config, update_index_config=update_index_config)
+
+    old_manifest = load_manifest()
+    checkpoint = IngestCheckpoint("incremental")
+    if not old_manifest["files"]:
+        print("[WARN] No manifest found. All files will be treated as new; "
+              "points from earlier non-manifest runs will not be cleaned up.")
+    chunking = _chunking_mode(strict_chunks)
+    # Chunk boundaries (and so point IDs) differ between modes: re-chunk everything
+    rechunk_all = bool(old_manifest["files"]) and old_manifest.get("chunking", "compat") != chunking
+    if rechunk_all:
+        print(f"[WARN] Chunking mode changed to '{chunking}'. Re-chunking all files.")
+
+    # Files finished by an interrupted run count as already indexed, but the
+    # points they replaced still need deleting.
+    old_files = {**old_manifest["files"], **checkpoint.files}
+    old_ids = {
+        point_id
+        for entry in list(old_manifest["files"].values()) + list(checkpoint.files.values())
+        for point_id in entry["point_ids"]
+    }
+
+    new_manifest = {"version": 1, "collection": QDRANT_COLLECTION_NAME, "chunking": chunking, "files": {}}
+    summary = {"added": [], "changed": [], "removed": [], "unchanged": 0, "retained": 0}
+    pending_entries = {}
+
+    def files_to_parse():
+        for filepath, relative_path in iter_doc_files(docs_path):
+            content_hash = file_content_hash(filepath)
+            previous = old_files.get(relative_path)
+            if previous and previous["hash"] == content_hash and not rechunk_all:
+                new_manifest["files"][relative_path] = previous
+                summary["unchanged"] += 1
+                continue
+
+            summary["changed" if previous else "added"].append(relative_path)
+            yield filepath, relative_path, content_hash
+
+    async def jobs():
+        parsed = parse_files(files_to_parse(), workers=parse_workers, strict_chunks=strict_chunks)
+        async for (filepath, relative_path, content_hash), records in parsed:
+            to_refresh = [record for record in records if record["id"] in old_ids]
+            summary["retained"] += len(to_refresh)
+            pending_entries[relative_path] = {
+                "hash": content_hash,
+                "point_ids": [record["id"] for record in records],
+            }
+            yield {
+                "key": relative_path,
+                "records": [record for record in records if record["id"] not in old_ids],
+                "refresh": to_refresh,
+            }
+
+    def on_file_done(relative_path: str):
+        entry = pending_entries.pop(relative_path)
+        new_manifest["files"][relative_path] = entry
+        checkpoint.mark_done(relative_path, entry)
+
+    pipeline = IngestPipeline(on_file_done, embedding_store)
+    asyncio.run(pipeline.run(jobs()))
+
+    summary["removed"] = sorted(set(old_files) - set(new_manifest["files"]))
+    new_ids = {point_id for entry in new_manifest["files"].values() for point_id in entry["point_ids"]}
+    to_delete = sorted(old_ids - new_ids)
+
+    if to_delete:
+        print(f"Deleting {len(to_delete)} stale points...")
+        qdrant_client.delete(
+            collection_name=QDRANT_COLLECTION_NAME,
+            wait=True,
+            points_selector=models.PointIdsList(points=to_delete),
+        )
+
+    save_manifest(new_manifest)
+    checkpoint.clear()
+    if pipeline.upserted or summary["retained"] or to_delete:
+        mark_index_updated()
+
+    print("Incremental ingestion summary:")
+    print(f"  Files added:     {len(summary['added'])}")
+    for path in summary["added"]:
+        print(f"    + {path}")
+    print(f"  Files changed:   {len(summary['changed'])}")
+    for path in summary["changed"]:
+        print(f"    ~ {path}")
+    print(f"  Files removed:   {len(summary['removed'])}")
+    for path in summary["removed"]:
+        print(f"    - {path}")
+    print(f"  Files unchanged: {summary['unchanged']}")
+    print(f"  Chunks embedded: {pipeline.embedded}")
+    print(f"  Chunks reused:   {pipeline.reused} (embedding store)")
+    print(f"  Chunks retained: {summary['retained']}")
+    print(f"  Points deleted:  {len(to_delete)}")
+    return summary
+
+def iter_collection_pages(with_vectors: bool, page_size: int = 256):
+    """Scrolls the whole collection (with payloads), yielding one page of points at a time."""
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=QDRANT_COLLECTION_NAME,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        if points:
+            yield points
+        if offset is None:
+            break
+
+def export_local_snapshot(output_dir: str = LOCAL_INDEX_PATH, page_size: int = 256):
+    """
+    Export the collection as a local index snapshot (VECTOR_BACKEND=local,
+    and the BM25 index hybrid retrieval uses with any backend).
+
+    Scrolls every point with its vector and payload and streams them into a
+    memory-mapped float32 matrix, so memory stays flat, building the BM25
+    index over the chunk texts alongside. The snapshot is published
+    atomically and picked up by running backends on their next reload check.
+    """
+    count = qdrant_client.count(QDRANT_COLLECTION_NAME, exact=True).count
+    print(f"Exporting {count} points to local snapshot at {output_dir}...")
+    writer = SnapshotWriter(output_dir, count=count, dim=EMBEDDING_SIZE)
+
+    for points in iter_collection_pages(with_vectors=True, page_size=page_size):
+        writer.add(
+            [point.id for point in points],
+            [point.vector for point in points],
+            [point.payload for point in points],
+        )
+
+    writer.commit({"collection": QDRANT_COLLECTION_NAME, "model": EMBEDDING_MODEL})
+    mark_index_updated()
+
+def export_chunk_store(output_dir: str = CHUNK_STORE_PATH, page_size: int = 256):
+    """
+    Export every point's payload to the local chunk store.
+
+    The backend then asks Qdrant only for IDs and scores and reads chunk
+    texts from the memory-mapped store. Exported from the collection (not
+    the files parsed in this run) so incremental runs yield a complete store.
+    """
+    print(f"Exporting chunk payloads to {output_dir}...")
+    points = (
+        (point.id, point.payload)
+        for page in iter_collection_pages(with_vectors=False, page_size=page_size)
+        for point in page
+    )
+    publish_chunk_store(output_dir, points, {"collection": QDRANT_COLLECTION_NAME})
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the textbook docs into Qdrant.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed new or changed chunks and delete stale points (uses the manifest).",
+    )
+    parser.add_argument(
+        "--recreate",
+        action="store_true",
+        help="Drop and recreate the collection, rebuilding it from the embedding store where possible.",
+    )
+    parser.add_argument(
+        "--export-local",
+        action="store_true",
+        help="After ingesting, export the collection as a snapshot for the local vector backend "
+        "(done on every run unless HYBRID_SEARCH=false, since it carries the BM25 index).",
+    )
+    parser.add_argument(
+        "--strict-chunks",
+        action="store_true",
+        default=STRICT_CHUNKS,
+        help="Split over-long sentences so no chunk exceeds the chunk size (changes chunk boundaries).",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=PARSE_WORKERS,
+        help="Processes used for parsing and chunking (1 = inline).",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=QUANTIZATION_KINDS,
+        default=QUANTIZATION,
+        help="Vector quantization for a new collection: scalar (int8, 4x smaller) or binary (32x smaller).",
+    )
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M, help="HNSW graph degree for a new collection.")
+    parser.add_argument(
+        "--hnsw-ef-construct", type=int, default=HNSW_EF_CONSTRUCT, help="HNSW build-time candidate list size."
+    )
+    parser.add_argument(
+        "--vectors-on-disk",
+        action=argparse.BooleanOptionalAction,
+        default=VECTORS_ON_DISK,
+        help="Keep original vectors on disk (quantized vectors stay in RAM); "
+        "--no-vectors-on-disk overrides INGEST_VECTORS_ON_DISK.",
+    )
+    parser.add_argument(
+        "--update-index-config",
+        action="store_true",
+        help="Apply the index options above to an existing collection (Qdrant re-indexes in the background).",
+    )
+    args = parser.parse_args()
+    index_config = {
+        "quantization": args.quantization,
+        "hnsw_m": args.hnsw_m,
+        "hnsw_ef_construct": args.hnsw_ef_construct,
+        "vectors_on_disk": args.vectors_on_disk,
+    }
+
+    if args.incremental and args.recreate:
+        parser.error("--recreate rebuilds the whole collection and cannot be combined with --incremental")
+
     if not QDRANT_URL or not QDRANT_API_KEY or not GEMINI_API_KEY:
         print("Error: Missing environment variables")
         print("Set QDRANT_URL, QDRANT_API_KEY, GEMINI_API_KEY in .env")
     else:
-        ingest_documents(docs_path=DOCS_PATH)
+        embedding_store = EmbeddingStore(EMBEDDING_STORE_PATH) if EMBEDDING_STORE_ENABLED else None
+        try:
+            if args.incremental:
+                ingest_documents_incremental(
+                    docs_path=DOCS_PATH,
+                    embedding_store=embedding_store,
+                    parse_workers=args.parse_workers,
+                    strict_chunks=args.strict_chunks,
+                    index_config=index_config,
+                    update_index_config=args.update_index_config,
+                )
+            else:
+                ingest_documents(
+                    docs_path=DOCS_PATH,
+                    embedding_store=embedding_store,
+                    recreate=args.recreate,
+                    parse_workers=args.parse_workers,
+                    strict_chunks=args.strict_chunks,
+                    index_config=index_config,
+                    update_index_config=args.update_index_config,
+                )
+            if CHUNK_STORE_ENABLED:
+                export_chunk_store()
+            if args.export_local or LEXICAL_INDEX_ENABLED:
+                export_local_snapshot()
+        finally:
+            if embedding_store is not None:
+                embedding_store.close()
@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS, REGISTRY
+
+load_dotenv()
+
+# --- Admission Control Configuration ---
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Pipelines allowed to run at once; further requests wait in a bounded queue
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+# Fast-lane requests are served as if they had queued this much longer
+ADMISSION_FAST_LANE_BOOST_SECONDS = float(os.getenv("ADMISSION_FAST_LANE_BOOST_SECONDS", "2"))
+# Queries up to this many words (without history) take the fast lane
+ADMISSION_SHORT_QUERY_WORDS = int(os.getenv("ADMISSION_SHORT_QUERY_WORDS", "12"))
+
+# --- Per-Client Rate Limit Configuration ---
+# Token bucket per client; 0 disables rate limiting
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Header identifying the client (e.g. set by a proxy); defaults to the peer address
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "")
+
+FAST_LANE = "fast"
+NORMAL_LANE = "normal"
+
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class AdmissionRejected(Exception):
+    """A request turned away by admission control, with the HTTP status to return."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"Request rejected ({reason}); retry after {retry_after}s")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Takes one token. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets, keeping the most recently seen `max_clients`."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, client_id: str) -> float:
+        """Returns 0 if the client may proceed, else seconds until it may."""
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket.take()
+
+
+class AdmissionTicket:
+    """`weight` held pipeline slots. release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", weight: int = 1):
+        self._controller = controller
+        self.weight = weight
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self.weight, time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Bounds concurrent RAG pipelines.
+
+    Up to `max_concurrent` requests run at once; the next `max_queue` wait
+    for a slot (fast lane first, with aging so the normal lane is never
+    starved) for at most `queue_timeout` seconds. Anything beyond that is
+    rejected immediately with 503, and clients over their rate limit with
+    429, so overload costs a fast rejection instead of everyone's latency.
+
+    A request that fans out into several pipelines (e.g. a batch) takes a
+    ticket of that weight, holding as many slots. Waiters are served strictly
+    in priority order, so a heavy request at the head of the queue is not
+    starved by lighter ones slipping into partially freed capacity.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        fast_lane_boost: float = ADMISSION_FAST_LANE_BOOST_SECONDS,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.fast_lane_boost = fast_lane_boost
+        self.rate_limiter = rate_limiter
+
+        # Slots held, counting each ticket's weight
+        self.active = 0
+        # Heap of (priority key, sequence, lane, weight, future); cancelled entries are skipped lazily
+        self._waiters: list = []
+        self._queued = {FAST_LANE: 0, NORMAL_LANE: 0}
+        self._sequence = itertools.count()
+        # Smoothed time a slot is held, used for Retry-After estimates
+        self._service_seconds = 1.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self._register_metrics()
+        print(
+            f"[INFO] AdmissionController initialized (max_concurrent={self.max_concurrent}, "
+            f"max_queue={max_queue}, queue_timeout={queue_timeout}s, "
+            f"rate_limit={'%g/s' % rate_limiter.rate if rate_limiter else 'off'})"
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def _retry_after(self) -> int:
+        """Rough time until a newly queued request would get a slot."""
+        estimate = self._service_seconds * (self.queue_depth + 1) / self.max_concurrent
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(estimate)))
+
+    def _reject(self, status_code: int, reason: str, retry_after: int) -> AdmissionRejected:
+        self.rejected += 1
+        ADMISSION_REJECTIONS.inc(reason)
+        print(f"[WARN] Admission rejected a request ({reason}, retry after {retry_after}s).")
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    async def admit(
+        self, client_id: Optional[str] = None, lane: str = NORMAL_LANE, weight: int = 1
+    ) -> AdmissionTicket:
+        """
+        Waits for `weight` pipeline slots (capped at max_concurrent).
+
+        Raises:
+            AdmissionRejected: 429 if the client is over its rate limit, 503
+                if the queue is full or the wait exceeds the queue timeout.
+        """
+        if self.rate_limiter is not None and client_id is not None:
+            wait = self.rate_limiter.check(client_id)
+            if wait > 0:
+                raise self._reject(429, "rate_limited", min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(wait))))
+
+        weight = min(max(1, weight), self.max_concurrent)
+        start = time.monotonic()
+        if self.active + weight <= self.max_concurrent and self.queue_depth == 0:
+            self.active += weight
+        else:
+            if self.queue_depth >= self.max_queue:
+                raise self._reject(503, "queue_full", self._retry_after())
+            await self._wait_for_slot(lane, weight, start)
+
+        self.admitted += 1
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, lane)
+        return AdmissionTicket(self, weight)
+
+    async def _wait_for_slot(self, lane: str, weight: int, start: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        priority = start - (self.fast_lane_boost if lane == FAST_LANE else 0.0)
+        heapq.heappush(self._waiters, (priority, next(self._sequence), lane, weight, future))
+        self._queued[lane] += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The entry is now cancelled and skipped when popped; waiters
+            # behind it may fit now
+            self._queued[lane] -= 1
+            self._hand_over()
+            raise self._reject(503, "queue_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled just after being handed the slots: give them back
+                self.active -= weight
+            else:
+                self._queued[lane] -= 1
+            # Freed slots, or a heavy waiter leaving the queue, may let others in
+            self._hand_over()
+            raise
+
+    def _release(self, weight: int, held_seconds: float) -> None:
+        self._service_seconds = 0.9 * self._service_seconds + 0.1 * held_seconds
+        self.active -= weight
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        """Gives free slots to waiters in priority order while the next one fits."""
+        while self._waiters:
+            _, _, lane, weight, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.active + weight > self.max_concurrent:
+                return
+            heapq.heappop(self._waiters)
+            self._queued[lane] -= 1
+            self.active += weight
+            future.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": dict(self._queued),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    def _register_metrics(self) -> None:
+        def in_flight():
+            yield {}, self.active
+
+        def queue_depth():
+            for lane, depth in self._queued.items():
+                yield {"lane": lane}, depth
+
+        REGISTRY.register_callback(
+            "rag_admission_in_flight", "gauge", "Pipeline slots currently held.", in_flight
+        )
+        REGISTRY.register_callback(
+            "rag_admission_queue_depth", "gauge", "Requests waiting for a pipeline slot.", queue_depth
+        )
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Answer Cache Configuration ---
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+# Written by scripts/ingest.py after every run; a change invalidates the cache.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_VERSION_PATH = os.getenv(
+    "RAG_INDEX_VERSION_PATH", os.path.join(PROJECT_ROOT, "data", "index_version")
+)
+
+
+def hash_history(chat_history: List[Dict], summary: str = "") -> str:
+    """Returns a stable hash of the conversation history and summary ("" when both are empty)."""
+    if not chat_history and not summary:
+        return ""
+    turns = [[msg.get("user", ""), msg.get("ai", "")] for msg in chat_history]
+    encoded = json.dumps([summary, turns] if summary else turns, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def citation_key(point_ids) -> Tuple[str, ...]:
+    """Returns an order-independent key for a set of retrieved point IDs."""
+    return tuple(sorted(str(point_id) for point_id in point_ids))
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers and serves them for semantically similar queries.
+
+    A stored answer is reused when the new query embedding has cosine similarity
+    above the threshold with a previously answered query, the retrieved
+    citation set is identical and the chat history hash matches.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        index_version_path: Optional[str] = INDEX_VERSION_PATH,
+    ):
+        """Initializes an empty cache."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version_path = index_version_path
+
+        # Unit-normalized query embeddings, one row per slot (allocated lazily
+        # once the embedding dimension is known).
+        self._vectors: Optional[np.ndarray] = None
+        self._slots: Dict[int, dict] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._groups: Dict[tuple, List[int]] = {}
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._index_version = self._read_index_version()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        print(
+            f"[INFO] SemanticAnswerCache initialized (max_entries={max_entries}, "
+            f"threshold={similarity_threshold}, ttl={ttl_seconds}s)"
+        )
+
+    def _read_index_version(self):
+        if not self.index_version_path:
+            return None
+        try:
+            return os.stat(self.index_version_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_index_version(self) -> None:
+        version = self._read_index_version()
+        if version != self._index_version:
+            print("[INFO] Index version changed. Invalidating answer cache.")
+            self._index_version = version
+            self.invalidate()
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(self, query_embedding, citations_key: tuple, history_key: str) -> Optional[Dict]:
+        """
+        Finds a cached answer for a semantically equivalent query.
+
+        Args:
+            query_embedding: The embedding of the new query.
+            citations_key: Key of the retrieved citation set (see citation_key).
+            history_key: Hash of the chat history (see hash_history).
+
+        Returns:
+            A copy of the cached result dictionary, or None on a miss.
+        """
+        self._check_index_version()
+
+        slots = self._groups.get((citations_key, history_key))
+        query = self._normalize(query_embedding) if slots else None
+        if query is None or self._vectors is None or query.shape[0] != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        for slot in [s for s in slots if self._slots[s]["expires_at"] <= now]:
+            self._remove(slot)
+        slots = self._groups.get((citations_key, history_key))
+        if not slots:
+            self.misses += 1
+            return None
+
+        similarities = self._vectors[slots] @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        slot = slots[best]
+        self._lru.move_to_end(slot)
+        self.hits += 1
+        result = self._slots[slot]["result"]
+        return {**result, "citations": [dict(c) for c in result["citations"]]}
+
+    def store(self, query_embedding, citations_key: tuple, history_key: str, result: Dict) -> None:
+        """
+        Stores a generated answer.
+
+        Args:
+            query_embedding: The embedding of the answered query.
+            citations_key: Key of the retrieved citation set.
+            history_key: Hash of the chat history.
+            result: The result dictionary returned by the RAG pipeline.
+        """
+        query = self._normalize(query_embedding)
+        if query is None:
+            return
+
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+        elif query.shape[0] != self._vectors.shape[1]:
+            return
+
+        if not self._free_slots:
+            oldest_slot = next(iter(self._lru))
+            self._remove(oldest_slot)
+            self.evictions += 1
+
+        slot = self._free_slots.pop()
+        group = (citations_key, history_key)
+        self._vectors[slot] = query
+        self._slots[slot] = {
+            "group": group,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+            "result": {**result, "citations": [dict(c) for c in result.get("citations", [])]},
+        }
+        self._lru[slot] = None
+        self._groups.setdefault(group, []).append(slot)
+
+    def _remove(self, slot: int) -> None:
+        entry = self._slots.pop(slot)
+        self._lru.pop(slot, None)
+        group_slots = self._groups[entry["group"]]
+        group_slots.remove(slot)
+        if not group_slots:
+            del self._groups[entry["group"]]
+        self._free_slots.append(slot)
+
+    def invalidate(self) -> None:
+        """Drops every cached answer."""
+        self._slots.clear()
+        self._lru.clear()
+        self._groups.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
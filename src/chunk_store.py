@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import shutil
+import time
+import traceback
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Serve chunk payloads from the local store and ask Qdrant only for IDs and scores
+CHUNK_STORE_ENABLED = os.getenv("CHUNK_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH") or os.path.join(PROJECT_ROOT, "data", "chunk_store")
+CHUNK_STORE_RELOAD_INTERVAL = float(os.getenv("CHUNK_STORE_RELOAD_INTERVAL", "5"))
+
+BLOB_FILE = "chunks.bin"
+INDEX_FILE = "chunks_index.npy"
+# Pointer file naming the active store directory; replaced atomically.
+CURRENT_FILE = "CURRENT"
+VERSIONS_TO_KEEP = 2
+
+# One row per point, in insertion order: the text and the remaining payload
+# (as JSON) are stored back to back at `offset` in the blob.
+INDEX_DTYPE = np.dtype([("id", "<i8"), ("offset", "<i8"), ("text_len", "<i4"), ("meta_len", "<i4")])
+
+
+class ChunkStoreWriter:
+    """
+    Streams point payloads into a chunk store in `directory`: one blob of
+    UTF-8 chunk texts and JSON metadata, plus a fixed-width offset index.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._blob = open(os.path.join(directory, BLOB_FILE), "wb")
+        self._rows: List[tuple] = []
+        self._offset = 0
+
+    def add(self, point_id: int, payload: Optional[Dict]) -> None:
+        """Appends one point's payload."""
+        payload = dict(payload or {})
+        text = payload.pop("text", "").encode("utf-8")
+        meta = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._blob.write(text)
+        self._blob.write(meta)
+        self._rows.append((int(point_id), self._offset, len(text), len(meta)))
+        self._offset += len(text) + len(meta)
+
+    def close(self) -> int:
+        """Flushes the blob and writes the index. Returns the number of points."""
+        self._blob.close()
+        np.save(os.path.join(self.directory, INDEX_FILE), np.array(self._rows, dtype=INDEX_DTYPE))
+        return len(self._rows)
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped chunk store.
+
+    Payloads are decoded straight from the mapped file when requested, so
+    opening a store costs only the offset index and memory is shared with
+    the page cache. Rows can be read by position (as a sequence, matching
+    the order they were written) or by point ID.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index = np.load(os.path.join(directory, INDEX_FILE))
+        with open(os.path.join(directory, BLOB_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap cannot map an empty file
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mmap) if self._mmap is not None else memoryview(b"")
+
+        ids = self.index["id"]
+        self._id_order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._id_order]
+
+        expected = int(self.index["offset"][-1] + self.index["text_len"][-1] + self.index["meta_len"][-1]) if len(ids) else 0
+        if expected != len(self._view):
+            raise ValueError(f"Chunk store at {directory} is inconsistent ({expected} != {len(self._view)} bytes)")
+
+    def __len__(self) -> int:
+        return int(self.index.shape[0])
+
+    def __getitem__(self, row: int) -> Dict:
+        _, offset, text_len, meta_len = self.index[row]
+        view = self._view[offset:offset + text_len + meta_len]
+        payload = json.loads(str(view[text_len:], "utf-8"))
+        payload["text"] = str(view[:text_len], "utf-8")
+        return payload
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def rows_for(self, point_ids: Sequence[int]) -> np.ndarray:
+        """Row positions of the given IDs (-1 where an ID is not stored)."""
+        if len(self) == 0:
+            return np.full(len(point_ids), -1, dtype=np.int64)
+        wanted = np.asarray(point_ids, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, wanted)
+        positions = np.minimum(positions, len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == wanted
+        return np.where(found, self._id_order[positions], -1)
+
+    def get_many(self, point_ids: Sequence[int]) -> List[Optional[Dict]]:
+        """Payloads for the given IDs, None where an ID is not stored."""
+        return [self[row] if row >= 0 else None for row in self.rows_for(point_ids)]
+
+    def get(self, point_id: int) -> Optional[Dict]:
+        return self.get_many([point_id])[0]
+
+
+def publish_chunk_store(base_dir: str, points: Iterable, metadata: Optional[Dict] = None) -> str:
+    """
+    Writes a new chunk store version under base_dir from (id, payload)
+    pairs and makes it the active one by swapping the CURRENT pointer.
+    Running servers pick it up on their next reload check.
+    """
+    now_ns = time.time_ns()
+    version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now_ns // 10**9))}.{now_ns % 10**9:09d}"
+    directory = os.path.join(base_dir, version)
+    writer = ChunkStoreWriter(directory)
+    for point_id, payload in points:
+        writer.add(point_id, payload)
+    count = writer.close()
+    with open(os.path.join(directory, "chunk_store.json"), "w", encoding="utf-8") as f:
+        json.dump({**(metadata or {}), "version": version, "count": count}, f)
+
+    tmp_pointer = os.path.join(base_dir, f"{CURRENT_FILE}.tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(base_dir, CURRENT_FILE))
+
+    versions = sorted(entry for entry in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, entry)))
+    for old_version in versions[:-VERSIONS_TO_KEEP]:
+        if old_version != version:
+            shutil.rmtree(os.path.join(base_dir, old_version), ignore_errors=True)
+    print(f"[INFO] Chunk store {version} published ({count} points).")
+    return directory
+
+
+class ChunkStoreLoader:
+    """
+    Tracks the active chunk store under a base directory, reopening it when
+    the CURRENT pointer changes (checked at most every reload_interval seconds).
+    """
+
+    def __init__(self, base_dir: str = CHUNK_STORE_PATH, reload_interval: float = CHUNK_STORE_RELOAD_INTERVAL):
+        self.base_dir = base_dir
+        self.reload_interval = reload_interval
+        self.store: Optional[ChunkStore] = None
+        self.version: Optional[str] = None
+        self._next_reload_check = 0.0
+
+    def current(self) -> Optional[ChunkStore]:
+        """Returns the active store, or None if none has been published."""
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return self.store
+        self._next_reload_check = now + self.reload_interval
+
+        try:
+            with open(os.path.join(self.base_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+                version = f.read().strip() or None
+        except OSError:
+            version = None
+        if version is None or version == self.version:
+            return self.store
+
+        try:
+            store = ChunkStore(os.path.join(self.base_dir, version))
+        except Exception as e:
+            print(f"[ERROR] Failed to open chunk store {version}: {e}. Keeping current store.")
+            traceback.print_exc()
+            return self.store
+
+        # In-flight readers keep the previous mapping until they drop it
+        self.store, self.version = store, version
+        print(f"[INFO] Opened chunk store {version} ({len(store)} points).")
+        return store
@@ -0,0 +1,149 @@
+"""
+Document parsing and chunking for ingestion.
+
+Kept free of import-time side effects (no clients, no environment checks)
+so ingestion can run it in worker processes.
+"""
+import hashlib
+import os
+import re
+from typing import Dict, List
+
+CHUNK_SIZE = 700  # words
+CHUNK_OVERLAP = 100  # words
+
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, strict: bool = False) -> List[str]:
+    """
+    Splits text into chunks of whole sentences, about `chunk_size` words
+    long, each starting with the last `overlap` words of the previous chunk.
+
+    The text is tokenized once into a word array with sentence offsets, and
+    every chunk is a contiguous word range (overlaps are sliced from the
+    array, never re-split), so the whole pass is linear in the text length.
+
+    With `strict=False` the output is identical to the original
+    sentence-accumulating chunker, whose boundaries existing point IDs
+    depend on. With `strict=True`, sentences longer than
+    `chunk_size - overlap` words are split so that no chunk exceeds
+    `chunk_size` words (this changes boundaries, so it is opt-in).
+
+    Args:
+        text: Input text to chunk
+        chunk_size: Target chunk size in words
+        overlap: Number of words to overlap between chunks
+        strict: Hard-cap chunks at chunk_size words
+
+    Returns:
+        List of text chunks
+    """
+    # Tokenize once: a flat word array, with each sentence recorded as
+    # (text, first word index, word count)
+    words: List[str] = []
+    units = []
+    for sentence in _SENTENCE_BREAK_RE.split(text):
+        sentence_words = sentence.split()
+        first, count = len(words), len(sentence_words)
+        words.extend(sentence_words)
+        if strict and count > chunk_size - overlap:
+            piece = max(1, chunk_size - overlap)
+            for piece_start in range(first, first + count, piece):
+                piece_end = min(piece_start + piece, first + count)
+                units.append((" ".join(words[piece_start:piece_end]), piece_start, piece_end - piece_start))
+        else:
+            units.append((sentence, first, count))
+
+    chunks = []
+    # The current chunk covers words[chunk_start:chunk_end]: an optional
+    # overlap prefix followed by units[unit_start:unit_end].
+    chunk_start = chunk_end = 0
+    prefix = None
+    unit_start = unit_end = 0
+
+    def render() -> str:
+        parts = [unit[0] for unit in units[unit_start:unit_end]]
+        if prefix is not None:
+            parts.insert(0, prefix)
+        return " ".join(parts)
+
+    for index, (_, first, count) in enumerate(units):
+        if (chunk_end - chunk_start) + count <= chunk_size:
+            if unit_end == unit_start and prefix is None:
+                chunk_start = first
+            unit_end = index + 1
+            chunk_end = first + count
+            continue
+
+        has_content = unit_end > unit_start or prefix is not None
+        if has_content:
+            chunks.append(render())
+
+        if overlap > 0 and has_content:
+            overlap_start = max(chunk_start, chunk_end - overlap)
+            prefix = " ".join(words[overlap_start:chunk_end])
+            chunk_start = overlap_start
+        else:
+            prefix = None
+            chunk_start = first
+        unit_start, unit_end = index, index + 1
+        chunk_end = first + count
+
+    if unit_end > unit_start or prefix is not None:
+        chunks.append(render())
+
+    return chunks if chunks else [text]
+
+
+def extract_markdown_content(filepath: str) -> Dict:
+    """Extract content from markdown file."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    frontmatter_match = re.match(r'---\n(.*?)\n---\n(.*)', content, re.DOTALL)
+    if frontmatter_match:
+        frontmatter_str = frontmatter_match.group(1)
+        markdown_text = frontmatter_match.group(2).strip()
+
+        # FIX: Correct regex pattern
+        doc_id_match = re.search(r'id:\s*(.*)', frontmatter_str)
+        title_match = re.search(r"title:\s*['\"]?(.*?)['\"]?", frontmatter_str)
+
+        doc_id = doc_id_match.group(1).strip() if doc_id_match else os.path.splitext(os.path.basename(filepath))[0]
+        title = title_match.group(1).strip() if title_match else "No Title"
+
+        # FIX: Correct regex patterns (remove extra backslashes)
+        markdown_text = re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)
+        markdown_text = re.sub(r'\[.*?\]\(.*?\)', '', markdown_text)
+
+        return {"id": doc_id, "title": title, "text": markdown_text, "filepath": filepath}
+
+    return {"id": os.path.splitext(os.path.basename(filepath))[0], "title": "No Title", "text": content.strip(), "filepath": filepath}
+
+
+def build_chunk_records(filepath: str, relative_path: str, strict_chunks: bool = False) -> List[Dict]:
+    """Parse and chunk one document into point records (ID + payload)."""
+    doc_info = extract_markdown_content(filepath)
+    display_path = re.sub(r'^\d{2}-', '', os.path.splitext(relative_path)[0])
+
+    doc_chunks = chunk_text(doc_info["text"], strict=strict_chunks)
+    print(f"Processing '{filepath}': {len(doc_chunks)} chunks.")
+
+    records = []
+    for i, chunk in enumerate(doc_chunks):
+        chunk_id_str = f"{doc_info['id']}-{i}-{hashlib.md5(chunk.encode()).hexdigest()[:8]}"
+        point_id = int(hashlib.sha256(chunk_id_str.encode()).hexdigest(), 16) % (10**9)
+
+        records.append({
+            "id": point_id,
+            "text_hash": hashlib.sha256(chunk.encode()).hexdigest(),
+            "payload": {
+                "text": chunk,
+                "doc_id": doc_info["id"],
+                "title": doc_info["title"],
+                "chapter_path": display_path,
+                "chunk_number": i,
+            },
+        })
+    return records
@@ -0,0 +1,177 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Packing Configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+# Longest word overlap searched for between adjacent chunks (ingestion uses 100)
+MAX_OVERLAP_WORDS = int(os.getenv("CONTEXT_MAX_OVERLAP_WORDS", "200"))
+# Shorter matches are treated as coincidence, not chunking overlap
+MIN_OVERLAP_WORDS = 5
+# A segment that does not fit is truncated only if at least this much budget is left
+MIN_TRUNCATED_TOKENS = 128
+
+# Average characters per token for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (character count based, no tokenizer call)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text at a word boundary so it fits within max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens * CHARS_PER_TOKEN - 3)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "..." if cut else ""
+
+
+def _overlap_length(previous: Sequence[str], following: Sequence[str], max_words: int = MAX_OVERLAP_WORDS) -> int:
+    """Returns the longest k such that previous ends with following[:k]."""
+    for k in range(min(len(previous), len(following), max_words), MIN_OVERLAP_WORDS - 1, -1):
+        if previous[-k:] == following[:k]:
+            return k
+    return 0
+
+
+@dataclass
+class ContextSegment:
+    """Contiguous text from one document, merged from one or more hits."""
+
+    text: str
+    score: float
+    hits: List = field(default_factory=list)
+
+
+@dataclass
+class PackedContext:
+    """Result of packing: prompt-ready texts and the hits they came from."""
+
+    texts: List[str]
+    hits: List
+    tokens: int
+
+
+def _merge_document_hits(hits: List) -> List[ContextSegment]:
+    """
+    Merges hits of one document in chunk order, stripping the words that
+    adjacent chunks repeat from each other.
+    """
+    hits = sorted(hits, key=lambda hit: hit.payload.get("chunk_number", 0))
+    segments: List[ContextSegment] = []
+    previous_words: List[str] = []
+    previous_number = None
+
+    for hit in hits:
+        text = hit.payload.get("text", "")
+        words = text.split()
+        number = hit.payload.get("chunk_number")
+        adjacent = (
+            segments
+            and previous_number is not None
+            and number is not None
+            and number - previous_number == 1
+        )
+        overlap = _overlap_length(previous_words, words) if adjacent else 0
+
+        if adjacent and overlap:
+            segment = segments[-1]
+            remainder = " ".join(words[overlap:])
+            if remainder:
+                segment.text = f"{segment.text} {remainder}"
+            segment.score = max(segment.score, hit.score)
+            segment.hits.append(hit)
+        else:
+            segments.append(ContextSegment(text=text, score=hit.score, hits=[hit]))
+
+        previous_words = words
+        previous_number = number
+
+    return segments
+
+
+def pack_context(hits: List, token_budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Turns retrieved hits into a compact, budgeted list of context texts.
+
+    Hits from the same document are merged when their chunks are adjacent
+    (removing the chunking overlap), exact duplicates are dropped, and
+    segments are added best-score first while they fit in `token_budget`.
+    A segment that does not fit is truncated to the remaining budget when
+    enough of it is left (always for the best segment).
+
+    Args:
+        hits: Scored hits with a payload containing text, doc_id and chunk_number.
+        token_budget: Estimated token budget for all context texts together.
+
+    Returns:
+        A PackedContext with the texts (best first) and the hits they cover.
+    """
+    by_document: Dict[str, List] = {}
+    for hit in hits:
+        if not hit.payload or not hit.payload.get("text"):
+            continue
+        doc_key = hit.payload.get("doc_id") or hit.payload.get("chapter_path") or hit.payload.get("title", "")
+        by_document.setdefault(doc_key, []).append(hit)
+
+    segments = []
+    for doc_hits in by_document.values():
+        segments.extend(_merge_document_hits(doc_hits))
+    segments.sort(key=lambda segment: segment.score, reverse=True)
+
+    texts, used_hits, seen = [], [], set()
+    used_tokens = 0
+    for segment in segments:
+        if segment.text in seen:
+            continue
+        tokens = estimate_tokens(segment.text)
+        remaining = token_budget - used_tokens
+        if tokens <= remaining:
+            text = segment.text
+        elif not texts or remaining >= MIN_TRUNCATED_TOKENS:
+            text = truncate_to_tokens(segment.text, remaining)
+            tokens = estimate_tokens(text)
+        else:
+            continue
+        if not text:
+            continue
+        seen.add(segment.text)
+        texts.append(text)
+        used_hits.extend(segment.hits)
+        used_tokens += tokens
+
+    return PackedContext(texts=texts, hits=used_hits, tokens=used_tokens)
+
+
+def pack_history(chat_history: List[Dict], token_budget: int = HISTORY_TOKEN_BUDGET) -> List[Dict]:
+    """
+    Keeps the most recent conversation turns that fit in `token_budget`.
+
+    The latest turn is always kept (its answer truncated if necessary), so a
+    follow-up question does not lose the turn it refers to.
+
+    Returns:
+        The retained turns in chronological order.
+    """
+    packed: List[Dict] = []
+    used_tokens = 0
+    for message in reversed(chat_history):
+        tokens = estimate_tokens(message["user"]) + estimate_tokens(message["ai"])
+        if used_tokens + tokens > token_budget:
+            if not packed:
+                remaining = max(0, token_budget - estimate_tokens(message["user"]))
+                packed.append({"user": message["user"], "ai": truncate_to_tokens(message["ai"], remaining)})
+            break
+        packed.append(message)
+        used_tokens += tokens
+    packed.reverse()
+    return packed
@@ -0,0 +1,121 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Batching Configuration ---
+EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches concurrent embedding requests into one upstream call.
+
+    When no batch is in flight a request is sent immediately, so a single
+    caller pays no queueing delay. While a batch is in flight, new texts are
+    collected for up to `window_ms` (or until `max_batch_size` texts are
+    waiting) and then sent together; each caller receives its own vector.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[list]]],
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+    ):
+        """
+        Args:
+            embed_batch: Coroutine function embedding a list of texts and
+                returning one vector per text, in order.
+            window_ms: How long to collect texts while a batch is in flight.
+            max_batch_size: Maximum number of texts per upstream call.
+        """
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = 0
+        # Strong references to in-flight sends; the event loop only keeps weak ones
+        self._tasks: set = set()
+
+        self.requests = 0
+        self.batches = 0
+
+    async def embed(self, text: str) -> list:
+        """Queues a text and waits for its embedding."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size or (self._in_flight == 0 and self._timer is None):
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            # Callers that were cancelled while queued need no embedding.
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if batch:
+                self._in_flight += 1
+                self.batches += 1
+                task = asyncio.create_task(self._send(batch))
+                self._tasks.add(task)
+                task.add_done_callback(lambda task, batch=batch: self._sent(batch, task))
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Identical texts within one window are embedded once.
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await self.embed_batch(unique_texts)
+            if len(vectors) != len(unique_texts):
+                raise ValueError(
+                    f"Embedding batch returned {len(vectors)} vectors for {len(unique_texts)} inputs"
+                )
+            by_text = dict(zip(unique_texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _sent(self, batch: List[Tuple[str, asyncio.Future]], task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._in_flight -= 1
+        if task.cancelled():
+            # Cancelled (e.g. at loop shutdown), possibly before it even
+            # started: don't leave the callers waiting
+            for _, future in batch:
+                future.cancel()
+            return
+        # Texts that queued up behind this batch go out now rather than
+        # waiting for the rest of the window.
+        if self._in_flight == 0 and self._pending:
+            self._flush()
+
+    def stats(self) -> dict:
+        """Returns request/batch counters."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "pending": len(self._pending),
+            "in_flight": self._in_flight,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .embedding_store import EmbeddingStore
+
+load_dotenv()
+
+# --- Cache Configuration ---
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_MAX_ITEMS = int(os.getenv("EMBEDDING_CACHE_MAX_ITEMS", "10000"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")  # Optional on-disk tier
+# New entries reach the disk tier in batches, written off the event loop
+EMBEDDING_CACHE_FLUSH_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_CACHE_FLUSH_INTERVAL_SECONDS", "1.0"))
+EMBEDDING_CACHE_FLUSH_MAX_PENDING = int(os.getenv("EMBEDDING_CACHE_FLUSH_MAX_PENDING", "256"))
+
+# Rough per-entry bookkeeping cost (dict slot, tuple, array header).
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(text: str) -> str:
+    """Normalizes query text so trivial variations share a cache entry."""
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Bounded in-process LRU cache of query embeddings.
+
+    Entries are stored as float32 arrays and expire after a TTL. An optional
+    SQLite tier keeps embeddings across restarts. From async code use
+    aget/aget_many, which read the disk tier in a worker thread; puts reach
+    the disk in batches written behind by a background task, so the event
+    loop never waits on SQLite.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_items: int = EMBEDDING_CACHE_MAX_ITEMS,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS,
+        disk_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    ):
+        """Initializes the cache for a single embedding model."""
+        self.model_name = model_name
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self.disk_store = EmbeddingStore(disk_path) if disk_path else None
+        # Serializes disk access between worker threads and close()
+        self._disk_lock = threading.Lock()
+        # disk key -> vector not yet written; readable before it lands
+        self._pending_writes: Dict[str, np.ndarray] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        print(
+            f"[INFO] EmbeddingCache initialized (max_items={max_items}, "
+            f"max_bytes={max_bytes}, ttl={ttl_seconds}s, disk={'on' if self.disk_store else 'off'})"
+        )
+
+    def _disk_key(self, normalized: str) -> str:
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Looks up the embedding for a query, reading the disk tier inline.
+
+        For callers without an event loop; async code should use aget().
+
+        Args:
+            text: The raw query text.
+
+        Returns:
+            A read-only float32 array, or None on a miss.
+        """
+        key = normalize_query(text)
+        vector = self._get_memory(key)
+        if vector is None and self.disk_store is not None:
+            vector = (self._read_pending([key]) or self._read_disk([key])).get(key)
+            if vector is not None:
+                self._insert(key, vector)
+                self.disk_hits += 1
+        return self._count(vector)
+
+    async def aget(self, text: str) -> Optional[np.ndarray]:
+        """Like get(), with the disk lookup in a worker thread."""
+        return (await self.aget_many([text]))[0]
+
+    async def aget_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Looks up many queries: memory first, then the remaining misses in
+        one disk query run in a worker thread.
+
+        Returns:
+            One read-only float32 array (or None on a miss) per text.
+        """
+        keys = [normalize_query(text) for text in texts]
+        vectors = [self._get_memory(key) for key in keys]
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        if missing and self.disk_store is not None:
+            found = self._read_pending(missing)
+            remaining = [key for key in missing if key not in found]
+            if remaining:
+                found.update(await asyncio.to_thread(self._read_disk, remaining))
+            for i, key in enumerate(keys):
+                if vectors[i] is None and key in found:
+                    vectors[i] = found[key]
+                    self._insert(key, found[key])
+                    self.disk_hits += 1
+        return [self._count(vector) for vector in vectors]
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        vector, expires_at, _ = entry
+        if expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            return vector
+        self._remove(key)
+        return None
+
+    def _count(self, vector: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    def _read_pending(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Normalized key -> vector for keys put but not yet written to disk."""
+        found = {}
+        for key in keys:
+            vector = self._pending_writes.get(self._disk_key(key))
+            if vector is not None:
+                found[key] = vector
+        return found
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Normalized key -> vector for the keys stored on disk (runs in a worker thread)."""
+        disk_keys = {self._disk_key(key): key for key in keys}
+        with self._disk_lock:
+            stored = self.disk_store.get_many(
+                self.model_name, list(disk_keys), touch=False, max_age=self.ttl_seconds
+            )
+        return {disk_keys[disk_key]: vector for disk_key, vector in stored.items()}
+
+    def contains(self, text: str) -> bool:
+        """Whether a fresh embedding is held in memory (no disk lookup, not counted in stats)."""
+        entry = self._entries.get(normalize_query(text))
+        return entry is not None and entry[1] > time.monotonic()
+
+    def put(self, text: str, embedding) -> np.ndarray:
+        """
+        Stores an embedding for a query.
+
+        Args:
+            text: The raw query text.
+            embedding: The embedding as a list of floats or an array.
+
+        Returns:
+            The stored float32 array.
+        """
+        key = normalize_query(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.flags.writeable = False
+
+        self._insert(key, vector)
+        if self.disk_store is not None:
+            self._pending_writes[self._disk_key(key)] = vector
+            self._schedule_flush()
+        return vector
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop (synchronous caller): write through
+            self.flush()
+            return
+        self._flush_task = loop.create_task(self._write_behind())
+
+    async def _write_behind(self) -> None:
+        """Writes pending entries in batches until none are left."""
+        try:
+            while self._pending_writes:
+                if len(self._pending_writes) < EMBEDDING_CACHE_FLUSH_MAX_PENDING:
+                    await asyncio.sleep(EMBEDDING_CACHE_FLUSH_INTERVAL_SECONDS)
+                batch = dict(self._pending_writes)
+                await asyncio.to_thread(self._write_disk, batch)
+                for disk_key, vector in batch.items():
+                    # Keep entries that were replaced while the batch was written
+                    if self._pending_writes.get(disk_key) is vector:
+                        del self._pending_writes[disk_key]
+        finally:
+            self._flush_task = None
+
+    def _write_disk(self, batch: Dict[str, np.ndarray]) -> None:
+        with self._disk_lock:
+            self.disk_store.put_many(self.model_name, batch.items())
+
+    def flush(self) -> None:
+        """Writes all pending entries to the disk tier now (blocking)."""
+        if self.disk_store is not None and self._pending_writes:
+            batch, self._pending_writes = self._pending_writes, {}
+            self._write_disk(batch)
+
+    def _insert(self, key: str, vector: np.ndarray) -> None:
+        size = vector.nbytes + len(key) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (vector, time.monotonic() + self.ttl_seconds, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        """Drops all in-memory entries (the disk tier is left untouched)."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self) -> None:
+        """Writes pending entries and closes the on-disk tier, if any."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.disk_store is not None:
+            self.flush()
+            with self._disk_lock:
+                self.disk_store.close()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "pending_writes": len(self._pending_writes),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,257 @@
+import json
+import os
+import sqlite3
+import time
+import traceback
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# SQLite's default limit on bound parameters per statement is 999.
+_MAX_QUERY_PARAMS = 500
+
+
+class EmbeddingStore:
+    """Persistent SQLite store of float32 embeddings keyed by (model, key)."""
+
+    def __init__(self, path: str):
+        """Open (or create) the store at the given path."""
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + NORMAL sync keeps writes cheap; losing the last few entries
+        # on a crash only costs a re-embed.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL,
+                PRIMARY KEY (model, key)
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_used_at" not in columns:
+            self.conn.execute("ALTER TABLE embeddings ADD COLUMN last_used_at REAL")
+        self.conn.commit()
+        print(f"[INFO] EmbeddingStore opened at: {path}")
+
+    def get(self, model: str, key: str, max_age: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Look up a stored embedding.
+
+        Args:
+            model: The embedding model name.
+            key: The lookup key (usually a content hash).
+            max_age: Ignore entries older than this many seconds.
+
+        Returns:
+            A read-only float32 array, or None if not found.
+        """
+        try:
+            row = self.conn.execute(
+                "SELECT dim, vector, created_at FROM embeddings WHERE model = ? AND key = ?",
+                (model, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[ERROR] EmbeddingStore read failed: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        dim, blob, created_at = row
+        if max_age is not None and time.time() - created_at > max_age:
+            return None
+
+        vector = np.frombuffer(blob, dtype=np.float32)
+        if vector.shape[0] != dim:
+            return None
+        return vector
+
+    def get_many(
+        self, model: str, keys: List[str], touch: bool = True, max_age: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Look up many embeddings at once.
+
+        Args:
+            model: The embedding model name.
+            keys: The lookup keys.
+            touch: Record the lookup time, so compact() keeps entries in use.
+            max_age: Ignore entries older than this many seconds.
+
+        Returns:
+            A dict of key -> read-only float32 array for the keys that were found.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        try:
+            for start in range(0, len(unique_keys), _MAX_QUERY_PARAMS):
+                batch = unique_keys[start:start + _MAX_QUERY_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, dim, vector, created_at FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    (model, *batch),
+                ).fetchall()
+                for key, dim, blob, created_at in rows:
+                    if max_age is not None and time.time() - created_at > max_age:
+                        continue
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    if vector.shape[0] == dim:
+                        found[key] = vector
+
+            if touch and found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used_at = ? WHERE model = ? AND key = ?",
+                    [(now, model, key) for key in found],
+                )
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] EmbeddingStore batch read failed: {e}")
+        return found
+
+    def put(self, model: str, key: str, vector: np.ndarray) -> None:
+        """Insert or replace an embedding."""
+        self.put_many(model, [(key, vector)])
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        """Insert or replace many embeddings in a single transaction."""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model, key, int(vector.shape[0]), vector.tobytes(), now, now))
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vector, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] EmbeddingStore write failed: {e}")
+            traceback.print_exc()
+
+    def stats(self) -> List[Dict]:
+        """Returns entry counts and sizes per model."""
+        rows = self.conn.execute(
+            "SELECT model, COUNT(*), SUM(LENGTH(vector)), MIN(dim), MAX(dim) "
+            "FROM embeddings GROUP BY model ORDER BY model"
+        ).fetchall()
+        return [
+            {"model": model, "entries": count, "vector_bytes": size or 0, "dim": (min_dim, max_dim)}
+            for model, count, size, min_dim, max_dim in rows
+        ]
+
+    def compact(self, unused_for_seconds: Optional[float] = None, model: Optional[str] = None) -> int:
+        """
+        Drops stale entries and reclaims disk space.
+
+        Args:
+            unused_for_seconds: Delete entries not used or written for this long.
+            model: Only prune entries of this model (all models if None).
+
+        Returns:
+            The number of deleted entries.
+        """
+        deleted = 0
+        if unused_for_seconds is not None:
+            cutoff = time.time() - unused_for_seconds
+            query = "DELETE FROM embeddings WHERE COALESCE(last_used_at, created_at) < ?"
+            params: tuple = (cutoff,)
+            if model is not None:
+                query += " AND model = ?"
+                params += (model,)
+            deleted = self.conn.execute(query, params).rowcount
+            self.conn.commit()
+
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("VACUUM")
+        print(f"[INFO] EmbeddingStore compacted. Deleted {deleted} entries.")
+        return deleted
+
+    def export(self, output_dir: str, model: str) -> int:
+        """
+        Exports one model's embeddings as a float32 matrix plus a key index.
+
+        Writes `vectors.npy` (N x dim, memory-mappable with np.load(mmap_mode="r"))
+        and `keys.json` (row i of the matrix belongs to keys[i]).
+
+        Returns:
+            The number of exported embeddings.
+        """
+        rows = self.conn.execute(
+            "SELECT key, dim, vector FROM embeddings WHERE model = ? ORDER BY key",
+            (model,),
+        ).fetchall()
+        os.makedirs(output_dir, exist_ok=True)
+
+        dim = rows[0][1] if rows else 0
+        matrix = np.lib.format.open_memmap(
+            os.path.join(output_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(len(rows), dim)
+        )
+        keys = []
+        for i, (key, row_dim, blob) in enumerate(rows):
+            if row_dim != dim:
+                raise ValueError(f"Mixed embedding dimensions for model {model}: {dim} and {row_dim}")
+            matrix[i] = np.frombuffer(blob, dtype=np.float32)
+            keys.append(key)
+        matrix.flush()
+        del matrix
+
+        with open(os.path.join(output_dir, "keys.json"), "w", encoding="utf-8") as f:
+            json.dump({"model": model, "dim": dim, "keys": keys}, f)
+        print(f"[INFO] Exported {len(keys)} embeddings for {model} to {output_dir}")
+        return len(keys)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self.conn.close()
+
+
+def main():
+    """Maintenance commands for an embedding store."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and maintain an embedding store.")
+    parser.add_argument("path", help="Path to the SQLite embedding store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show entry counts per model")
+
+    compact_parser = subparsers.add_parser("compact", help="Prune unused entries and VACUUM")
+    compact_parser.add_argument("--unused-days", type=float, help="Delete entries unused for this many days")
+    compact_parser.add_argument("--model", help="Only prune entries of this model")
+
+    export_parser = subparsers.add_parser("export", help="Export vectors.npy + keys.json")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--model", required=True)
+
+    args = parser.parse_args()
+    store = EmbeddingStore(args.path)
+    try:
+        if args.command == "stats":
+            for row in store.stats():
+                print(f"  {row['model']}: {row['entries']} entries, "
+                      f"{row['vector_bytes'] / 1024 / 1024:.1f} MiB, dim={row['dim'][0]}")
+        elif args.command == "compact":
+            unused = args.unused_days * 86400 if args.unused_days is not None else None
+            store.compact(unused_for_seconds=unused, model=args.model)
+        elif args.command == "export":
+            store.export(args.output_dir, args.model)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+import traceback
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Health Monitor Configuration ---
+HEALTH_REFRESH_INTERVAL_SECONDS = float(os.getenv("HEALTH_REFRESH_INTERVAL_SECONDS", "15"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+# Probing Gemini is a metadata request (no tokens), but can be turned off
+HEALTH_PROBE_GEMINI = os.getenv("HEALTH_PROBE_GEMINI", "true").lower() in ("1", "true", "yes")
+
+
+class HealthMonitor:
+    """
+    Keeps a snapshot of dependency health, refreshed in the background.
+
+    Each refresh probes the vector backend (collection stats) and Gemini
+    concurrently, recording reachability, latency and errors. Health
+    endpoints serve the snapshot instead of probing on every poll, so load
+    balancers and uptime monitors cost nothing and see a stable answer.
+    """
+
+    def __init__(
+        self,
+        rag_engine,
+        interval: float = HEALTH_REFRESH_INTERVAL_SECONDS,
+        probe_timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS,
+        probe_gemini: bool = HEALTH_PROBE_GEMINI,
+    ):
+        self.rag_engine = rag_engine
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.probe_gemini = probe_gemini
+
+        self.snapshot: Optional[dict] = None
+        self._refreshed_at = 0.0  # monotonic time of the last refresh
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def _probe(self, probe) -> dict:
+        """Runs one probe, returning reachability, latency and any error."""
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(probe(), self.probe_timeout)
+            error = None
+        except asyncio.TimeoutError:
+            result, error = None, f"timed out after {self.probe_timeout:g}s"
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"[:200]
+        return {
+            "result": result,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error,
+        }
+
+    async def _probe_vector_db(self) -> dict:
+        vector_db = self.rag_engine.vector_db_client
+        probe = await self._probe(vector_db.get_collection_info)
+        info = probe.pop("result")
+        status = {"backend": vector_db.backend_name, "reachable": info is not None, **probe}
+        if info is not None:
+            status["collection"] = {
+                "name": vector_db.collection_name,
+                "points_count": info.points_count,
+                "status": str(getattr(info.status, "value", info.status)),
+            }
+        elif status["error"] is None:
+            status["error"] = "collection info unavailable"
+        return status
+
+    async def _probe_gemini(self) -> dict:
+        if not self.probe_gemini:
+            return {"reachable": None, "latency_ms": None, "error": None, "probed": False}
+        probe = await self._probe(self.rag_engine.gemini_agent_client.ping)
+        probe.pop("result")
+        return {"reachable": probe["error"] is None, **probe}
+
+    async def _refresh(self) -> dict:
+        vector_db, gemini = await asyncio.gather(self._probe_vector_db(), self._probe_gemini())
+        self.snapshot = {"checked_at": time.time(), "vector_db": vector_db, "gemini": gemini}
+        self._refreshed_at = time.monotonic()
+        return self.snapshot
+
+    async def refresh(self) -> dict:
+        """Probes all dependencies now; concurrent callers share one probe."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return await asyncio.shield(self._refresh_task)
+
+    async def get(self, fresh: bool = False) -> dict:
+        """Returns the latest snapshot, probing first if forced or if there is none yet."""
+        if fresh or self.snapshot is None:
+            await self.refresh()
+        return self.snapshot
+
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the snapshot was taken, or None if there is none."""
+        if self.snapshot is None:
+            return None
+        return round(time.monotonic() - self._refreshed_at, 3)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[ERROR] Health refresh failed: {e}")
+                traceback.print_exc()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Starts background refreshing on the running event loop."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+            print(f"[INFO] HealthMonitor refreshing every {self.interval:g}s.")
+
+    async def stop(self) -> None:
+        """Stops background refreshing."""
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop_task = None
@@ -0,0 +1,34 @@
+import importlib.util
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Connection Pool Configuration ---
+# One pool per dependency (Gemini, Qdrant), shared by all requests.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Idle connections are kept this long, so bursts after a quiet spell skip TLS setup
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "120"))
+# HTTP/2 multiplexes concurrent requests over one TLS connection; needs the
+# `h2` package (httpx[http2]) and is only negotiated over https.
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+    and importlib.util.find_spec("h2") is not None
+)
+
+
+def pool_limits() -> httpx.Limits:
+    """Connection limits for a dependency's shared pool."""
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def pool_options() -> dict:
+    """httpx client keyword arguments for a dependency's shared pool."""
+    return {"limits": pool_limits(), "http2": HTTP2_ENABLED}
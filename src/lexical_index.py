@@ -0,0 +1,155 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# BM25 parameters (Robertson/Sparck Jones defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no ranking signal and only bloat the postings.
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how if in into is it its
+of on or so such that the their then there these this to was what when where which
+who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and splits text into alphanumeric terms, dropping stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Builder:
+    """Accumulates documents and builds a BM25Index."""
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.term_ids: List[int] = []
+        self.rows: List[int] = []
+        self.tfs: List[int] = []
+        self.doc_lengths: List[int] = []
+
+    def add(self, text: str) -> None:
+        """Adds the next document (documents are numbered in insertion order)."""
+        row = len(self.doc_lengths)
+        tokens = tokenize(text)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocab.setdefault(term, len(self.vocab))
+            self.term_ids.append(term_id)
+            self.rows.append(row)
+            self.tfs.append(tf)
+
+    def build(self, k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """Sorts postings by term and precomputes per-posting BM25 weights."""
+        n_docs = len(self.doc_lengths)
+        term_ids = np.asarray(self.term_ids, dtype=np.int32)
+        rows = np.asarray(self.rows, dtype=np.int32)
+        tfs = np.asarray(self.tfs, dtype=np.float32)
+        doc_lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, rows, tfs = term_ids[order], rows[order], tfs[order]
+
+        doc_freq = np.bincount(term_ids, minlength=len(self.vocab))
+        offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=offsets[1:])
+
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1.0 - b + b * doc_lengths[rows] / avg_length) if n_docs else np.zeros(0)
+        weights = (idf[term_ids] * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        return BM25Index(terms, offsets, rows, weights, n_docs)
+
+
+class BM25Index:
+    """
+    In-process BM25 index with array-backed postings.
+
+    Postings for term t are rows[offsets[t]:offsets[t+1]] with precomputed
+    BM25 weights, so scoring a query is one vectorized scatter-add per term.
+    """
+
+    def __init__(self, terms: Sequence[str], offsets: np.ndarray, rows: np.ndarray, weights: np.ndarray, n_docs: int):
+        self.terms = list(terms)
+        self.vocab = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.n_docs = n_docs
+
+    def search(self, query: str, limit: int = 10, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Scores documents against a query, optionally only those in `rows`.
+
+        Returns:
+            Up to `limit` (row, score) pairs, best first, with score > 0.
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or self.n_docs == 0:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # Rows are unique within one posting list, so plain fancy-index add is safe.
+            scores[self.rows[start:end]] += self.weights[start:end]
+
+        if rows is not None:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[rows] = True
+            scores[~allowed] = 0.0
+
+        matched = np.flatnonzero(scores)
+        if matched.shape[0] > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(row), float(scores[row])) for row in matched]
+
+    def save(self, path: str) -> None:
+        """Writes the index as a single .npz file."""
+        np.savez(
+            path,
+            terms=np.asarray(self.terms, dtype=np.str_),
+            offsets=self.offsets,
+            rows=self.rows,
+            weights=self.weights,
+            n_docs=np.asarray(self.n_docs),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Loads an index written by save()."""
+        with np.load(path) as data:
+            return cls(
+                data["terms"].tolist(),
+                data["offsets"],
+                data["rows"],
+                data["weights"],
+                int(data["n_docs"]),
+            )
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence], k: int = 60) -> List:
+    """
+    Merges ranked lists of IDs with reciprocal-rank fusion.
+
+    Each ID scores sum(1 / (k + rank)) over the lists it appears in
+    (rank starting at 1).
+
+    Returns:
+        IDs ordered by fused score, best first.
+    """
+    fused: Dict = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -1,17 +1,30 @@
+import asyncio
 import os
 import traceback
+from typing import AsyncIterator
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, APIError
+from openai import AsyncOpenAI, APIError, DefaultAsyncHttpxClient
+
+from .embedding_batcher import EmbeddingBatcher, EMBEDDING_BATCHING_ENABLED, EMBEDDING_BATCH_MAX_SIZE
+from .embedding_cache import EmbeddingCache, EMBEDDING_CACHE_ENABLED
+from .http_clients import pool_options
+from .metrics import DEPENDENCY_SKIPS
+from .resilience import (
+    EMBED_TIMEOUT_SECONDS,
+    GENERATION_TIMEOUT_SECONDS,
+    CircuitOpenError,
+    get_breaker,
+    stage_timeout,
+)
 
 # Load environment variables
 load_dotenv()
 
 # --- Gemini Configuration ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment.")
 
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/"
+# Overridable so the client can be pointed at a local stand-in (see benchmarks/)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/")
 GEMINI_MODEL_NAME = "models/gemini-2.5-flash" 
 EMBEDDING_MODEL_NAME = "models/text-embedding-004"
 EXPECTED_EMBEDDING_DIM = 768
@@ -21,15 +34,63 @@ class GeminiAgentClient:
     """A client for interacting with Google Gemini models via an OpenAI-compatible interface."""
 
     def __init__(self, timeout=60):
-        """Initializes the asynchronous OpenAI client to point to Gemini's endpoint."""
+        """
+        Sets up caching and batching; the OpenAI client (pointing at
+        Gemini's endpoint) is created on first use.
+
+        `timeout` is only the HTTP client's backstop; calls are bounded by
+        the per-stage timeouts and the request deadline (see resilience.py)
+        and skipped while the endpoint's circuit breaker is open.
+        """
         print("[INFO] Initializing GeminiAgentClient...")
-        self.client = AsyncOpenAI(
-            api_key=GEMINI_API_KEY,
-            base_url=GEMINI_BASE_URL,
-            timeout=timeout,
+        self.timeout = timeout
+        self._client = None
+        self.embedding_cache = (
+            EmbeddingCache(EMBEDDING_MODEL_NAME) if EMBEDDING_CACHE_ENABLED else None
         )
+        self.embedding_batcher = (
+            EmbeddingBatcher(self._embed_batch) if EMBEDDING_BATCHING_ENABLED else None
+        )
+        self.embedding_breaker = get_breaker("gemini:embeddings")
+        self.generation_breaker = get_breaker("gemini:generation")
         print(f"[INFO] GeminiAgentClient initialized for model: {GEMINI_MODEL_NAME}")
 
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        The OpenAI-compatible client, created on first use with one pooled
+        (keep-alive, HTTP/2 when available) connection pool for all calls.
+
+        Raises:
+            ValueError: If no API key is configured.
+        """
+        if self._client is None:
+            if not GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment.")
+            self._client = AsyncOpenAI(
+                api_key=GEMINI_API_KEY,
+                base_url=GEMINI_BASE_URL,
+                timeout=self.timeout,
+                http_client=DefaultAsyncHttpxClient(timeout=self.timeout, **pool_options()),
+            )
+        return self._client
+
+    async def warm_up(self) -> None:
+        """Opens a connection to the endpoint with a one-word embedding request."""
+        await self._embed_batch(["warm-up"])
+
+    async def close(self) -> None:
+        """Closes the connection pool and the embedding cache."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+
+    async def ping(self) -> None:
+        """Checks that the endpoint is reachable and the key is accepted (lists models, no tokens used)."""
+        await self.client.models.list()
+
     async def get_embedding(self, text: str) -> list[float]:
         """
         Generates an embedding for the given text.
@@ -44,12 +105,25 @@ class GeminiAgentClient:
             print("[WARN] Attempted to embed empty or whitespace-only text.")
             return []
 
+        if self.embedding_cache is not None:
+            cached = await self.embedding_cache.aget(text)
+            if cached is not None:
+                print(f"[INFO] Embedding cache hit for text: '{text[:50]}...'")
+                return cached.tolist()
+
+        timeout = stage_timeout(EMBED_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            print("[WARN] Request deadline reached. Skipping embedding.")
+            DEPENDENCY_SKIPS.inc(self.embedding_breaker.name, "budget_exhausted")
+            return []
+
         try:
             print(f"[INFO] Generating embedding for text: '{text[:50]}...'")
-            response = await self.client.embeddings.create(
-                model=EMBEDDING_MODEL_NAME, input=[text]
-            )
-            embedding = response.data[0].embedding
+            if self.embedding_batcher is not None:
+                pending = self.embedding_batcher.embed(text)
+            else:
+                pending = self._embed_one(text)
+            embedding = await asyncio.wait_for(pending, timeout)
 
             if len(embedding) != EXPECTED_EMBEDDING_DIM:
                 print(
@@ -58,8 +132,18 @@ class GeminiAgentClient:
                 )
 
             print(f"[INFO] Embedding generated successfully. Size: {len(embedding)}")
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(text, embedding)
             return embedding
 
+        except CircuitOpenError as e:
+            print(f"[WARN] {e}. Skipping embedding.")
+            DEPENDENCY_SKIPS.inc(self.embedding_breaker.name, "circuit_open")
+            return []
+        except asyncio.TimeoutError:
+            print(f"[WARN] Embedding timed out after {timeout:.2f}s.")
+            DEPENDENCY_SKIPS.inc(self.embedding_breaker.name, "timeout")
+            return []
         except APIError as e:
             print(f"[ERROR] Gemini API error during embedding: {e}")
             traceback.print_exc()
@@ -69,6 +153,108 @@ class GeminiAgentClient:
             traceback.print_exc()
             return []
 
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds many texts at once (bulk requests).
+
+        Cached texts are served from the embedding cache; the distinct
+        remaining texts are sent in EMBEDDING_BATCH_MAX_SIZE batches,
+        concurrently, bypassing the micro-batcher.
+
+        Returns:
+            One embedding per input text, in order; an empty list for empty
+            texts and for texts whose batch failed.
+        """
+        embeddings: list[list[float]] = [[] for _ in texts]
+        missing: dict[str, list[int]] = {}
+        non_empty = [i for i, text in enumerate(texts) if text and text.strip()]
+        if self.embedding_cache is not None:
+            cached_vectors = await self.embedding_cache.aget_many([texts[i] for i in non_empty])
+        else:
+            cached_vectors = [None] * len(non_empty)
+        for i, cached in zip(non_empty, cached_vectors):
+            text = texts[i]
+            if cached is not None:
+                embeddings[i] = cached.tolist()
+            else:
+                missing.setdefault(text, []).append(i)
+        print(f"[INFO] Embedding {len(texts)} texts ({len(missing)} distinct uncached).")
+        if not missing:
+            return embeddings
+
+        if stage_timeout(EMBED_TIMEOUT_SECONDS) <= 0:
+            print("[WARN] Request deadline reached. Skipping embeddings.")
+            DEPENDENCY_SKIPS.inc(self.embedding_breaker.name, "budget_exhausted")
+            return embeddings
+
+        unique_texts = list(missing)
+        batches = [
+            unique_texts[start:start + EMBEDDING_BATCH_MAX_SIZE]
+            for start in range(0, len(unique_texts), EMBEDDING_BATCH_MAX_SIZE)
+        ]
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches), return_exceptions=True)
+
+        for batch, vectors in zip(batches, results):
+            if not isinstance(vectors, BaseException) and len(vectors) != len(batch):
+                # As in EmbeddingBatcher._send: never hand out vectors by a misaligned position
+                vectors = ValueError(f"Embedding batch returned {len(vectors)} vectors for {len(batch)} inputs")
+            if isinstance(vectors, BaseException):
+                reason = "circuit_open" if isinstance(vectors, CircuitOpenError) else (
+                    "timeout" if isinstance(vectors, asyncio.TimeoutError) else None
+                )
+                if reason:
+                    DEPENDENCY_SKIPS.inc(self.embedding_breaker.name, reason)
+                print(f"[ERROR] Embedding batch of {len(batch)} texts failed: {vectors!r}")
+                continue
+            for text, embedding in zip(batch, vectors):
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put(text, embedding)
+                for i in missing[text]:
+                    embeddings[i] = embedding
+        return embeddings
+
+    async def _embed_one(self, text: str) -> list[float]:
+        return (await self._embed_batch([text]))[0]
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds several texts with one API call, in input order.
+
+        The API does not guarantee the order of `data`, so items are placed by
+        their `index`. A batch serves several requests, so it is bounded by
+        EMBED_TIMEOUT_SECONDS rather than any one request's deadline.
+
+        Raises:
+            ValueError: If the response does not hold one embedding per text.
+        """
+        response = await self.embedding_breaker.call(
+            lambda: self.client.embeddings.create(model=EMBEDDING_MODEL_NAME, input=texts),
+            timeout=EMBED_TIMEOUT_SECONDS,
+        )
+        items = sorted(response.data, key=lambda item: item.index)
+        if [item.index for item in items] != list(range(len(texts))):
+            raise ValueError(f"Embedding response returned {len(items)} vectors for {len(texts)} inputs")
+        return [item.embedding for item in items]
+
+    def _generation_timeout(self) -> float:
+        """Generation timeout for the current request; raises if no budget is left."""
+        timeout = stage_timeout(GENERATION_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            DEPENDENCY_SKIPS.inc(self.generation_breaker.name, "budget_exhausted")
+            raise Exception("Request deadline reached before generation")
+        return timeout
+
+    def _generation_unavailable(self, error: Exception, timeout: float) -> Exception:
+        """Logs a skipped or timed-out generation call and returns the error to raise."""
+        if isinstance(error, CircuitOpenError):
+            DEPENDENCY_SKIPS.inc(self.generation_breaker.name, "circuit_open")
+            message = f"Gemini unavailable: {error}"
+        else:
+            DEPENDENCY_SKIPS.inc(self.generation_breaker.name, "timeout")
+            message = f"Gemini generation timed out after {timeout:.2f}s"
+        print(f"[ERROR] {message}")
+        return Exception(message)
+
     async def generate_content(self, prompt: str) -> str:
         """
         Generates content using the Gemini model.
@@ -78,19 +264,28 @@ class GeminiAgentClient:
         
         Returns:
             The generated text content, or an empty string on error.
+
+        Raises:
+            Exception: On API errors, timeouts, an open circuit or a spent request budget.
         """
+        timeout = self._generation_timeout()
         try:
             print("[INFO] Generating content with Gemini model...")
-            response = await self.client.chat.completions.create(
-                model=GEMINI_MODEL_NAME,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.5,
-                max_tokens=1500,
+            response = await self.generation_breaker.call(
+                lambda: self.client.chat.completions.create(
+                    model=GEMINI_MODEL_NAME,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.5,
+                    max_tokens=1500,
+                ),
+                timeout=timeout,
             )
             content = response.choices[0].message.content
             print("[INFO] Content generated successfully.")
             return content if content else ""
 
+        except (CircuitOpenError, asyncio.TimeoutError) as e:
+            raise self._generation_unavailable(e, timeout)
         except APIError as e:
             error_message = f"Gemini API error: {e}"                                                                   
             print(f"[ERROR] {error_message}")
@@ -101,6 +296,52 @@ class GeminiAgentClient:
             traceback.print_exc()
             return "Error: An unexpected error occurred while generating the response."
 
+    async def generate_content_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Streams content from the Gemini model as it is generated.
+
+        Closing the generator (e.g. when the client disconnects) closes the
+        upstream HTTP stream so no further tokens are generated for us.
+        Opening the stream is bounded by the request deadline; once tokens
+        flow, the stream runs to completion.
+
+        Args:
+            prompt: The complete prompt to send to the model.
+
+        Yields:
+            Text deltas in generation order.
+        """
+        timeout = self._generation_timeout()
+        try:
+            print("[INFO] Streaming content from Gemini model...")
+            stream = await self.generation_breaker.call(
+                lambda: self.client.chat.completions.create(
+                    model=GEMINI_MODEL_NAME,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.5,
+                    max_tokens=1500,
+                    stream=True,
+                ),
+                timeout=timeout,
+            )
+        except (CircuitOpenError, asyncio.TimeoutError) as e:
+            raise self._generation_unavailable(e, timeout)
+        except APIError as e:
+            error_message = f"Gemini API error: {e}"
+            print(f"[ERROR] {error_message}")
+            traceback.print_exc()
+            raise Exception(error_message)
+
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
 
 async def main():
     """Tests the GeminiAgentClient methods."""
@@ -0,0 +1,432 @@
+import json
+import os
+import shutil
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .chunk_store import INDEX_FILE as CHUNK_INDEX_FILE, ChunkStore, ChunkStoreWriter
+from .lexical_index import BM25Builder, BM25Index
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH") or os.path.join(PROJECT_ROOT, "data", "local_index")
+LOCAL_INDEX_RELOAD_INTERVAL = float(os.getenv("LOCAL_INDEX_RELOAD_INTERVAL", "5"))
+
+# Pointer file naming the active snapshot directory; replaced atomically.
+CURRENT_FILE = "CURRENT"
+SNAPSHOTS_TO_KEEP = 2
+
+
+@dataclass
+class SearchHit:
+    """A scored search result (mirrors the fields of Qdrant's ScoredPoint we use)."""
+    id: int
+    score: float
+    payload: Optional[Dict] = None
+    vector: Optional[List[float]] = None
+
+
+@dataclass
+class CollectionInfo:
+    """Collection statistics (mirrors the fields of Qdrant's CollectionInfo we use)."""
+    points_count: int
+    status: str
+    details: Dict = field(default_factory=dict)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SnapshotWriter:
+    """
+    Writes a local index snapshot: a normalized float32 vector matrix, point
+    IDs, payloads (as a memory-mapped chunk store) and a BM25 index over the
+    chunk texts, published atomically by swapping the CURRENT pointer.
+    """
+
+    def __init__(self, base_dir: str, count: int, dim: int):
+        """Prepares a new snapshot directory for `count` vectors of size `dim`."""
+        self.base_dir = base_dir
+        now_ns = time.time_ns()
+        self.version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now_ns // 10**9))}.{now_ns % 10**9:09d}"
+        self.snapshot_dir = os.path.join(base_dir, self.version)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        self.count = count
+        self.dim = dim
+        self.written = 0
+        self.vectors = np.lib.format.open_memmap(
+            os.path.join(self.snapshot_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dim)
+        )
+        self.ids = np.zeros(count, dtype=np.int64)
+        self.chunk_writer = ChunkStoreWriter(self.snapshot_dir)
+        self.lexical_builder = BM25Builder()
+
+    def add(self, ids: Iterable[int], vectors, payloads: Iterable[Dict]) -> None:
+        """Appends a batch of points."""
+        batch = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        end = self.written + batch.shape[0]
+        if end > self.count:
+            raise ValueError(f"Snapshot sized for {self.count} points, got at least {end}")
+        self.vectors[self.written:end] = batch
+        ids = list(ids)
+        self.ids[self.written:end] = ids
+        for point_id, payload in zip(ids, payloads):
+            self.chunk_writer.add(point_id, payload)
+            self.lexical_builder.add((payload or {}).get("text", ""))
+        self.written = end
+
+    def commit(self, metadata: Optional[Dict] = None) -> str:
+        """Flushes the snapshot and makes it the active one."""
+        if self.written != self.count:
+            raise ValueError(f"Snapshot expected {self.count} points but got {self.written}")
+        self.vectors.flush()
+        del self.vectors
+        self.chunk_writer.close()
+        np.save(os.path.join(self.snapshot_dir, "ids.npy"), self.ids)
+        self.lexical_builder.build().save(os.path.join(self.snapshot_dir, "bm25.npz"))
+        with open(os.path.join(self.snapshot_dir, "snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump({**(metadata or {}), "version": self.version, "count": self.count, "dim": self.dim}, f)
+
+        tmp_pointer = os.path.join(self.base_dir, f"{CURRENT_FILE}.tmp")
+        with open(tmp_pointer, "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(tmp_pointer, os.path.join(self.base_dir, CURRENT_FILE))
+        self._prune_old_snapshots()
+        print(f"[INFO] Local index snapshot {self.version} published ({self.count} points).")
+        return self.snapshot_dir
+
+    def _prune_old_snapshots(self) -> None:
+        versions = sorted(
+            entry for entry in os.listdir(self.base_dir)
+            if os.path.isdir(os.path.join(self.base_dir, entry))
+        )
+        for version in versions[:-SNAPSHOTS_TO_KEEP]:
+            if version != self.version:
+                shutil.rmtree(os.path.join(self.base_dir, version), ignore_errors=True)
+
+
+class LocalSnapshot:
+    """An immutable, loaded local index snapshot."""
+
+    def __init__(self, version: str, metadata: Dict, vectors: np.ndarray, ids: np.ndarray,
+                 payloads: Sequence[Dict], lexical: Optional[BM25Index] = None):
+        self.version = version
+        self.metadata = metadata
+        self.vectors = vectors
+        self.ids = ids
+        self.payloads = payloads
+        self.lexical = lexical
+        # Payload field -> {value: rows}, built on first scoped search
+        self._field_indexes: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def field_index(self, field: str) -> Dict[str, np.ndarray]:
+        """Inverted index of a payload field: value -> sorted row positions."""
+        index = self._field_indexes.get(field)
+        if index is None:
+            rows_by_value: Dict[str, List[int]] = {}
+            for row, payload in enumerate(self.payloads):
+                value = (payload or {}).get(field)
+                if value is not None:
+                    rows_by_value.setdefault(str(value), []).append(row)
+            index = {value: np.asarray(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+            self._field_indexes[field] = index
+        return index
+
+    def scope_rows(self, scope) -> Optional[np.ndarray]:
+        """Sorted rows matching a SearchScope, or None if there is no scope."""
+        if scope is None:
+            return None
+        rows = None
+        for field, values in scope.conditions().items():
+            index = self.field_index(field)
+            matches = [index[value] for value in values if value in index]
+            field_rows = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return rows
+
+    @classmethod
+    def load(cls, snapshot_dir: str, version: str) -> "LocalSnapshot":
+        """
+        Memory-maps the vectors and payloads and loads IDs and the lexical
+        index. Snapshots written before the chunk store keep their payloads
+        in payloads.jsonl, which is loaded into memory instead.
+        """
+        with open(os.path.join(snapshot_dir, "snapshot.json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(snapshot_dir, "ids.npy"))
+        if os.path.exists(os.path.join(snapshot_dir, CHUNK_INDEX_FILE)):
+            payloads = ChunkStore(snapshot_dir)
+            if not np.array_equal(payloads.index["id"], ids):
+                raise ValueError(f"Chunk store of snapshot {version} does not match its vectors")
+        else:
+            with open(os.path.join(snapshot_dir, "payloads.jsonl"), "r", encoding="utf-8") as f:
+                payloads = [json.loads(line) for line in f]
+
+        lexical_path = os.path.join(snapshot_dir, "bm25.npz")
+        lexical = BM25Index.load(lexical_path) if os.path.exists(lexical_path) else None
+
+        if not (vectors.shape[0] == ids.shape[0] == len(payloads) == metadata.get("count")):
+            raise ValueError(f"Local index snapshot {version} is inconsistent")
+        if lexical is not None and lexical.n_docs != ids.shape[0]:
+            raise ValueError(f"Lexical index of snapshot {version} does not match its vectors")
+        return cls(version, metadata, vectors, ids, payloads, lexical)
+
+
+class SnapshotLoader:
+    """
+    Tracks the active snapshot under a base directory and hot-reloads it
+    when the CURRENT pointer changes (checked at most every reload_interval
+    seconds). Shared by every local component reading the same directory.
+    """
+
+    def __init__(self, base_dir: str, reload_interval: float = LOCAL_INDEX_RELOAD_INTERVAL):
+        self.base_dir = base_dir
+        self.reload_interval = reload_interval
+        self.snapshot: Optional[LocalSnapshot] = None
+        self._next_reload_check = 0.0
+
+    def _read_current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.base_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def current(self) -> Optional[LocalSnapshot]:
+        """Returns the active snapshot, reloading it first if a new one was published."""
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return self.snapshot
+        self._next_reload_check = now + self.reload_interval
+
+        version = self._read_current_version()
+        if version is None or (self.snapshot is not None and version == self.snapshot.version):
+            return self.snapshot
+
+        try:
+            snapshot = LocalSnapshot.load(os.path.join(self.base_dir, version), version)
+        except Exception as e:
+            print(f"[ERROR] Failed to load local index snapshot {version}: {e}. Keeping current snapshot.")
+            traceback.print_exc()
+            return self.snapshot
+
+        # Swap the reference at once; in-flight searches keep the old snapshot.
+        self.snapshot = snapshot
+        print(f"[INFO] Loaded local index snapshot {version} ({snapshot.ids.shape[0]} points, "
+              f"lexical index {'present' if snapshot.lexical else 'absent'}).")
+        return snapshot
+
+
+_loaders: Dict[str, SnapshotLoader] = {}
+
+
+def get_snapshot_loader(base_dir: str = LOCAL_INDEX_PATH) -> SnapshotLoader:
+    """Returns the shared loader for a snapshot directory."""
+    key = os.path.abspath(base_dir)
+    if key not in _loaders:
+        _loaders[key] = SnapshotLoader(base_dir)
+    return _loaders[key]
+
+
+class LocalVectorBackend:
+    """
+    Exact in-process cosine search over a memory-mapped snapshot.
+
+    Vectors are stored L2-normalized, so a single matrix-vector product
+    gives cosine scores; the top-k is selected with argpartition. The
+    snapshot is hot-reloaded when a new one is published.
+    """
+
+    name = "local"
+
+    def __init__(self, base_dir: str = LOCAL_INDEX_PATH):
+        """Loads the active snapshot (if any) from base_dir."""
+        self.base_dir = base_dir
+        self.loader = get_snapshot_loader(base_dir)
+        self._published: Optional[LocalSnapshot] = None
+        self._snapshot: Optional[LocalSnapshot] = None
+        self._current()
+        print(f"[INFO] LocalVectorBackend initialized from: {base_dir}")
+
+    def _current(self) -> Optional[LocalSnapshot]:
+        published = self.loader.current()
+        if published is not self._published:
+            # A newly published snapshot replaces any in-memory upserts.
+            self._published = published
+            self._snapshot = published
+        return self._snapshot
+
+    @property
+    def collection_name(self) -> str:
+        snapshot = self._current()
+        if snapshot is None:
+            return os.path.basename(self.base_dir)
+        return snapshot.metadata.get("collection", os.path.basename(self.base_dir))
+
+    async def search_vectors(
+        self, query_vector: list, limit: int = 5, with_vectors: bool = False, search_config=None, scope=None
+    ) -> List[SearchHit]:
+        """Exact top-k cosine search (search_config is accepted for interface parity; search is always exact)."""
+        return (await self.search_vectors_batch([query_vector], limit, with_vectors, search_config, scope))[0]
+
+    async def search_vectors_batch(
+        self, query_vectors: List[list], limit: int = 5, with_vectors: bool = False, search_config=None, scope=None
+    ) -> List[List[SearchHit]]:
+        """
+        Exact top-k cosine search for several queries with one matrix product.
+        With a scope, only the rows it selects (via the payload index) are scored.
+        """
+        snapshot = self._current()
+        if snapshot is None or snapshot.vectors.shape[0] == 0 or not query_vectors:
+            return [[] for _ in query_vectors]
+        rows = snapshot.scope_rows(scope)
+        if rows is not None and rows.shape[0] == 0:
+            return [[] for _ in query_vectors]
+        vectors = snapshot.vectors if rows is None else snapshot.vectors[rows]
+
+        results: List[List[SearchHit]] = [[] for _ in query_vectors]
+        valid, queries = [], []
+        for position, query_vector in enumerate(query_vectors):
+            query = np.asarray(query_vector, dtype=np.float32)
+            if query.shape != (vectors.shape[1],):
+                print(f"[ERROR] Query vector has dimension {query.size}, index has {vectors.shape[1]}.")
+                continue
+            if not np.any(query):
+                print("[ERROR] Query vector is all zeros; it has no direction to search by.")
+                continue
+            valid.append(position)
+            queries.append(query)
+        if not queries:
+            return results
+
+        scores = _normalize_rows(np.stack(queries)) @ vectors.T
+        k = min(limit, vectors.shape[0])
+        for position, row_scores in zip(valid, scores):
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top])]
+            hits = []
+            for i in top:
+                # Position in the scoped matrix -> snapshot row
+                row = int(i) if rows is None else int(rows[i])
+                hits.append(
+                    SearchHit(
+                        id=int(snapshot.ids[row]),
+                        score=float(row_scores[i]),
+                        payload=snapshot.payloads[row],
+                        vector=vectors[i].tolist() if with_vectors else None,
+                    )
+                )
+            results[position] = hits
+        return results
+
+    async def get_collection_info(self) -> Optional[CollectionInfo]:
+        """Reports the active snapshot."""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        return CollectionInfo(
+            points_count=int(snapshot.ids.shape[0]),
+            status="green",
+            details={"snapshot": snapshot.version, "dim": int(snapshot.vectors.shape[1])},
+        )
+
+    async def upsert(self, points) -> None:
+        """
+        Inserts or replaces points in memory (not persisted; the next
+        published snapshot replaces them).
+        """
+        new_ids = np.asarray([p.id for p in points], dtype=np.int64)
+        new_vectors = _normalize_rows(np.asarray([p.vector for p in points], dtype=np.float32))
+        new_payloads = [p.payload or {} for p in points]
+
+        snapshot = self._current()
+        if snapshot is None or snapshot.vectors.shape[0] == 0:
+            vectors, ids, payloads, metadata = new_vectors, new_ids, new_payloads, {}
+        else:
+            if snapshot.vectors.shape[1] != new_vectors.shape[1]:
+                raise ValueError("Upserted vectors do not match the index dimension")
+            keep = ~np.isin(snapshot.ids, new_ids)
+            vectors = np.concatenate([np.asarray(snapshot.vectors)[keep], new_vectors])
+            ids = np.concatenate([snapshot.ids[keep], new_ids])
+            payloads = [p for p, k in zip(snapshot.payloads, keep) if k] + new_payloads
+            metadata = snapshot.metadata
+
+        # The lexical index is tied to snapshot rows, so it is dropped here.
+        self._snapshot = LocalSnapshot(
+            "in-memory", {**metadata, "count": int(ids.shape[0])}, vectors, ids, payloads
+        )
+
+    async def close(self) -> None:
+        """Nothing to release; present for interface parity."""
+        return None
+
+
+class LexicalRetriever:
+    """
+    BM25 search over the lexical index published with the local snapshot.
+
+    Hits carry exact cosine scores computed from the snapshot vectors, so
+    they are directly comparable with vector search results.
+    """
+
+    def __init__(self, base_dir: str = LOCAL_INDEX_PATH):
+        self.loader = get_snapshot_loader(base_dir)
+
+    def available(self) -> bool:
+        """Whether a snapshot with a lexical index is loaded."""
+        snapshot = self.loader.current()
+        return snapshot is not None and snapshot.lexical is not None
+
+    def search(
+        self, query: str, limit: int, query_vector=None, with_vectors: bool = False, scope=None
+    ) -> List[SearchHit]:
+        """
+        BM25 top-k for a query.
+
+        Args:
+            query: The raw query text.
+            limit: Maximum number of hits.
+            query_vector: Optional query embedding used to attach cosine scores.
+            with_vectors: Also return the stored vectors.
+            scope: Only rank chunks of these documents/chapters (a SearchScope).
+
+        Returns:
+            Hits best-first by BM25 score; `score` is the cosine similarity
+            when a query vector is given, else the BM25 score.
+        """
+        snapshot = self.loader.current()
+        if snapshot is None or snapshot.lexical is None:
+            return []
+
+        ranked = snapshot.lexical.search(query, limit, rows=snapshot.scope_rows(scope))
+        if not ranked:
+            return []
+
+        rows = np.fromiter((row for row, _ in ranked), dtype=np.int64, count=len(ranked))
+        if query_vector is not None and len(query_vector) == snapshot.vectors.shape[1]:
+            query = np.asarray(query_vector, dtype=np.float32)
+            norm = float(np.linalg.norm(query)) or 1.0
+            scores = (snapshot.vectors[rows] @ (query / norm)).tolist()
+        else:
+            scores = [score for _, score in ranked]
+
+        return [
+            SearchHit(
+                id=int(snapshot.ids[row]),
+                score=float(score),
+                payload=snapshot.payloads[row],
+                vector=snapshot.vectors[row].tolist() if with_vectors else None,
+            )
+            for row, score in zip(rows, scores)
+        ]
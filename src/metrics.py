@@ -0,0 +1,315 @@
+import bisect
+import contextvars
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Metrics Configuration ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Adds a Server-Timing header with per-stage durations to every response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+# Per-request stage timings, only set while Server-Timing is being collected
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label(str(value))}"' for name, value in zip(labelnames, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = f"{name}_total"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increments the counter for the given label values."""
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by label values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Records one observation for the given label values."""
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        labelnames = self.labelnames + ("le",)
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket_labels = _format_labels(labelnames, labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(total)}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and renders them in the Prometheus text exposition format.
+
+    Besides metric objects, callbacks can be registered that read existing
+    counters (cache stats etc.) at scrape time, so those components need no
+    instrumentation of their own.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._callbacks: List[Tuple[str, str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_callback(
+        self,
+        name: str,
+        kind: str,
+        documentation: str,
+        callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+    ) -> None:
+        """
+        Registers a metric whose samples are produced at scrape time.
+
+        Args:
+            name: Full sample name (including any _total suffix).
+            kind: "gauge" or "counter".
+            documentation: HELP text.
+            callback: Returns (labels, value) pairs.
+        """
+        self._callbacks = [entry for entry in self._callbacks if entry[0] != name]
+        self._callbacks.append((name, kind, documentation, callback))
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for name, kind, documentation, callback in self._callbacks:
+            try:
+                samples = list(callback())
+            except Exception as e:
+                print(f"[WARN] Metrics callback for {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_str = _format_labels(tuple(labels), tuple(labels.values()))
+                lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Pipeline Metrics ---
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Duration of RAG pipeline stages.", ("stage",)
+)
+REQUESTS = REGISTRY.counter(
+    "rag_requests", "Chat requests handled by the RAG engine.", ("mode",)
+)
+FALLBACKS = REGISTRY.counter(
+    "rag_general_knowledge_fallbacks", "Answers produced without textbook context.", ("reason",)
+)
+RETRIEVAL_RESULTS = REGISTRY.histogram(
+    "rag_retrieval_results", "Relevant chunks retrieved per query.", buckets=COUNT_BUCKETS
+)
+RETRIEVAL_SCORES = REGISTRY.histogram(
+    "rag_retrieval_score", "Similarity scores of retrieved chunks.", buckets=SCORE_BUCKETS
+)
+PROMPT_CHARS = REGISTRY.histogram(
+    "rag_prompt_chars", "Prompt size in characters.", buckets=SIZE_BUCKETS
+)
+RESPONSE_CHARS = REGISTRY.histogram(
+    "rag_response_chars", "Response size in characters.", buckets=SIZE_BUCKETS
+)
+DEPENDENCY_SKIPS = REGISTRY.counter(
+    "rag_dependency_skips",
+    "Dependency calls skipped (open circuit, spent budget) or abandoned (timeout).",
+    ("dependency", "reason"),
+)
+HEDGED_REQUESTS = REGISTRY.counter(
+    "rag_hedged_requests", "Second requests sent after the first exceeded the hedge delay.", ("dependency",)
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "rag_admission_wait_seconds", "Time admitted requests waited for a pipeline slot.", ("lane",)
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "rag_admission_rejections", "Requests turned away by admission control.", ("reason",)
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+
+
+class track_stage:
+    """
+    Context manager timing one pipeline stage.
+
+    Records into STAGE_SECONDS and, while a request is collecting
+    Server-Timing data, into that request's timings.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + elapsed
+        return False
+
+
+def start_request_timings() -> Tuple[Dict[str, float], contextvars.Token]:
+    """Starts collecting per-stage timings for the current request."""
+    timings: Dict[str, float] = {}
+    return timings, _request_timings.set(timings)
+
+
+def stop_request_timings(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    """Formats timings as a Server-Timing header value (durations in ms)."""
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and, when enabled,
+    adding a Server-Timing header with the request's stage durations.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (METRICS_ENABLED or self.server_timing):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        timings, token = start_request_timings() if self.server_timing else (None, None)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if timings is not None:
+                    header = format_server_timing(timings, time.perf_counter() - start)
+                    message = {
+                        **message,
+                        "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                stop_request_timings(token)
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - start, scope["method"], route, str(status[0]))
@@ -0,0 +1,261 @@
+import os
+from typing import Optional
+from qdrant_client import AsyncQdrantClient, models
+from qdrant_client.http.exceptions import ApiException
+from dotenv import load_dotenv
+
+from .chunk_store import CHUNK_STORE_ENABLED, CHUNK_STORE_PATH, ChunkStoreLoader
+from .http_clients import pool_options
+
+load_dotenv()
+
+QUANTIZATION_KINDS = ("none", "scalar", "binary")
+# Payload fields with keyword indexes, so scoped searches filter during HNSW traversal
+PAYLOAD_INDEX_FIELDS = ("doc_id", "chapter_path")
+
+
+def quantization_config(kind: str, always_ram: bool = True):
+    """
+    Collection quantization config by name.
+
+    "scalar" stores int8 codes (4x smaller than float32), "binary" one bit
+    per dimension (32x smaller); both keep the original vectors for
+    rescoring. "none" disables quantization.
+    """
+    if kind == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram
+            )
+        )
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown quantization '{kind}' (expected one of {', '.join(QUANTIZATION_KINDS)})")
+
+
+def collection_index_config(
+    quantization: str = "none",
+    hnsw_m: int = 16,
+    hnsw_ef_construct: int = 100,
+    always_ram: bool = True,
+) -> dict:
+    """Keyword arguments for create_collection/update_collection describing the index."""
+    return {
+        "hnsw_config": models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+        "quantization_config": quantization_config(quantization, always_ram),
+    }
+
+
+def search_params(config) -> models.SearchParams:
+    """Qdrant SearchParams for a VectorDBClient SearchConfig."""
+    return models.SearchParams(
+        hnsw_ef=config.hnsw_ef or None,
+        exact=config.exact,
+        quantization=models.QuantizationSearchParams(
+            ignore=config.ignore_quantization,
+            rescore=config.rescore,
+            oversampling=config.oversampling,
+        ),
+    )
+
+
+def scope_filter(scope) -> Optional[models.Filter]:
+    """Qdrant Filter for a VectorDBClient SearchScope (None for no scope)."""
+    if scope is None:
+        return None
+    return models.Filter(
+        must=[
+            models.FieldCondition(key=field, match=models.MatchAny(any=list(values)))
+            for field, values in scope.conditions().items()
+        ]
+    )
+
+
+class QdrantBackend:
+    """Vector backend that searches a remote Qdrant collection."""
+
+    name = "qdrant"
+
+    def __init__(self, timeout=30):
+        """Initialize Qdrant client."""
+        self.url = os.getenv("QDRANT_URL")
+        self.api_key = os.getenv("QDRANT_API_KEY")
+        # Embedded (on-disk, single-process) Qdrant instead of a server
+        self.path = os.getenv("QDRANT_PATH")
+        self.collection_name = os.getenv(
+            "QDRANT_COLLECTION_NAME", "rag_chatbot_collection"
+        )
+
+        if self.path:
+            self.client = AsyncQdrantClient(path=self.path)
+            print(f"[INFO] AsyncQdrantClient initialized for local path: {self.path}")
+        else:
+            if not self.url:
+                raise ValueError("QDRANT_URL must be set in environment")
+
+            # One keep-alive pool for all searches (qdrant-client's default
+            # disables keep-alive for localhost and leaves other limits unset)
+            self.client = AsyncQdrantClient(
+                url=self.url, api_key=self.api_key, timeout=timeout, **pool_options()
+            )
+            print(f"[INFO] AsyncQdrantClient initialized for URL: {self.url}")
+        print(f"[INFO] Using collection: {self.collection_name}")
+        # Duplicate requests only help against a remote server's tail latency
+        self.supports_hedging = not self.path
+        # Embedded mode always searches exactly (and warns on every search given params)
+        self.supports_search_params = not self.path
+        # Local copy of chunk payloads written by ingestion; searches then
+        # fetch only IDs and scores from Qdrant
+        self.chunk_store = ChunkStoreLoader(CHUNK_STORE_PATH) if CHUNK_STORE_ENABLED else None
+
+    def _search_params(self, search_config) -> Optional[models.SearchParams]:
+        if search_config is None or not self.supports_search_params:
+            return None
+        return search_params(search_config)
+
+    async def search_vectors(
+        self, query_vector: list, limit: int = 5, with_vectors: bool = False, search_config=None, scope=None
+    ):
+        """
+        Search Qdrant for similar vectors asynchronously.
+
+        Args:
+            query_vector: The embedding vector to search for.
+            limit: Number of results to return.
+            with_vectors: Also return the stored vectors.
+            search_config: HNSW and quantization parameters (a SearchConfig).
+            scope: Documents/chapters to restrict the search to (a SearchScope),
+                sent as a filter so Qdrant applies it during the search.
+
+        When a local chunk store is available, Qdrant returns only IDs and
+        scores and payloads are read from the store; IDs missing from it
+        (e.g. points added since it was written) are fetched from Qdrant.
+
+        Returns:
+            A list of ScoredPoint objects.
+
+        Raises:
+            Exception: If the search fails, so callers can track Qdrant's health.
+        """
+        try:
+            print(f"[INFO] Searching Qdrant with {len(query_vector)}-dim vector...")
+
+            # CRITICAL FIX: Use query_points() instead of search()
+            # AsyncQdrantClient uses query_points() method
+            store = self.chunk_store.current() if self.chunk_store is not None else None
+            search_result = await self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                query_filter=scope_filter(scope),
+                limit=limit,
+                with_payload=store is None,
+                with_vectors=with_vectors,
+                search_params=self._search_params(search_config),
+            )
+
+            # query_points returns a QueryResponse object with .points attribute
+            search_results = search_result.points if hasattr(search_result, 'points') else []
+            if store is not None and search_results:
+                await self._attach_payloads(search_results, store)
+
+            print(f"[INFO] Found {len(search_results)} results from Qdrant.")
+            return search_results
+
+        except ApiException as e:
+            print(f"[ERROR] Qdrant search failed due to a client-side error: {e}")
+            raise
+
+    async def search_vectors_batch(
+        self, query_vectors: list, limit: int = 5, with_vectors: bool = False, search_config=None, scope=None
+    ):
+        """
+        Searches for several query vectors in one request (query_batch_points),
+        all restricted to `scope` if given.
+
+        Returns:
+            One list of ScoredPoint objects per query vector, in order.
+
+        Raises:
+            Exception: If the search fails.
+        """
+        if not query_vectors:
+            return []
+        try:
+            print(f"[INFO] Batch-searching Qdrant with {len(query_vectors)} vectors...")
+            store = self.chunk_store.current() if self.chunk_store is not None else None
+            params = self._search_params(search_config)
+            query_filter = scope_filter(scope)
+            responses = await self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    models.QueryRequest(
+                        query=query_vector,
+                        filter=query_filter,
+                        limit=limit,
+                        with_payload=store is None,
+                        with_vector=with_vectors,
+                        params=params,
+                    )
+                    for query_vector in query_vectors
+                ],
+            )
+            results = [response.points for response in responses]
+            if store is not None:
+                # One chunk-store pass (and at most one retrieve) for the whole batch
+                points = [point for points in results for point in points]
+                if points:
+                    await self._attach_payloads(points, store)
+
+            print(f"[INFO] Found {sum(len(points) for points in results)} results for {len(results)} queries.")
+            return results
+
+        except ApiException as e:
+            print(f"[ERROR] Qdrant batch search failed due to a client-side error: {e}")
+            raise
+
+    async def _attach_payloads(self, points, store) -> None:
+        """Fills in payloads from the chunk store, fetching any it lacks from Qdrant."""
+        missing = []
+        for point, payload in zip(points, store.get_many([point.id for point in points])):
+            if payload is None:
+                missing.append(point)
+            else:
+                point.payload = payload
+        if missing:
+            print(f"[INFO] {len(missing)} search hits not in the chunk store. Fetching payloads from Qdrant.")
+            records = await self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(dict.fromkeys(point.id for point in missing)),
+                with_payload=True,
+            )
+            payloads = {record.id: record.payload for record in records}
+            for point in missing:
+                point.payload = payloads.get(point.id)
+
+    async def get_collection_info(self):
+        """Get information about the collection asynchronously."""
+        try:
+            info = await self.client.get_collection(
+                collection_name=self.collection_name
+            )
+            return info
+        except Exception as e:
+            print(f"[ERROR] Failed to get collection info: {e}")
+            return None
+
+    async def upsert(self, points) -> None:
+        """Insert or replace points (objects with id, vector and payload)."""
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                models.PointStruct(id=p.id, vector=p.vector, payload=p.payload)
+                for p in points
+            ],
+            wait=True,
+        )
+
+    async def close(self) -> None:
+        """Close the underlying HTTP connections."""
+        await self.client.close()
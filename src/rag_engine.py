@@ -1,10 +1,74 @@
 # src/rag_engine.py
+import asyncio
 import os
+import time
 import traceback
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 
+from .answer_cache import (
+    ANSWER_CACHE_ENABLED,
+    SemanticAnswerCache,
+    citation_key,
+    hash_history,
+)
+from .context_packer import pack_context, pack_history
+from .embedding_cache import normalize_query
+from .lexical_index import reciprocal_rank_fusion
 from .llm_client import GeminiAgentClient
-from .vector_db import VectorDBClient
+from .local_index import LexicalRetriever
+from .metrics import (
+    FALLBACKS,
+    PROMPT_CHARS,
+    REGISTRY,
+    REQUESTS,
+    RESPONSE_CHARS,
+    RETRIEVAL_RESULTS,
+    RETRIEVAL_SCORES,
+    track_stage,
+)
+from .rerank import (
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RETRIEVAL_SCORE_THRESHOLD,
+    mmr_rerank,
+    relevance_filter,
+)
+from .resilience import breaker_states, request_deadline
+from .session_store import (
+    SESSION_STORE_PATH,
+    SESSIONS_ENABLED,
+    Session,
+    SessionStore,
+    SQLiteSessionBackend,
+)
+from .singleflight import SingleFlight
+from .vector_db import SearchScope, VectorDBClient
+
+# --- Hybrid Retrieval Configuration ---
+# Lexical (BM25) search runs alongside vector search when the local snapshot
+# has a lexical index; results are merged with reciprocal-rank fusion.
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Top lexical hits count as relevant even when their cosine score is below the cutoff
+HYBRID_LEXICAL_TOP = int(os.getenv("HYBRID_LEXICAL_TOP", "3"))
+
+# --- Request Coalescing Configuration ---
+# Identical concurrent requests (same normalized query and history) share one pipeline run.
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+SINGLE_FLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "120"))
+
+# --- Startup Configuration ---
+# Open connections to Gemini and the vector backend before serving traffic
+STARTUP_WARMUP_ENABLED = os.getenv("STARTUP_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+STARTUP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "10"))
+
+# --- Batch Query Configuration ---
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+# Answers generated at once for one batch request
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+# Bound on one coalesced batch answer (chat answers use SINGLE_FLIGHT_TIMEOUT_SECONDS)
+BATCH_SINGLE_FLIGHT_TIMEOUT_SECONDS = float(os.getenv("BATCH_SINGLE_FLIGHT_TIMEOUT_SECONDS", "60"))
 
 # IMPROVED system prompt - removed learning level, added fallback behavior
 SYSTEM_PROMPT = """You are an intelligent assistant specializing in Physical AI & Humanoid Robotics.
@@ -45,9 +109,22 @@ When using textbook content:
 5. Keep responses natural and conversational, not overly structured
 """
 
+SESSION_SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a Physical AI & Robotics textbook assistant.
+
+## Current Summary:
+{summary}
+
+## New Exchanges:
+{exchanges}
+
+Write the updated summary in at most 150 words. Keep the topics discussed, facts the user stated about themselves, and anything later questions may refer back to. Output only the summary."""
+
 class RAGEngine:
     """
     Orchestrates the Retrieval-Augmented Generation pipeline.
+
+    Built by the app's lifespan, which calls warm_up() and start() before
+    serving and close() on shutdown.
     """
 
     def __init__(self):
@@ -55,18 +132,139 @@ class RAGEngine:
         print("[INFO] Initializing RAGEngine...")
         self.vector_db_client = VectorDBClient()
         self.gemini_agent_client = GeminiAgentClient()
+        self.answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+        self.lexical_retriever = LexicalRetriever() if HYBRID_SEARCH_ENABLED else None
+        self.single_flight = (
+            SingleFlight(timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS) if SINGLE_FLIGHT_ENABLED else None
+        )
+        self.session_store = (
+            SessionStore(
+                backend=SQLiteSessionBackend(SESSION_STORE_PATH) if SESSION_STORE_PATH else None,
+                summarizer=self._summarize_history,
+            )
+            if SESSIONS_ENABLED
+            else None
+        )
+        self._register_metrics()
         print("[INFO] RAGEngine initialized.")
 
+    async def warm_up(self, timeout: float = STARTUP_WARMUP_TIMEOUT_SECONDS) -> None:
+        """
+        Opens connections to Gemini (a one-word embedding) and the vector
+        backend (collection info) concurrently, so the first user request
+        does not pay for DNS, TCP and TLS setup. Failures are logged, not raised.
+        """
+        async def warm(name, probe):
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(probe(), timeout)
+                print(f"[INFO] Warmed up {name} in {(time.perf_counter() - start) * 1000:.0f} ms.")
+            except Exception as e:
+                print(f"[WARN] Warm-up of {name} failed: {type(e).__name__}: {e}")
+
+        await asyncio.gather(
+            warm("gemini", self.gemini_agent_client.warm_up),
+            warm(self.vector_db_client.backend_name, self.vector_db_client.get_collection_info),
+        )
+
+    def start(self) -> None:
+        """Starts background maintenance on the running loop (purging expired sessions)."""
+        if self.session_store is not None:
+            self.session_store.start_purging()
+
+    async def close(self) -> None:
+        """Closes connection pools and on-disk stores."""
+        for name, close in (
+            ("vector backend", self.vector_db_client.close),
+            ("gemini client", self.gemini_agent_client.close),
+        ):
+            try:
+                await close()
+            except Exception as e:
+                print(f"[WARN] Failed to close {name}: {e}")
+        if self.session_store is not None:
+            self.session_store.close()
+        print("[INFO] RAGEngine closed.")
+
+    def _register_metrics(self) -> None:
+        """Exports component counters (caches, coalescing, batching, breakers) at scrape time."""
+        components = {
+            "embedding_cache": self.gemini_agent_client.embedding_cache,
+            "answer_cache": self.answer_cache,
+        }
+
+        def cache_events():
+            for cache_name, cache in components.items():
+                if cache is None:
+                    continue
+                stats = cache.stats()
+                for event in ("hits", "misses", "evictions", "disk_hits", "invalidations"):
+                    if event in stats:
+                        yield {"cache": cache_name, "event": event}, stats[event]
+
+        def cache_entries():
+            for cache_name, cache in components.items():
+                if cache is None:
+                    continue
+                stats = cache.stats()
+                yield {"cache": cache_name}, stats.get("items", stats.get("entries", 0))
+
+        def single_flight_events():
+            if self.single_flight is not None:
+                stats = self.single_flight.stats()
+                for event in ("executions", "coalesced", "timeouts", "errors"):
+                    yield {"event": event}, stats[event]
+
+        def sessions():
+            if self.session_store is not None:
+                stats = self.session_store.stats()
+                yield {"kind": "active"}, stats["sessions"]
+                yield {"kind": "compactions"}, stats["compactions"]
+
+        def embedding_batches():
+            batcher = self.gemini_agent_client.embedding_batcher
+            if batcher is not None:
+                stats = batcher.stats()
+                yield {"kind": "requests"}, stats["requests"]
+                yield {"kind": "batches"}, stats["batches"]
+
+        def circuit_breakers():
+            for dependency, state in breaker_states().items():
+                yield {"dependency": dependency}, 0 if state["state"] == "closed" else 1
+
+        REGISTRY.register_callback(
+            "rag_cache_events_total", "counter", "Cache lookups and evictions.", cache_events
+        )
+        REGISTRY.register_callback(
+            "rag_cache_entries", "gauge", "Entries currently held per cache.", cache_entries
+        )
+        REGISTRY.register_callback(
+            "rag_single_flight_total", "counter", "Request coalescing outcomes.", single_flight_events
+        )
+        REGISTRY.register_callback(
+            "rag_embedding_batcher_total", "counter", "Embedding requests and upstream batches.", embedding_batches
+        )
+        REGISTRY.register_callback(
+            "rag_sessions", "gauge", "Active chat sessions and compactions so far.", sessions
+        )
+        REGISTRY.register_callback(
+            "rag_circuit_breaker_open",
+            "gauge",
+            "1 while a dependency's circuit breaker is open or half-open.",
+            circuit_breakers,
+        )
+
     def _build_rag_prompt(
         self,
         query: str,
         context: List[str],
         chat_history: List[Dict],
-        has_context: bool
+        has_context: bool,
+        summary: str = ""
     ) -> str:
         """Builds the full prompt for the RAG model."""
         history_str = "\n".join(
-            [f"User: {msg['user']}\nAI: {msg['ai']}" for msg in chat_history[-3:]]  # Only last 3 messages
+            [f"User: {msg['user']}\nAI: {msg['ai']}" for msg in pack_history(chat_history)]  # Most recent turns within the history budget
         )
         
         if has_context and context:
@@ -83,6 +281,12 @@ No specific textbook content was found for this query. Answer using your general
 {history_str}
 """ if history_str else ""
 
+        if summary:
+            history_section = f"""## Conversation Summary:
+{summary}
+
+{history_section}"""
+
         return f"""{SYSTEM_PROMPT}
 
 {history_section}
@@ -94,106 +298,357 @@ No specific textbook content was found for this query. Answer using your general
 ## Your Response:
 Provide a clear, direct answer. If using textbook content, cite it. If using general knowledge, be helpful and suggest related textbook topics if relevant."""
 
-    async def chat_with_rag(self, query: str, chat_history: List[Dict]) -> Dict:
+    async def _retrieve_context(self, query: str, scope: Optional[SearchScope] = None) -> Dict:
+        """
+        Embeds the query and retrieves relevant textbook context.
+
+        Args:
+            query: The user's question.
+            scope: Restricts retrieval to these documents/chapters.
+
+        Returns:
+            A dictionary with the query embedding, context texts, citations,
+            the citation key and whether relevant context was found.
+        """
+        # 1. Embed the query
+        print("[INFO] Step 1: Generating query embedding...")
+        with track_stage("embed"):
+            query_embedding = await self.gemini_agent_client.get_embedding(query)
+
+        # 2. Try to retrieve context from the vector database
+        relevant_results = []
+        if query_embedding:
+            print("[INFO] Step 2: Retrieving context from vector database...")
+            try:
+                with track_stage("retrieve"):
+                    if self.lexical_retriever is not None and self.lexical_retriever.available():
+                        relevant_results = await self._hybrid_search(query, query_embedding, scope=scope)
+                    else:
+                        relevant_results = await self._vector_search(query_embedding, scope=scope)
+            except Exception as search_error:
+                print(f"[WARN] Vector search failed: {search_error}. Falling back to general knowledge.")
+        else:
+            print("[WARN] Could not generate embedding. Falling back to general knowledge.")
+
+        return self._build_retrieval(query_embedding, relevant_results)
+
+    def _build_retrieval(self, query_embedding: List[float], relevant_results: List) -> Dict:
+        """Packs relevant hits into context texts and citations."""
+        retrieval = {
+            "query_embedding": query_embedding,
+            "context_texts": [],
+            "citations": [],
+            "citations_key": (),
+            "has_relevant_context": False,
+        }
+        if not query_embedding:
+            return retrieval
+
+        RETRIEVAL_RESULTS.observe(len(relevant_results))
+        for hit in relevant_results:
+            RETRIEVAL_SCORES.observe(hit.score)
+
+        if relevant_results:
+            # Merge overlapping chunks and fit them into the token budget
+            packed = pack_context(relevant_results)
+            packed_ids = {hit.id for hit in packed.hits}
+            retrieval["has_relevant_context"] = bool(packed.texts)
+            retrieval["context_texts"] = packed.texts
+            retrieval["citations"] = [
+                {
+                    "title": hit.payload.get("title", ""),
+                    "chapter_path": hit.payload.get("chapter_path", "Unknown"),
+                    "score": hit.score,
+                }
+                for hit in relevant_results
+                if hit.id in packed_ids
+            ]
+            retrieval["citations_key"] = citation_key(hit.id for hit in relevant_results)
+            print(
+                f"[INFO] Retrieved {len(relevant_results)} relevant context chunks, "
+                f"packed into {len(packed.texts)} sections (~{packed.tokens} tokens)."
+            )
+        else:
+            print("[INFO] No relevant results found. Will use general knowledge.")
+        return retrieval
+
+    async def _vector_search(
+        self, query_embedding: List[float], limit: int = 5, scope: Optional[SearchScope] = None
+    ) -> List:
+        """Dense-only retrieval: top results above the relevance cutoff (diversified when reranking)."""
+        search_results = await self.vector_db_client.search_vectors(
+            query_embedding,
+            limit=max(limit, RERANK_CANDIDATES) if RERANK_ENABLED else limit,
+            with_vectors=RERANK_ENABLED,
+            scope=scope,
+        )
+        return self._select_hits(search_results, limit)
+
+    def _select_hits(self, search_results: List, limit: int = 5) -> List:
+        """Applies the relevance cutoff to dense search results, then MMR if enabled."""
+        relevant_results = self._relevant_hits(search_results)
+        if not RERANK_ENABLED:
+            return relevant_results[:limit]
+        with track_stage("rerank"):
+            return mmr_rerank(relevant_results, limit)
+
+    def _relevant_hits(self, search_results: List) -> List:
+        """Filters dense search results by relevance score (see rerank.relevance_filter)."""
+        if not search_results:
+            print("[INFO] No search results returned.")
+            return []
+
+        relevant_results = relevance_filter(search_results)
+        if not relevant_results:
+            print(f"[INFO] No highly relevant results found (all scores <= {RETRIEVAL_SCORE_THRESHOLD}).")
+        return relevant_results
+
+    async def _hybrid_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        limit: int = 5,
+        vector_hits: Optional[List] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> List:
+        """
+        Runs vector and BM25 search concurrently and merges them with
+        reciprocal-rank fusion.
+
+        A candidate is relevant if its cosine score clears the threshold or
+        it is one of the top lexical hits (exact terms like "ZMP" or "URDF"
+        that dense retrieval tends to under-score). With reranking enabled,
+        the top-k is then chosen from the relevant candidates by MMR. Pass
+        `vector_hits` when the vector search has already been done (batch
+        retrieval). Both searches are restricted to `scope`.
+        """
+        lexical_search = asyncio.to_thread(
+            self.lexical_retriever.search, query, HYBRID_CANDIDATES, query_embedding, RERANK_ENABLED, scope
+        )
+        if vector_hits is None:
+            vector_hits, lexical_hits = await asyncio.gather(
+                self.vector_db_client.search_vectors(
+                    query_embedding, limit=HYBRID_CANDIDATES, with_vectors=RERANK_ENABLED, scope=scope
+                ),
+                lexical_search,
+            )
+        else:
+            lexical_hits = await lexical_search
+        print(f"[INFO] Hybrid search: {len(vector_hits)} vector hits, {len(lexical_hits)} lexical hits.")
+
+        hits_by_id = {hit.id: hit for hit in lexical_hits}
+        # Prefer the vector backend's hit objects (and scores) for shared IDs
+        hits_by_id.update({hit.id: hit for hit in vector_hits})
+        lexical_top = {hit.id for hit in lexical_hits[:HYBRID_LEXICAL_TOP]}
+
+        relevant_ids = {hit.id for hit in relevance_filter(list(hits_by_id.values()))}
+
+        fused_ids = reciprocal_rank_fusion(
+            [[hit.id for hit in vector_hits], [hit.id for hit in lexical_hits]], k=HYBRID_RRF_K
+        )
+        candidates = [
+            hits_by_id[point_id]
+            for point_id in fused_ids
+            if point_id in relevant_ids or point_id in lexical_top
+        ]
+        if not RERANK_ENABLED:
+            return candidates[:limit]
+        with track_stage("rerank"):
+            return mmr_rerank(candidates, limit)
+
+    def is_likely_cached(self, query: str) -> bool:
+        """
+        Cheap hint that a query was asked recently (its embedding is still
+        cached in memory), so it will likely be served without generation.
+        """
+        cache = self.gemini_agent_client.embedding_cache
+        return cache is not None and cache.contains(query)
+
+    def _lookup_cached_answer(self, retrieval: Dict, history_key: str):
+        """Returns a cached answer for an equivalent question, if any."""
+        if self.answer_cache is None or not retrieval["query_embedding"]:
+            return None
+        with track_stage("answer_cache"):
+            cached_result = self.answer_cache.lookup(
+                retrieval["query_embedding"], retrieval["citations_key"], history_key
+            )
+        if cached_result is not None:
+            print("[INFO] Answer cache hit. Skipping LLM generation.")
+        return cached_result
+
+    def _store_answer(self, retrieval: Dict, history_key: str, result: Dict) -> None:
+        """Stores a successfully generated answer in the answer cache."""
+        response_text = result["response"]
+        if (
+            self.answer_cache is not None
+            and retrieval["query_embedding"]
+            and response_text
+            and not response_text.startswith("Error:")
+        ):
+            self.answer_cache.store(
+                retrieval["query_embedding"], retrieval["citations_key"], history_key, result
+            )
+
+    def _build_fallback_prompt(self, query: str) -> str:
+        """Builds the general-knowledge prompt used when the pipeline fails."""
+        return f"""{SYSTEM_PROMPT}
+
+The system encountered an error retrieving textbook content. Please answer the following question using your general knowledge about Physical AI and Robotics:
+
+{query}
+
+Provide a helpful, accurate answer."""
+
+    async def _resolve_session(
+        self, session_id: Optional[str], chat_history: List[Dict], start_session: bool = False
+    ) -> Optional[Session]:
+        """
+        Returns the request's session (new if unknown), or None when sessions
+        are disabled or the client did not ask for one (no session_id and no
+        start_session), so stateless clients keep their own history.
+        """
+        if self.session_store is None or not (session_id or start_session):
+            return None
+        return await self.session_store.aget_or_create(session_id, chat_history)
+
+    def _record_turn(self, session: Optional[Session], query: str, response_text: str) -> None:
+        """Appends a completed exchange to the session history."""
+        if session is not None and response_text:
+            self.session_store.append_turn(session, query, response_text)
+
+    async def _summarize_history(self, previous_summary: str, turns: List[Dict]) -> str:
+        """Folds older session turns into the running summary with the LLM."""
+        exchanges = "\n".join(f"User: {turn['user']}\nAI: {turn['ai']}" for turn in turns)
+        summary = await self.gemini_agent_client.generate_content(
+            SESSION_SUMMARY_PROMPT.format(summary=previous_summary or "(none)", exchanges=exchanges)
+        )
+        if not summary or summary.startswith("Error:"):
+            raise ValueError("LLM returned no usable summary")
+        return summary
+
+    async def chat_with_rag(
+        self,
+        query: str,
+        chat_history: List[Dict],
+        session_id: Optional[str] = None,
+        scope: Optional[SearchScope] = None,
+        start_session: bool = False,
+    ) -> Dict:
         """
         Executes the full RAG pipeline asynchronously.
+
+        Concurrent calls with the same normalized query and chat history are
+        coalesced into a single pipeline run whose result all callers share.
+        Every stage runs within REQUEST_DEADLINE_SECONDS; a stage that cannot
+        finish in time is skipped (retrieval) or fails over to the fallback
+        answer (generation).
+
+        When the client uses a server-side session (sends a session_id or sets
+        start_session), the history comes from the session (`chat_history`
+        only seeds a new one) and the exchange is appended to it afterwards.
         
         Args:
             query: The user's question.
             chat_history: The conversation history.
+            session_id: The session to continue (a new one if it has expired).
+            scope: Restricts retrieval to these documents/chapters.
+            start_session: Start a server-side session when no session_id is given.
             
         Returns:
-            A dictionary with the response and citations, or an error message.
+            A dictionary with the response and citations (and the session_id
+            when the request uses a session), or an error message.
+
+        Raises:
+            asyncio.TimeoutError: If a coalesced run exceeds SINGLE_FLIGHT_TIMEOUT_SECONDS.
+        """
+        REQUESTS.inc("query")
+        session = await self._resolve_session(session_id, chat_history, start_session)
+        summary = ""
+        if session is not None:
+            chat_history, summary = list(session.turns), session.summary
+
+        # The coalesced run inherits the leader's deadline (tasks copy the context)
+        with request_deadline():
+            if self.single_flight is None:
+                result = await self._run_pipeline(query, chat_history, summary, scope=scope)
+            else:
+                key = (normalize_query(query), hash_history(chat_history, summary), scope)
+                result = await self.single_flight.do(
+                    key, lambda: self._run_pipeline(query, chat_history, summary, scope=scope)
+                )
+        # Each caller gets its own top-level dict
+        result = dict(result)
+
+        if session is not None:
+            self._record_turn(session, query, result["response"])
+            result["session_id"] = session.session_id
+        return result
+
+    async def _run_pipeline(
+        self,
+        query: str,
+        chat_history: List[Dict],
+        summary: str = "",
+        retrieval: Optional[Dict] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> Dict:
+        """
+        Runs retrieval, the answer cache and generation for one query.
+        Retrieval is skipped when its result is passed in (batch queries).
         """
         print(f"[INFO] RAGEngine received query: '{query}'")
 
         try:
-            # 1. Embed the query
-            print("[INFO] Step 1: Generating query embedding...")
-            query_embedding = await self.gemini_agent_client.get_embedding(query)
-            
-            # Initialize context and citations
-            context_texts = []
-            citations = []
-            has_relevant_context = False
-            
-            # 2. Try to retrieve context from the vector database
-            if query_embedding:
-                print("[INFO] Step 2: Retrieving context from vector database...")
-                try:
-                    search_results = await self.vector_db_client.search_vectors(
-                        query_embedding, limit=5
-                    )
-                    
-                    if search_results:
-                        # Filter results by relevance score (threshold: 0.5)
-                        relevant_results = [hit for hit in search_results if hit.score > 0.5]
-                        
-                        if relevant_results:
-                            has_relevant_context = True
-                            context_texts = [
-                                hit.payload.get("text", "")
-                                for hit in relevant_results
-                                if hit.payload
-                            ]
-                            citations = [
-                                {
-                                    "title": hit.payload.get("title", ""),
-                                    "chapter_path": hit.payload.get("chapter_path", "Unknown"),
-                                    "score": hit.score,
-                                }
-                                for hit in relevant_results
-                                if hit.payload
-                            ]
-                            print(f"[INFO] Retrieved {len(context_texts)} relevant context chunks (score > 0.5).")
-                        else:
-                            print("[INFO] No highly relevant results found (all scores < 0.5). Will use general knowledge.")
-                    else:
-                        print("[INFO] No search results returned. Will use general knowledge.")
-                        
-                except Exception as search_error:
-                    print(f"[WARN] Vector search failed: {search_error}. Falling back to general knowledge.")
-            else:
-                print("[WARN] Could not generate embedding. Falling back to general knowledge.")
+            if retrieval is None:
+                retrieval = await self._retrieve_context(query, scope)
+            has_relevant_context = retrieval["has_relevant_context"]
+
+            # Serve a previously generated answer for an equivalent question
+            history_key = hash_history(chat_history, summary)
+            cached_result = self._lookup_cached_answer(retrieval, history_key)
+            if cached_result is not None:
+                return cached_result
 
             # 3. Build the prompt (with or without context)
             print(f"[INFO] Step 3: Building prompt (has_context={has_relevant_context})...")
             augmented_prompt = self._build_rag_prompt(
-                query, context_texts, chat_history, has_relevant_context
+                query, retrieval["context_texts"], chat_history, has_relevant_context, summary
             )
 
             # 4. Generate the response
             print("[INFO] Step 4: Generating response with LLM...")
-            response_text = await self.gemini_agent_client.generate_content(
-                augmented_prompt
-            )
+            PROMPT_CHARS.observe(len(augmented_prompt))
+            with track_stage("generate"):
+                response_text = await self.gemini_agent_client.generate_content(
+                    augmented_prompt
+                )
+            RESPONSE_CHARS.observe(len(response_text))
             
             # Add a note if we're using general knowledge
             if not has_relevant_context and response_text:
+                FALLBACKS.inc("no_context")
                 print("[INFO] Response generated using general knowledge (no textbook context).")
             else:
                 print("[INFO] Response generated successfully with textbook context.")
 
-            return {
+            result = {
                 "response": response_text,
-                "citations": citations,
+                "citations": retrieval["citations"],
                 "has_textbook_context": has_relevant_context
             }
+            self._store_answer(retrieval, history_key, result)
+
+            return result
 
         except Exception as e:
             print(f"[ERROR] An unexpected error occurred in RAGEngine: {e}")
             traceback.print_exc()
             
             # Even on error, try to answer with general knowledge
+            FALLBACKS.inc("error")
             try:
                 print("[INFO] Attempting fallback response with general knowledge...")
-                fallback_prompt = f"""{SYSTEM_PROMPT}
-
-The system encountered an error retrieving textbook content. Please answer the following question using your general knowledge about Physical AI and Robotics:
-
-{query}
-
-Provide a helpful, accurate answer."""
+                fallback_prompt = self._build_fallback_prompt(query)
                 
                 fallback_response = await self.gemini_agent_client.generate_content(fallback_prompt)
                 
@@ -208,3 +663,220 @@ Provide a helpful, accurate answer."""
                     "citations": [],
                     "has_textbook_context": False
                 }
+
+    async def stream_chat_with_rag(
+        self,
+        query: str,
+        chat_history: List[Dict],
+        session_id: Optional[str] = None,
+        scope: Optional[SearchScope] = None,
+        start_session: bool = False,
+    ) -> AsyncIterator[Dict]:
+        """
+        Executes the RAG pipeline, streaming the response as it is generated.
+
+        Yields a "citations" event as soon as retrieval finishes (carrying the
+        session_id when the request uses a session), then one "token" event per
+        generated text delta, and finally a "done" event. Closing the
+        generator stops the upstream model stream; only completed answers
+        are added to the session. Retrieval and opening the model stream run
+        within REQUEST_DEADLINE_SECONDS.
+
+        Args:
+            query: The user's question.
+            chat_history: The conversation history.
+            session_id: The session to continue (a new one if it has expired).
+            scope: Restricts retrieval to these documents/chapters.
+            start_session: Start a server-side session when no session_id is given.
+
+        Yields:
+            Event dictionaries with a "type" key.
+        """
+        print(f"[INFO] RAGEngine received streaming query: '{query}'")
+        REQUESTS.inc("stream")
+
+        session = await self._resolve_session(session_id, chat_history, start_session)
+        summary = ""
+        session_fields = {}
+        if session is not None:
+            chat_history, summary = list(session.turns), session.summary
+            session_fields = {"session_id": session.session_id}
+
+        # Held across yields: only retrieval and opening the model stream read it
+        with request_deadline():
+            try:
+                retrieval = await self._retrieve_context(query, scope)
+                has_relevant_context = retrieval["has_relevant_context"]
+                history_key = hash_history(chat_history, summary)
+                cached_result = self._lookup_cached_answer(retrieval, history_key)
+            except Exception as e:
+                print(f"[ERROR] Retrieval failed in streaming pipeline: {e}")
+                traceback.print_exc()
+                retrieval, has_relevant_context, history_key, cached_result = None, False, "", None
+
+            if cached_result is not None:
+                yield {
+                    "type": "citations",
+                    "citations": cached_result["citations"],
+                    "has_textbook_context": cached_result["has_textbook_context"],
+                    **session_fields,
+                }
+                yield {"type": "token", "content": cached_result["response"]}
+                self._record_turn(session, query, cached_result["response"])
+                yield {"type": "done"}
+                return
+
+            yield {
+                "type": "citations",
+                "citations": retrieval["citations"] if retrieval else [],
+                "has_textbook_context": has_relevant_context,
+                **session_fields,
+            }
+
+            if retrieval is not None:
+                print(f"[INFO] Step 3: Building prompt (has_context={has_relevant_context})...")
+                prompt = self._build_rag_prompt(
+                    query, retrieval["context_texts"], chat_history, has_relevant_context, summary
+                )
+                if not has_relevant_context:
+                    FALLBACKS.inc("no_context")
+            else:
+                prompt = self._build_fallback_prompt(query)
+                FALLBACKS.inc("error")
+
+            print("[INFO] Step 4: Streaming response from LLM...")
+            PROMPT_CHARS.observe(len(prompt))
+            response_parts = []
+            try:
+                with track_stage("generate_stream"):
+                    async for delta in self.gemini_agent_client.generate_content_stream(prompt):
+                        response_parts.append(delta)
+                        yield {"type": "token", "content": delta}
+            except Exception as e:
+                print(f"[ERROR] Streaming generation failed: {e}")
+                yield {
+                    "type": "error",
+                    "message": "I apologize, but I'm experiencing technical difficulties. Please try again in a moment.",
+                }
+                return
+
+            print("[INFO] Streaming response completed.")
+            response_text = "".join(response_parts)
+            RESPONSE_CHARS.observe(len(response_text))
+            self._record_turn(session, query, response_text)
+            if retrieval is not None:
+                self._store_answer(
+                    retrieval,
+                    history_key,
+                    {
+                        "response": response_text,
+                        "citations": retrieval["citations"],
+                        "has_textbook_context": has_relevant_context,
+                    },
+                )
+            yield {"type": "done"}
+
+    async def _retrieve_batch(self, queries: List[str], scope: Optional[SearchScope] = None) -> List[Dict]:
+        """
+        Retrieval for many queries: one batched embedding pass, one batched
+        vector search, then per-query BM25 fusion and packing.
+        """
+        with track_stage("batch_embed"):
+            embeddings = await self.gemini_agent_client.get_embeddings(queries)
+
+        hybrid = self.lexical_retriever is not None and self.lexical_retriever.available()
+
+        async def select(query: str, embedding: List[float], hits: List) -> List:
+            if not embedding:
+                return []
+            try:
+                if hybrid:
+                    return await self._hybrid_search(query, embedding, vector_hits=hits, scope=scope)
+                return self._select_hits(hits)
+            except Exception as e:
+                print(f"[WARN] Retrieval failed for a batch query: {e}. Falling back to general knowledge.")
+                return []
+
+        with track_stage("batch_retrieve"):
+            if hybrid:
+                candidates = HYBRID_CANDIDATES
+            else:
+                candidates = RERANK_CANDIDATES if RERANK_ENABLED else 5
+            vector_hits = await self.vector_db_client.search_vectors_batch(
+                embeddings, limit=candidates, with_vectors=RERANK_ENABLED, scope=scope
+            )
+            relevant = await asyncio.gather(
+                *(select(query, embedding, hits) for query, embedding, hits in zip(queries, embeddings, vector_hits))
+            )
+        return [self._build_retrieval(embedding, hits) for embedding, hits in zip(embeddings, relevant)]
+
+    async def batch_chat(
+        self,
+        queries: List[str],
+        retrieval_only: bool = False,
+        concurrency: int = BATCH_GENERATION_CONCURRENCY,
+        scope: Optional[SearchScope] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Answers many independent (history-free) queries.
+
+        Embedding and vector search are done for the whole batch at once;
+        answers are then generated with at most `concurrency` in flight,
+        each within its own REQUEST_DEADLINE_SECONDS. Duplicate questions,
+        in the batch or in flight elsewhere, are coalesced as in chat_with_rag.
+        Closing the generator cancels outstanding generations.
+
+        Args:
+            queries: The questions.
+            retrieval_only: Return context and citations without generating answers.
+            concurrency: Maximum concurrent generations.
+            scope: Restricts retrieval for every query to these documents/chapters.
+
+        Yields:
+            One result per query, in completion order, carrying its input
+            `index` and `query` plus the chat_with_rag fields (or `context`
+            and citations in retrieval-only mode).
+        """
+        print(f"[INFO] RAGEngine received batch of {len(queries)} queries (retrieval_only={retrieval_only}).")
+        REQUESTS.inc("batch_retrieval" if retrieval_only else "batch", amount=len(queries))
+        retrievals = await self._retrieve_batch(queries, scope)
+
+        if retrieval_only:
+            for index, (query, retrieval) in enumerate(zip(queries, retrievals)):
+                yield {
+                    "index": index,
+                    "query": query,
+                    "context": retrieval["context_texts"],
+                    "citations": retrieval["citations"],
+                    "has_textbook_context": retrieval["has_relevant_context"],
+                }
+            return
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        history_key = hash_history([], "")
+
+        async def answer(index: int) -> Dict:
+            query, retrieval = queries[index], retrievals[index]
+            async with semaphore:
+                try:
+                    with request_deadline():
+                        if self.single_flight is None:
+                            result = await self._run_pipeline(query, [], retrieval=retrieval)
+                        else:
+                            result = await self.single_flight.do(
+                                (normalize_query(query), history_key, scope),
+                                lambda: self._run_pipeline(query, [], retrieval=retrieval),
+                                timeout=BATCH_SINGLE_FLIGHT_TIMEOUT_SECONDS,
+                            )
+                except Exception as e:
+                    print(f"[ERROR] Batch query {index} failed: {e}")
+                    return {"index": index, "query": query, "error": "An error occurred while processing this query"}
+            return {"index": index, "query": query, **result}
+
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(queries))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,98 @@
+import os
+from typing import List, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Relevance Cutoff Configuration ---
+# Hits must score above the absolute threshold and, when the relative cutoff
+# is set (0-1), at least that fraction of the best hit's score.
+RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.5"))
+RETRIEVAL_RELATIVE_CUTOFF = float(os.getenv("RETRIEVAL_RELATIVE_CUTOFF", "0"))
+
+# --- MMR Reranking Configuration ---
+# Over-fetch candidates with their vectors and pick a diverse top-k with
+# Maximal Marginal Relevance, so overlapping chunks of one section do not
+# crowd out the rest of the context.
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+# 1.0 ranks by relevance only; lower values favour diversity
+RERANK_LAMBDA = float(os.getenv("RERANK_LAMBDA", "0.7"))
+
+
+def relevance_filter(
+    hits: Sequence,
+    threshold: float = RETRIEVAL_SCORE_THRESHOLD,
+    relative_cutoff: float = RETRIEVAL_RELATIVE_CUTOFF,
+) -> List:
+    """
+    Hits scoring above `threshold` and at least `relative_cutoff` times the
+    best hit's score, in their original order.
+    """
+    if not hits:
+        return []
+    top_score = max(hit.score for hit in hits)
+    floor = top_score * relative_cutoff if relative_cutoff > 0 else -np.inf
+    return [hit for hit in hits if hit.score > threshold and hit.score >= floor]
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = RERANK_LAMBDA) -> List[int]:
+    """
+    Maximal Marginal Relevance selection.
+
+    Greedily picks the candidate maximizing
+    lambda * relevance - (1 - lambda) * max cosine similarity to those already
+    picked. The pairwise similarities are one matrix product and the
+    running maximum is updated per pick, so selection is O(k * n).
+
+    Args:
+        relevance: Relevance of each candidate to the query, shape (n,).
+        vectors: Candidate vectors, shape (n, dim).
+        k: Number of candidates to select.
+        lambda_: Relevance/diversity trade-off in [0, 1].
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    n = relevance.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = vectors / norms
+    similarity = unit @ unit.T
+
+    weighted_relevance = lambda_ * relevance
+    max_similarity = np.full(n, -np.inf)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    for _ in range(k):
+        if selected:
+            gain = weighted_relevance - (1 - lambda_) * max_similarity
+        else:
+            gain = weighted_relevance.copy()
+        gain[~available] = -np.inf
+        best = int(np.argmax(gain))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[:, best])
+    return selected
+
+
+def mmr_rerank(hits: Sequence, k: int, lambda_: float = RERANK_LAMBDA) -> List:
+    """
+    Picks a diverse top-k from scored hits carrying their vectors, using
+    their scores (cosine similarity to the query) as relevance.
+
+    Hits without a vector cannot be compared and are ranked by score
+    alone, so if any are present the top-k by score is returned.
+    """
+    if len(hits) <= 1 or any(hit.vector is None for hit in hits):
+        return sorted(hits, key=lambda hit: hit.score, reverse=True)[:k]
+    relevance = np.fromiter((hit.score for hit in hits), dtype=np.float32, count=len(hits))
+    vectors = np.asarray([hit.vector for hit in hits], dtype=np.float32)
+    return [hits[i] for i in mmr_select(relevance, vectors, k, lambda_)]
@@ -0,0 +1,303 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# --- Latency Budget Configuration ---
+# End-to-end budget for one chat request; every stage gets at most what is left
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "3"))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "2"))
+GENERATION_TIMEOUT_SECONDS = float(os.getenv("GENERATION_TIMEOUT_SECONDS", "20"))
+# One batched search covers many queries, so it gets a longer bound
+RETRIEVAL_BATCH_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_BATCH_TIMEOUT_SECONDS", "10"))
+
+# --- Hedging Configuration ---
+# A second retrieval request is sent once the first has taken longer than the
+# observed p95 (or HEDGE_DEFAULT_DELAY_SECONDS until enough samples exist).
+RETRIEVAL_HEDGE_ENABLED = os.getenv("RETRIEVAL_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "0.5"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.02"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_QUANTILE = 0.95
+
+# --- Circuit Breaker Configuration ---
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_SECONDS = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class request_deadline:
+    """
+    Context manager setting the deadline (monotonic time) for the current request.
+
+    Stages read it through stage_timeout(), so the budget flows through the
+    pipeline without being passed explicitly. A nested scope never extends
+    an outer deadline.
+    """
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.seconds = seconds
+        self._token = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.seconds
+        outer = _deadline.get()
+        if outer is not None:
+            deadline = min(deadline, outer)
+        self._token = _deadline.set(deadline)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _deadline.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a generator closed elsewhere)
+            pass
+        return False
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left until the request deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def stage_timeout(stage_limit: float) -> float:
+    """Timeout for a stage: its own limit, capped by the remaining request budget."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return stage_limit
+    return max(0.0, min(stage_limit, remaining))
+
+
+def _transport_errors() -> Tuple[type, ...]:
+    """Errors meaning a dependency could not be reached (the client libraries wrap httpx's)."""
+    errors = [asyncio.TimeoutError, ConnectionError, httpx.TransportError]
+    try:
+        from openai import APIConnectionError  # also covers APITimeoutError
+        errors.append(APIConnectionError)
+    except ImportError:
+        pass
+    try:
+        from qdrant_client.http.exceptions import ResponseHandlingException
+        errors.append(ResponseHandlingException)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+_TRANSPORT_ERRORS = _transport_errors()
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the dependency is unhealthy: a timeout, a
+    transport error, or a 5xx/429 response. Other errors (4xx such as a bad
+    request or auth problem, or bugs on our side) say nothing about its
+    health and must not open a breaker.
+    """
+    if isinstance(error, _TRANSPORT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status >= 500 or status == 429)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is skipped because the dependency's breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls pass. After `failure_threshold` consecutive failures it
+    opens and calls are skipped for `recovery_seconds`. Then it is
+    half-open: one trial call passes; success closes it, failure reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        recovery_seconds: float = BREAKER_RECOVERY_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """Returns whether a call may go ahead now."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                self.rejected += 1
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        if self.state != "closed":
+            print(f"[INFO] Circuit '{self.name}' closed.")
+        self.state = "closed"
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if error is not None:
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"[WARN] Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures.")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """Returns the breaker state for health reporting."""
+        snapshot = {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "successes": self.successes,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+        if self.state == "open":
+            snapshot["retry_in_seconds"] = round(
+                max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at)), 1
+            )
+        return snapshot
+
+    async def call(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """
+        Runs fn() through the breaker with an optional timeout.
+
+        Only dependency failures (see is_dependency_failure) count against
+        the breaker; other errors are re-raised without changing its state.
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call.
+            asyncio.TimeoutError: If the call exceeds the timeout (counted as a failure).
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            if timeout is None:
+                result = await fn()
+            else:
+                result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.CancelledError:
+            self._trial_in_flight = False
+            raise
+        except BaseException as e:
+            if is_dependency_failure(e):
+                self.record_failure(e)
+            else:
+                # Not a health signal; just let the next call be the trial
+                self._trial_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Returns the process-wide breaker for a dependency, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_states() -> Dict[str, dict]:
+    """Snapshots of every breaker, keyed by dependency name."""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick hedge delays."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.quantile(HEDGE_QUANTILE)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        return max(HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+async def hedged(fn: Callable[[], Awaitable[T]], delay: float, on_hedge: Optional[Callable[[], None]] = None) -> T:
+    """
+    Runs fn(); if it has not finished after `delay` seconds, starts a second
+    fn() and returns whichever succeeds first. The loser is cancelled.
+    """
+    first = asyncio.ensure_future(fn())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+    except asyncio.CancelledError:
+        first.cancel()
+        raise
+    if done:
+        return first.result()
+
+    if on_hedge is not None:
+        on_hedge()
+    second = asyncio.ensure_future(fn())
+    pending = {first, second}
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in (first, second):
+            if not task.done():
+                task.cancel()
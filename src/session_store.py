@@ -0,0 +1,424 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .context_packer import estimate_tokens, truncate_to_tokens
+
+load_dotenv()
+
+# --- Session Configuration ---
+SESSIONS_ENABLED = os.getenv("SESSIONS_ENABLED", "true").lower() in ("1", "true", "yes")
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH")  # Optional SQLite persistence
+# Turns beyond this many estimated tokens are folded into the running summary
+SESSION_COMPACT_THRESHOLD_TOKENS = int(os.getenv("SESSION_COMPACT_THRESHOLD_TOKENS", "1200"))
+SESSION_KEEP_RECENT_TURNS = int(os.getenv("SESSION_KEEP_RECENT_TURNS", "2"))
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "300"))
+# Changes reach the backend in batches, written off the event loop
+SESSION_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "0.5"))
+# Expired sessions are deleted from memory and the backend this often
+SESSION_PURGE_INTERVAL_SECONDS = float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "3600"))
+
+# Summarizer signature: (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict]], Awaitable[str]]
+
+
+@dataclass
+class Session:
+    """One conversation: recent turns verbatim plus a summary of older ones."""
+
+    session_id: str
+    turns: List[Dict] = field(default_factory=list)
+    summary: str = ""
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # Set while the turns are only client-supplied history; such a session is
+    # not compacted until the client comes back to it
+    seeded: bool = False
+
+
+class SQLiteSessionBackend:
+    """Persists sessions as JSON rows in SQLite so they survive restarts."""
+
+    def __init__(self, path: str):
+        """Open (or create) the session database at the given path."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        print(f"[INFO] SQLiteSessionBackend opened at: {path}")
+
+    def load(self, session_id: str) -> Optional[Session]:
+        row = self.conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return Session(**json.loads(row[0])) if row else None
+
+    def save(self, session: Session) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session.session_id, json.dumps(asdict(session), ensure_ascii=False), session.updated_at),
+        )
+        self.conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.conn.commit()
+
+    def purge_expired(self, older_than: float) -> int:
+        cursor = self.conn.execute("DELETE FROM sessions WHERE updated_at < ?", (older_than,))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SessionStore:
+    """
+    Bounded in-memory store of chat sessions with TTL and LRU eviction.
+
+    An optional backend (any object with load/save/delete, e.g.
+    SQLiteSessionBackend) keeps sessions beyond eviction and restarts. From
+    async code, sessions are loaded with aget_or_create (the backend read
+    runs in a worker thread), and changes are written behind in batches by a
+    background task, so the event loop never waits on the backend. Once a
+    session's turns exceed the compaction threshold, the older turns are
+    folded into a running summary so the prompt stays a constant size.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        backend=None,
+        summarizer: Optional[Summarizer] = None,
+        compact_threshold_tokens: int = SESSION_COMPACT_THRESHOLD_TOKENS,
+        keep_recent_turns: int = SESSION_KEEP_RECENT_TURNS,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.summarizer = summarizer
+        self.compact_threshold_tokens = compact_threshold_tokens
+        self.keep_recent_turns = keep_recent_turns
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._compacting: set = set()
+        self._tasks: set = set()
+        # Serializes backend access between worker threads and close()
+        self._backend_lock = threading.Lock()
+        # session_id -> snapshot to save, or None to delete; not yet written
+        self._pending: Dict[str, Optional[Session]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._purge_task: Optional[asyncio.Task] = None
+
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+        self.compactions = 0
+
+    def _expired(self, session: Session) -> bool:
+        return time.time() - session.updated_at > self.ttl_seconds
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """
+        Returns a live session, loading it from the backend inline if needed.
+
+        For callers without an event loop; async code should use aget().
+        """
+        session = self._sessions.get(session_id)
+        if session is None and self.backend is not None:
+            session = self._pending[session_id] if session_id in self._pending else self._load(session_id)
+            if session is not None:
+                self._remember(_copy(session))
+        return self._live(session_id)
+
+    async def aget(self, session_id: str) -> Optional[Session]:
+        """Like get(), with the backend read in a worker thread."""
+        session = self._sessions.get(session_id)
+        if session is None and self.backend is not None:
+            if session_id in self._pending:
+                session = self._pending[session_id]
+            else:
+                session = await asyncio.to_thread(self._load, session_id)
+            # Another request may have loaded it meanwhile; keep that one
+            if session is not None and session_id not in self._sessions:
+                self._remember(_copy(session))
+        return self._live(session_id)
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        try:
+            with self._backend_lock:
+                return self.backend.load(session_id)
+        except Exception as e:
+            print(f"[WARN] Failed to load session {session_id}: {e}")
+            return None
+
+    def _live(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            self.expired += 1
+            self.delete(session_id)
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def create(self, chat_history: Optional[List[Dict]] = None) -> Session:
+        """Starts a new session, optionally seeded with client-side history."""
+        session = Session(session_id=uuid.uuid4().hex, turns=list(chat_history or []), seeded=bool(chat_history))
+        self.created += 1
+        self._remember(session)
+        self._persist(session)
+        return session
+
+    def get_or_create(self, session_id: Optional[str], chat_history: Optional[List[Dict]] = None) -> Session:
+        """Returns the given session, or a new one if it is missing or expired."""
+        session = self.get(session_id) if session_id else None
+        return session or self._create_instead(session_id, chat_history)
+
+    async def aget_or_create(self, session_id: Optional[str], chat_history: Optional[List[Dict]] = None) -> Session:
+        """Like get_or_create(), with the backend read in a worker thread."""
+        session = await self.aget(session_id) if session_id else None
+        return session or self._create_instead(session_id, chat_history)
+
+    def _create_instead(self, session_id: Optional[str], chat_history: Optional[List[Dict]]) -> Session:
+        if session_id:
+            print(f"[INFO] Session {session_id} not found or expired. Starting a new one.")
+        return self.create(chat_history)
+
+    def append_turn(self, session: Session, user: str, ai: str) -> None:
+        """
+        Records one exchange and schedules compaction if it is due.
+
+        The first exchange of a session seeded from client history never
+        compacts: a client that does not return to the session would pay for
+        a summarization nobody reads.
+        """
+        session.turns.append({"user": user, "ai": ai})
+        session.updated_at = time.time()
+        just_seeded, session.seeded = session.seeded, False
+        self._remember(session)
+        self._persist(session)
+
+        if not just_seeded and self._history_tokens(session.turns) > self.compact_threshold_tokens:
+            self._schedule_compaction(session)
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        if self.backend is not None:
+            self._pending[session_id] = None
+            self._schedule_flush()
+
+    def _remember(self, session: Session) -> None:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            # Evicted sessions remain loadable from the backend, if any
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def _persist(self, session: Session) -> None:
+        if self.backend is None:
+            return
+        # A snapshot, so the worker thread never reads a session being changed
+        self._pending[session.session_id] = _copy(session)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop (synchronous caller): write through
+            self.flush()
+            return
+        self._flush_task = loop.create_task(self._write_behind())
+
+    async def _write_behind(self) -> None:
+        """Writes pending changes in batches until none are left."""
+        try:
+            while self._pending:
+                await asyncio.sleep(SESSION_FLUSH_INTERVAL_SECONDS)
+                batch = dict(self._pending)
+                await asyncio.to_thread(self._write, batch)
+                for session_id, change in batch.items():
+                    # Keep changes made while the batch was written
+                    if session_id in self._pending and self._pending[session_id] is change:
+                        del self._pending[session_id]
+        finally:
+            self._flush_task = None
+
+    def _write(self, batch: Dict[str, Optional[Session]]) -> None:
+        with self._backend_lock:
+            for session_id, session in batch.items():
+                try:
+                    if session is None:
+                        self.backend.delete(session_id)
+                    else:
+                        self.backend.save(session)
+                except Exception as e:
+                    print(f"[WARN] Failed to persist session {session_id}: {e}")
+
+    def flush(self) -> None:
+        """Writes all pending changes to the backend now (blocking)."""
+        if self.backend is not None and self._pending:
+            batch, self._pending = self._pending, {}
+            self._write(batch)
+
+    @staticmethod
+    def _history_tokens(turns: List[Dict]) -> int:
+        return sum(estimate_tokens(turn["user"]) + estimate_tokens(turn["ai"]) for turn in turns)
+
+    def _schedule_compaction(self, session: Session) -> None:
+        if session.session_id in self._compacting:
+            return
+        self._compacting.add(session.session_id)
+        try:
+            task = asyncio.get_running_loop().create_task(self._compact(session))
+        except RuntimeError:
+            # No running loop (synchronous caller): compact without the LLM
+            self._compacting.discard(session.session_id)
+            self._fold(session, len(session.turns) - self.keep_recent_turns, None)
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, session: Session) -> None:
+        """Folds all but the most recent turns into the session summary."""
+        try:
+            fold_count = len(session.turns) - self.keep_recent_turns
+            if fold_count <= 0:
+                return
+            new_summary = None
+            if self.summarizer is not None:
+                try:
+                    new_summary = await self.summarizer(session.summary, session.turns[:fold_count])
+                except Exception as e:
+                    print(f"[WARN] Session summarization failed, using extractive summary: {e}")
+                    traceback.print_exc()
+            self._fold(session, fold_count, new_summary)
+        finally:
+            self._compacting.discard(session.session_id)
+
+    def _fold(self, session: Session, fold_count: int, new_summary: Optional[str]) -> None:
+        if fold_count <= 0:
+            return
+        folded = session.turns[:fold_count]
+        if new_summary:
+            new_summary = truncate_to_tokens(new_summary.strip(), SESSION_SUMMARY_MAX_TOKENS)
+        else:
+            new_summary = extractive_summary(session.summary, folded)
+        # Turns appended while summarizing stay after the folded prefix
+        session.turns = session.turns[fold_count:]
+        session.summary = new_summary
+        session.updated_at = time.time()
+        self.compactions += 1
+        self._persist(session)
+        print(f"[INFO] Compacted {fold_count} turns of session {session.session_id} into its summary.")
+
+    def purge_expired(self) -> int:
+        """Drops expired sessions from memory and the backend (blocking)."""
+        removed = max(self._purge_memory(), self._purge_backend())
+        self.expired += removed
+        return removed
+
+    async def apurge_expired(self) -> int:
+        """Like purge_expired(), with the backend purge in a worker thread."""
+        in_memory = self._purge_memory()
+        removed = max(in_memory, await asyncio.to_thread(self._purge_backend))
+        self.expired += removed
+        return removed
+
+    def _purge_memory(self) -> int:
+        expired_ids = [sid for sid, session in self._sessions.items() if self._expired(session)]
+        for session_id in expired_ids:
+            self._sessions.pop(session_id, None)
+        return len(expired_ids)
+
+    def _purge_backend(self) -> int:
+        if self.backend is None or not hasattr(self.backend, "purge_expired"):
+            return 0
+        try:
+            with self._backend_lock:
+                return self.backend.purge_expired(time.time() - self.ttl_seconds)
+        except Exception as e:
+            print(f"[WARN] Failed to purge expired sessions: {e}")
+            return 0
+
+    def start_purging(self, interval: float = SESSION_PURGE_INTERVAL_SECONDS) -> None:
+        """Purges expired sessions now and then every `interval` seconds, on the running loop."""
+        if self._purge_task is None or self._purge_task.done():
+            self._purge_task = asyncio.get_running_loop().create_task(self._purge_periodically(interval))
+
+    async def _purge_periodically(self, interval: float) -> None:
+        while True:
+            removed = await self.apurge_expired()
+            if removed:
+                print(f"[INFO] Purged {removed} expired sessions.")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        """Returns session counters and current size."""
+        return {
+            "sessions": len(self._sessions),
+            "created": self.created,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+        }
+
+    def close(self) -> None:
+        """Stops purging, writes pending changes and closes the backend, if any."""
+        for task in (self._purge_task, self._flush_task):
+            if task is not None:
+                task.cancel()
+        self._purge_task = self._flush_task = None
+        self.flush()
+        if self.backend is not None and hasattr(self.backend, "close"):
+            with self._backend_lock:
+                self.backend.close()
+
+
+def _copy(session: Session) -> Session:
+    return Session(**asdict(session))
+
+
+def extractive_summary(previous_summary: str, turns: List[Dict], max_tokens: int = SESSION_SUMMARY_MAX_TOKENS) -> str:
+    """
+    Summary fallback without an LLM: one line per earlier exchange (question
+    and the opening of the answer), dropping the oldest lines to fit max_tokens.
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for turn in turns:
+        question = truncate_to_tokens(" ".join(turn["user"].split()), 40)
+        answer = truncate_to_tokens(" ".join(turn["ai"].split()), 40)
+        lines.append(f"- User asked: {question} / AI answered: {answer}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) starts the work in its own task;
+    callers arriving while it is in flight wait on the same future and get
+    the same result or exception. Because the work runs detached from the
+    leader, a leader that disconnects does not fail the other waiters.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout: Default upper bound in seconds for one shared execution
+                (do() can override it per call). When it expires every
+                waiter receives asyncio.TimeoutError.
+        """
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        # Strong references to running executions; the event loop only keeps weak ones
+        self._tasks: set = set()
+
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn() once per in-flight key and returns its result.
+
+        Args:
+            key: Calls with equal keys are coalesced.
+            fn: Zero-argument coroutine factory doing the actual work.
+            timeout: Upper bound for this execution instead of the default.
+                Only the leader's applies; later callers join its execution.
+
+        Returns:
+            The shared result.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            # Nobody may be left waiting (all callers cancelled); mark the
+            # exception as retrieved so it is not logged as unhandled.
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._calls[key] = future
+            self.executions += 1
+            limit = self.timeout if timeout is None else timeout
+            task = asyncio.create_task(self._run(key, fn, future, limit))
+            self._tasks.add(task)
+            task.add_done_callback(lambda task: self._finished(key, future, task))
+        else:
+            self.coalesced += 1
+
+        # Shield so one waiter being cancelled does not cancel the shared future.
+        return await asyncio.shield(future)
+
+    async def _run(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]], future: asyncio.Future, timeout: Optional[float]
+    ) -> None:
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            future.set_exception(e)
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def _finished(self, key: Hashable, future: asyncio.Future, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Cancelled (e.g. at loop shutdown), possibly before it even started:
+        # release the waiters instead of leaving them hanging
+        if not future.done():
+            future.cancel()
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        """Returns execution/coalescing counters."""
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
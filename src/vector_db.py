@@ -1,93 +1,285 @@
+import asyncio
 import os
+import time
 import traceback
-from qdrant_client import AsyncQdrantClient, models
-from qdrant_client.http.exceptions import ApiException
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
+from .metrics import DEPENDENCY_SKIPS, HEDGED_REQUESTS
+from .resilience import (
+    RETRIEVAL_BATCH_TIMEOUT_SECONDS,
+    RETRIEVAL_HEDGE_ENABLED,
+    RETRIEVAL_TIMEOUT_SECONDS,
+    CircuitOpenError,
+    LatencyTracker,
+    get_breaker,
+    hedged,
+    stage_timeout,
+)
+
 load_dotenv()
 
+# "qdrant" (remote collection) or "local" (in-process snapshot exported by ingestion)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
 
-class VectorDBClient:
-    """Asynchronous client for interacting with Qdrant vector database."""
-    
-    def __init__(self, timeout=30):
-        """Initialize Qdrant client."""
-        self.url = os.getenv("QDRANT_URL")
-        self.api_key = os.getenv("QDRANT_API_KEY")
-        self.collection_name = os.getenv(
-            "QDRANT_COLLECTION_NAME", "rag_chatbot_collection"
-        )
-        
-        if not self.url:
-            raise ValueError("QDRANT_URL must be set in environment")
-        
-        self.client = AsyncQdrantClient(
-            url=self.url, api_key=self.api_key, timeout=timeout
+
+@dataclass(frozen=True)
+class SearchConfig:
+    """
+    Accuracy/speed trade-offs for approximate search (Qdrant only).
+
+    hnsw_ef: Candidate list size during HNSW search (0 = server default);
+        higher is more accurate and slower.
+    exact: Bypass the index and scan all vectors.
+    rescore: Re-rank quantized candidates with the original vectors.
+    oversampling: Fetch limit * oversampling quantized candidates before rescoring.
+    ignore_quantization: Search the original vectors even if quantized ones exist.
+    """
+
+    hnsw_ef: int = 0
+    exact: bool = False
+    rescore: bool = True
+    oversampling: Optional[float] = None
+    ignore_quantization: bool = False
+
+    @classmethod
+    def from_env(cls) -> "SearchConfig":
+        oversampling = os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING")
+        return cls(
+            hnsw_ef=int(os.getenv("QDRANT_HNSW_EF", "0")),
+            exact=os.getenv("QDRANT_EXACT_SEARCH", "false").lower() in ("1", "true", "yes"),
+            rescore=os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() in ("1", "true", "yes"),
+            oversampling=float(oversampling) if oversampling else None,
+            ignore_quantization=os.getenv("QDRANT_QUANTIZATION_IGNORE", "false").lower() in ("1", "true", "yes"),
         )
-        
-        print(f"[INFO] AsyncQdrantClient initialized for URL: {self.url}")
-        print(f"[INFO] Using collection: {self.collection_name}")
-    
-    async def search_vectors(self, query_vector: list, limit: int = 5):
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """
+    Restricts a search to chunks of the given documents and/or chapters
+    (payload fields with keyword indexes). Values of one field are
+    alternatives; fields are combined with AND. Hashable, so it can be part
+    of cache and coalescing keys.
+    """
+
+    doc_ids: Tuple[str, ...] = ()
+    chapter_paths: Tuple[str, ...] = ()
+
+    @classmethod
+    def create(
+        cls, doc_ids: Optional[Sequence[str]] = None, chapter_paths: Optional[Sequence[str]] = None
+    ) -> Optional["SearchScope"]:
+        """Normalized scope, or None if it would not restrict anything."""
+        scope = cls(tuple(sorted(set(doc_ids or ()))), tuple(sorted(set(chapter_paths or ()))))
+        return scope if scope.conditions() else None
+
+    def conditions(self) -> Dict[str, Tuple[str, ...]]:
+        """Payload field -> allowed values, for the fields that are restricted."""
+        fields = (("doc_id", self.doc_ids), ("chapter_path", self.chapter_paths))
+        return {field: values for field, values in fields if values}
+
+
+def create_backend(backend_name: str, timeout=30):
+    """
+    Instantiates a vector backend by name.
+
+    Backends are imported lazily so the local backend does not require
+    qdrant-client to be installed.
+    """
+    if backend_name == "qdrant":
+        from .qdrant_backend import QdrantBackend
+        return QdrantBackend(timeout=timeout)
+    if backend_name == "local":
+        from .local_index import LocalVectorBackend
+        return LocalVectorBackend()
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend_name}' (expected 'qdrant' or 'local')")
+
+
+class VectorDBClient:
+    """
+    Asynchronous vector search client.
+
+    Delegates to a pluggable backend that provides `search_vectors`,
+    `search_vectors_batch`, `get_collection_info`, `upsert` and `close`.
+
+    Searches go through a circuit breaker and are bounded by
+    RETRIEVAL_TIMEOUT_SECONDS and the request deadline, so an unhealthy
+    backend costs a bounded wait (or none, once the breaker is open)
+    instead of the client timeout. Remote backends are also hedged.
+    """
+
+    def __init__(self, timeout=30, backend_name: str = VECTOR_BACKEND):
+        """Initialize the configured vector backend."""
+        self.backend = create_backend(backend_name, timeout=timeout)
+        self.backend_name = self.backend.name
+        self.breaker = get_breaker(f"vector_db:{self.backend_name}")
+        self.latency = LatencyTracker()
+        # Only worth hedging when the search leaves the process
+        self.hedge = RETRIEVAL_HEDGE_ENABLED and getattr(self.backend, "supports_hedging", False)
+        self.search_config = SearchConfig.from_env()
+        print(f"[INFO] VectorDBClient using '{self.backend_name}' backend.")
+
+    @property
+    def collection_name(self) -> str:
+        return self.backend.collection_name
+
+    def configure_search(self, **changes) -> SearchConfig:
         """
-        Search Qdrant for similar vectors asynchronously.
-        
+        Changes search parameters at runtime (fields of SearchConfig, e.g.
+        hnsw_ef=128, oversampling=2.0). Returns the new config.
+        """
+        self.search_config = replace(self.search_config, **changes)
+        print(f"[INFO] Vector search config: {self.search_config}")
+        return self.search_config
+
+    async def search_vectors(
+        self,
+        query_vector: list,
+        limit: int = 5,
+        with_vectors: bool = False,
+        search_config: Optional[SearchConfig] = None,
+        scope: Optional[SearchScope] = None,
+    ):
+        """
+        Search for similar vectors asynchronously.
+
         Args:
             query_vector: The embedding vector to search for.
             limit: Number of results to return.
-        
+            with_vectors: Also return the stored vectors.
+            search_config: Overrides the client's search config for this call.
+            scope: Only search chunks of these documents/chapters (applied
+                by the backend during the search, not afterwards).
+
         Returns:
-            A list of ScoredPoint objects, or an empty list on error.
+            A list of scored hits (with id, score and payload), or an empty
+            list on error, timeout or while the circuit is open.
         """
         if not query_vector:
             print("[ERROR] Query vector is empty.")
             return []
-        
-        try:
-            print(f"[INFO] Searching Qdrant with {len(query_vector)}-dim vector...")
-            
-            # CRITICAL FIX: Use query_points() instead of search()
-            # AsyncQdrantClient uses query_points() method
-            search_result = await self.client.query_points(
-                collection_name=self.collection_name,
-                query=query_vector,
-                limit=limit,
-                with_payload=True,
+
+        dependency = self.breaker.name
+        timeout = stage_timeout(RETRIEVAL_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            print("[WARN] Request deadline reached. Skipping vector search.")
+            DEPENDENCY_SKIPS.inc(dependency, "budget_exhausted")
+            return []
+
+        config = search_config or self.search_config
+
+        def search():
+            return self.backend.search_vectors(
+                query_vector, limit=limit, with_vectors=with_vectors, search_config=config, scope=scope
             )
-            
-            # query_points returns a QueryResponse object with .points attribute
-            search_results = search_result.points if hasattr(search_result, 'points') else []
-            
-            print(f"[INFO] Found {len(search_results)} results from Qdrant.")
-            return search_results
-            
-        except ApiException as e:
-            print(f"[ERROR] Qdrant search failed due to a client-side error: {e}")
-            traceback.print_exc()
+
+        def search_with_hedge():
+            return hedged(
+                search, self.latency.hedge_delay(), on_hedge=lambda: HEDGED_REQUESTS.inc(dependency)
+            )
+
+        start = time.perf_counter()
+        try:
+            results = await self.breaker.call(search_with_hedge if self.hedge else search, timeout=timeout)
+        except CircuitOpenError:
+            print(f"[WARN] Circuit '{dependency}' is open. Skipping vector search.")
+            DEPENDENCY_SKIPS.inc(dependency, "circuit_open")
+            return []
+        except asyncio.TimeoutError:
+            print(f"[WARN] Vector search timed out after {timeout:.2f}s.")
+            DEPENDENCY_SKIPS.inc(dependency, "timeout")
             return []
         except Exception as e:
-            print(f"[ERROR] An unexpected error occurred during Qdrant search: {e}")
+            print(f"[ERROR] Vector search failed: {e}")
             traceback.print_exc()
             return []
-    
-    async def get_collection_info(self):
-        """Get information about the collection asynchronously."""
+
+        self.latency.observe(time.perf_counter() - start)
+        return results
+
+    async def search_vectors_batch(
+        self,
+        query_vectors: List[list],
+        limit: int = 5,
+        with_vectors: bool = False,
+        search_config: Optional[SearchConfig] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> List[list]:
+        """
+        Searches for several query vectors with one backend call, all
+        restricted to the same scope (if any).
+
+        Goes through the same circuit breaker as search_vectors, bounded by
+        RETRIEVAL_BATCH_TIMEOUT_SECONDS (and any request deadline); batches
+        are not hedged.
+
+        Returns:
+            One list of scored hits per query vector, in order. Empty query
+            vectors get no hits; on error, timeout or while the circuit is
+            open every list is empty.
+        """
+        results: List[list] = [[] for _ in query_vectors]
+        positions = [i for i, query_vector in enumerate(query_vectors) if query_vector]
+        if not positions:
+            return results
+
+        dependency = self.breaker.name
+        timeout = stage_timeout(RETRIEVAL_BATCH_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            print("[WARN] Request deadline reached. Skipping batch vector search.")
+            DEPENDENCY_SKIPS.inc(dependency, "budget_exhausted")
+            return results
+
+        config = search_config or self.search_config
         try:
-            info = await self.client.get_collection(
-                collection_name=self.collection_name
+            hits = await self.breaker.call(
+                lambda: self.backend.search_vectors_batch(
+                    [query_vectors[i] for i in positions],
+                    limit=limit,
+                    with_vectors=with_vectors,
+                    search_config=config,
+                    scope=scope,
+                ),
+                timeout=timeout,
             )
-            return info
+        except CircuitOpenError:
+            print(f"[WARN] Circuit '{dependency}' is open. Skipping batch vector search.")
+            DEPENDENCY_SKIPS.inc(dependency, "circuit_open")
+            return results
+        except asyncio.TimeoutError:
+            print(f"[WARN] Batch vector search timed out after {timeout:.2f}s.")
+            DEPENDENCY_SKIPS.inc(dependency, "timeout")
+            return results
         except Exception as e:
-            print(f"[ERROR] Failed to get collection info: {e}")
-            return None
+            print(f"[ERROR] Batch vector search failed: {e}")
+            traceback.print_exc()
+            return results
+
+        for i, query_hits in zip(positions, hits):
+            results[i] = query_hits
+        return results
+
+    async def get_collection_info(self):
+        """Get information about the collection asynchronously."""
+        return await self.backend.get_collection_info()
+
+    async def upsert(self, points) -> None:
+        """Insert or replace points (objects with id, vector and payload)."""
+        await self.backend.upsert(points)
+
+    async def close(self) -> None:
+        """Release backend resources."""
+        await self.backend.close()
 
 
 async def main():
     """Test the VectorDBClient."""
     try:
         client = VectorDBClient()
-        print("✓ AsyncQdrantClient initialized successfully")
-        
+        print(f"✓ VectorDBClient initialized successfully ({client.backend_name} backend)")
+
         info = await client.get_collection_info()
         if info:
             print(f"✓ Collection info retrieved")
@@ -96,7 +288,7 @@ async def main():
             print(f"  Status: {info.status}")
         else:
             print("✗ Could not get collection info")
-        
+
         # Test search with a dummy vector
         print("\n--- Testing search with dummy vector ---")
         dummy_vector = [0.1] * 768  # 768-dimensional vector
@@ -110,7 +302,7 @@ async def main():
                 print(f"    Chapter: {result.payload.get('chapter_path', 'N/A')}")
         else:
             print("✗ Search returned no results")
-            
+
     except Exception as e:
         print(f"✗ Error during client test: {e}")
         traceback.print_exc()
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.admission import (
+    FAST_LANE,
+    NORMAL_LANE,
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTicket,
+    RateLimiter,
+)
+
+
+def controller(**kwargs) -> AdmissionController:
+    options = {"max_concurrent": 2, "max_queue": 10, "queue_timeout": 1.0}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_release_hands_the_slot_to_a_waiter():
+    async def scenario():
+        admission = controller()
+        first = await admission.admit()
+        await admission.admit()
+        waiter = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        assert admission.queue_depth == 1 and not waiter.done()
+
+        first.release()
+        first.release()  # idempotent
+        third = await asyncio.wait_for(waiter, 1)
+        assert admission.active == 2 and admission.queue_depth == 0
+        third.release()
+        assert admission.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_and_full_queue_are_rejected():
+    async def scenario():
+        admission = controller(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        ticket = await admission.admit()
+        waiter = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await admission.admit()
+        assert full.value.status_code == 503 and full.value.reason == "queue_full"
+
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await waiter
+        assert timed_out.value.reason == "queue_timeout"
+        assert admission.queue_depth == 0
+        ticket.release()
+        assert admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def scenario():
+        admission = controller(max_concurrent=1)
+        ticket = await admission.admit()
+        queued = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert admission.queue_depth == 0
+
+        handed = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        # The slot is handed over, then the waiter is cancelled before it resumes
+        ticket.release()
+        handed.cancel()
+        result = (await asyncio.gather(handed, return_exceptions=True))[0]
+        if isinstance(result, AdmissionTicket):
+            result.release()
+        assert admission.active == 0 and admission.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_fast_lane_is_served_first():
+    async def scenario():
+        admission = controller(max_concurrent=1, fast_lane_boost=5.0)
+        ticket = await admission.admit()
+        order = []
+
+        async def wait(lane):
+            (await admission.admit(lane=lane)).release()
+            order.append(lane)
+
+        waiters = [asyncio.create_task(wait(NORMAL_LANE)), asyncio.create_task(wait(FAST_LANE))]
+        await asyncio.sleep(0)
+        ticket.release()
+        await asyncio.gather(*waiters)
+        assert order == [FAST_LANE, NORMAL_LANE]
+
+    asyncio.run(scenario())
+
+
+def test_weighted_tickets_hold_several_slots_in_queue_order():
+    async def scenario():
+        admission = controller(max_concurrent=4)
+        light = await admission.admit()
+        heavy = asyncio.create_task(admission.admit(weight=4))
+        await asyncio.sleep(0)
+        behind = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        # Three slots are free, but the heavy waiter is first in line
+        assert admission.active == 1 and not behind.done()
+
+        light.release()
+        heavy_ticket = await asyncio.wait_for(heavy, 1)
+        assert admission.active == 4 and heavy_ticket.weight == 4
+        heavy_ticket.release()
+        (await asyncio.wait_for(behind, 1)).release()
+        assert admission.active == 0
+
+        capped = await admission.admit(weight=100)
+        assert capped.weight == 4
+        capped.release()
+
+    asyncio.run(scenario())
+
+
+def test_rate_limited_client_gets_429():
+    async def scenario():
+        admission = controller(rate_limiter=RateLimiter(rate=0.001, burst=1))
+        (await admission.admit("client")).release()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.admit("client")
+        assert rejected.value.status_code == 429
+        (await admission.admit("other")).release()
+
+    asyncio.run(scenario())
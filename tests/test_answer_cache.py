@@ -0,0 +1,77 @@
+import os
+
+from src.answer_cache import SemanticAnswerCache, citation_key, hash_history
+
+RESULT = {"answer": "ZMP stands for zero moment point.", "citations": [{"id": "p1"}]}
+KEY = citation_key(["p2", "p1"])
+
+
+def make_cache(**kwargs) -> SemanticAnswerCache:
+    kwargs.setdefault("similarity_threshold", 0.95)
+    kwargs.setdefault("index_version_path", None)
+    return SemanticAnswerCache(**kwargs)
+
+
+def test_similar_queries_hit_and_dissimilar_ones_miss():
+    cache = make_cache()
+    cache.store([1.0, 0.0, 0.0], KEY, "", RESULT)
+
+    hit = cache.lookup([0.99, 0.05, 0.0], KEY, "")
+    assert hit == RESULT
+    hit["citations"][0]["id"] = "mutated"
+    assert cache.lookup([1.0, 0.0, 0.0], KEY, "")["citations"][0]["id"] == "p1"
+
+    assert cache.lookup([0.8, 0.6, 0.0], KEY, "") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_citations_and_history_must_match():
+    history = hash_history([{"user": "hi", "ai": "hello"}])
+    cache = make_cache()
+    cache.store([1.0, 0.0], KEY, history, RESULT)
+
+    assert citation_key(["p1", "p2"]) == KEY
+    assert cache.lookup([1.0, 0.0], citation_key(["p1"]), history) is None
+    assert cache.lookup([1.0, 0.0], KEY, "") is None
+    assert cache.lookup([1.0, 0.0], KEY, history) is not None
+
+
+def test_zero_vectors_and_other_dimensions_are_ignored():
+    cache = make_cache()
+    cache.store([0.0, 0.0], KEY, "", RESULT)
+    assert cache.stats()["entries"] == 0
+    cache.store([1.0, 0.0], KEY, "", RESULT)
+    assert cache.lookup([1.0, 0.0, 0.0], KEY, "") is None
+
+
+def test_oldest_entry_is_evicted_when_full():
+    cache = make_cache(max_entries=2)
+    for i, vector in enumerate(([1.0, 0.0], [0.0, 1.0], [-1.0, 0.0])):
+        cache.store(vector, KEY, "", {**RESULT, "answer": str(i)})
+    assert cache.lookup([1.0, 0.0], KEY, "") is None
+    assert cache.lookup([-1.0, 0.0], KEY, "")["answer"] == "2"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss():
+    cache = make_cache(ttl_seconds=-1)
+    cache.store([1.0, 0.0], KEY, "", RESULT)
+    assert cache.lookup([1.0, 0.0], KEY, "") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_index_version_change_invalidates_the_cache(tmp_path):
+    version_path = tmp_path / "index_version"
+    version_path.write_text("1")
+    cache = make_cache(index_version_path=str(version_path))
+    cache.store([1.0, 0.0], KEY, "", RESULT)
+    assert cache.lookup([1.0, 0.0], KEY, "") is not None
+
+    stat = os.stat(version_path)
+    os.utime(version_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.lookup([1.0, 0.0], KEY, "") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+    cache.store([1.0, 0.0], KEY, "", RESULT)
+    assert cache.lookup([1.0, 0.0], KEY, "") is not None
+    assert cache.stats()["invalidations"] == 1
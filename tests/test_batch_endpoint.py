@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from src.admission import AdmissionController
+from src.vector_db import SearchScope
+
+
+class FakeEngine:
+    """Answers each query with its upper-cased text, last query first."""
+
+    def __init__(self, fail_after=None):
+        self.calls = []
+        self.fail_after = fail_after
+
+    async def batch_chat(self, queries, retrieval_only=False, scope=None):
+        self.calls.append((list(queries), retrieval_only, scope))
+        for count, index in enumerate(reversed(range(len(queries)))):
+            if count == self.fail_after:
+                raise RuntimeError("generation failed")
+            yield {"index": index, "query": queries[index], "response": queries[index].upper()}
+
+
+class RecordingAdmission(AdmissionController):
+    def __init__(self):
+        super().__init__(max_concurrent=100, max_queue=10, queue_timeout=1.0)
+        self.weights = []
+
+    async def admit(self, client_id="anonymous", lane="normal", weight=1):
+        self.weights.append(weight)
+        return await super().admit(client_id, lane, weight)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(main, "rag_engine", engine)
+    return engine
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    admission = RecordingAdmission()
+    monkeypatch.setattr(main, "admission", admission)
+    return admission
+
+
+@pytest.fixture
+def client():
+    # No context manager: the lifespan (and its real RAGEngine) is not started
+    return TestClient(main.app)
+
+
+def test_streams_ndjson_in_completion_order(engine, admission, client):
+    response = client.post("/api/chat/batch", json={"queries": ["a", "b", "c"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [2, 1, 0]
+    assert lines[0] == {"index": 2, "query": "c", "response": "C"}
+    assert engine.calls == [(["a", "b", "c"], False, None)]
+    assert admission.weights == [3] and admission.active == 0
+
+
+def test_non_streaming_results_are_in_input_order(engine, admission, client):
+    response = client.post(
+        "/api/chat/batch",
+        json={"queries": ["a", "b"], "stream": False, "retrieval_only": True, "doc_ids": ["doc-1"]},
+    )
+    assert response.status_code == 200
+    assert [r["index"] for r in response.json()["results"]] == [0, 1]
+    assert engine.calls == [(["a", "b"], True, SearchScope(doc_ids=("doc-1",)))]
+    # Retrieval-only batches run a single pipeline
+    assert admission.weights == [1] and admission.active == 0
+
+
+def test_weight_is_capped_at_the_generation_concurrency(engine, admission, client):
+    queries = [f"q{i}" for i in range(main.BATCH_GENERATION_CONCURRENCY + 5)]
+    client.post("/api/chat/batch", json={"queries": queries, "stream": False})
+    assert admission.weights == [main.BATCH_GENERATION_CONCURRENCY]
+
+
+@pytest.mark.parametrize(
+    "queries",
+    [[], ["ok", "  "], ["q"] * (main.BATCH_MAX_QUERIES + 1)],
+)
+def test_invalid_batches_are_rejected(queries, engine, admission, client):
+    response = client.post("/api/chat/batch", json={"queries": queries})
+    assert response.status_code == 400
+    assert not engine.calls and not admission.weights
+
+
+def test_errors_are_reported_and_free_the_slot(monkeypatch, admission, client):
+    monkeypatch.setattr(main, "rag_engine", FakeEngine(fail_after=1))
+    response = client.post("/api/chat/batch", json={"queries": ["a", "b", "c"]})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["index"] == 2 and "error" in lines[-1]
+    assert admission.active == 0
+
+    response = client.post("/api/chat/batch", json={"queries": ["a", "b"], "stream": False})
+    assert response.status_code == 500
+    assert admission.active == 0
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from src.chunk_store import CURRENT_FILE, ChunkStore, ChunkStoreLoader, ChunkStoreWriter, publish_chunk_store
+
+POINTS = [
+    (7, {"text": "Zero moment point", "title": "Balance", "chapter_path": "control/zmp"}),
+    (3, {"text": "Nœuds ROS 2 — topics", "title": "ROS 2", "chapter_path": "fundamentals/ros2"}),
+    (42, {"text": "", "title": "Empty", "chapter_path": "misc"}),
+]
+
+
+def test_round_trip_by_row_and_id(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    for point_id, payload in POINTS:
+        writer.add(point_id, payload)
+    assert writer.close() == len(POINTS)
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == len(POINTS)
+    assert list(store) == [payload for _, payload in POINTS]
+    assert store.get(3) == POINTS[1][1]
+    assert store.get_many([42, 999, 7]) == [POINTS[2][1], None, POINTS[0][1]]
+    assert store.rows_for([7, 3, 5]).tolist() == [0, 1, -1]
+
+
+def test_empty_store(tmp_path):
+    ChunkStoreWriter(str(tmp_path)).close()
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 0
+    assert store.get(1) is None
+
+
+def test_truncated_blob_is_rejected(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    for point_id, payload in POINTS:
+        writer.add(point_id, payload)
+    writer.close()
+    with open(tmp_path / "chunks.bin", "r+b") as f:
+        f.truncate(5)
+    with pytest.raises(ValueError):
+        ChunkStore(str(tmp_path))
+
+
+def test_loader_follows_published_versions(tmp_path):
+    base_dir = str(tmp_path)
+    loader = ChunkStoreLoader(base_dir, reload_interval=0)
+    assert loader.current() is None
+
+    publish_chunk_store(base_dir, POINTS[:1])
+    first = loader.current()
+    assert len(first) == 1 and first.get(7)["title"] == "Balance"
+
+    publish_chunk_store(base_dir, POINTS)
+    second = loader.current()
+    assert second is not first and len(second) == len(POINTS)
+
+    # A broken new version keeps the current store
+    with open(os.path.join(base_dir, CURRENT_FILE), "w", encoding="utf-8") as f:
+        f.write("missing-version")
+    assert loader.current() is second
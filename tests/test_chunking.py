@@ -0,0 +1,73 @@
+import glob
+import os
+import random
+import re
+from typing import List
+
+import pytest
+
+from src.chunking import chunk_text, extract_markdown_content
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docusaurus", "docs")
+
+
+def baseline_chunk_text(text: str, chunk_size: int = 700, overlap: int = 100) -> List[str]:
+    """The original sentence-accumulating chunker that existing point IDs depend on."""
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    for sentence in sentences:
+        sentence_length = len(sentence.split())
+        if current_length + sentence_length <= chunk_size:
+            current_chunk.append(sentence)
+            current_length += sentence_length
+        else:
+            if current_chunk:
+                chunks.append(" ".join(current_chunk))
+            if overlap > 0 and current_chunk:
+                words = " ".join(current_chunk).split()
+                overlap_text = " ".join(words[-overlap:] if len(words) > overlap else words)
+                current_chunk = [overlap_text, sentence]
+                current_length = len(overlap_text.split()) + sentence_length
+            else:
+                current_chunk = [sentence]
+                current_length = sentence_length
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks if chunks else [text]
+
+
+def generated_corpus() -> List[str]:
+    rng = random.Random(16)
+    vocabulary = ["robot", "joint", "torque", "gait", "sensor", "ZMP", "balance", "actuator", "model"]
+    texts = []
+    for _ in range(20):
+        sentences = []
+        for _ in range(rng.randint(1, 120)):
+            length = rng.choice([1, 3, 8, 15, 40, 150, 800])
+            words = [rng.choice(vocabulary) for _ in range(length)]
+            sentences.append(" ".join(words) + rng.choice([".", "!", "?"]))
+        separators = [rng.choice([" ", "\n", "\n\n  ", "\t"]) for _ in sentences]
+        texts.append("".join(s + sep for s, sep in zip(sentences, separators)))
+    return texts + ["", "   ", "No sentence break at all", "One. Two!  Three?\nFour."]
+
+
+CORPUS = generated_corpus() + [
+    extract_markdown_content(path)["text"]
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "**", "*.md"), recursive=True))
+]
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(700, 100), (50, 10), (20, 0), (30, 30)])
+def test_matches_the_baseline_chunker(chunk_size, overlap):
+    for text in CORPUS:
+        assert chunk_text(text, chunk_size, overlap) == baseline_chunk_text(text, chunk_size, overlap)
+
+
+def test_strict_mode_caps_chunk_length():
+    text = " ".join(["word"] * 500) + ". Short sentence here."
+    chunks = chunk_text(text, chunk_size=100, overlap=20, strict=True)
+    assert all(len(chunk.split()) <= 100 for chunk in chunks)
+    assert chunks[-1].endswith("Short sentence here.")
+    assert len(chunk_text(text, chunk_size=100, overlap=20)[0].split()) > 100
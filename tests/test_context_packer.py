@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from src.context_packer import estimate_tokens, pack_context, pack_history
+
+WORDS = [f"w{i}" for i in range(40)]
+
+
+def hit(text: str, score: float, doc_id: str = "doc", chunk_number: int = 0):
+    return SimpleNamespace(
+        score=score, payload={"text": text, "doc_id": doc_id, "chunk_number": chunk_number}
+    )
+
+
+def test_adjacent_chunks_are_merged_without_their_overlap():
+    first = hit(" ".join(WORDS[:25]), 0.5, chunk_number=3)
+    second = hit(" ".join(WORDS[15:]), 0.9, chunk_number=4)
+    packed = pack_context([second, first])
+    assert packed.texts == [" ".join(WORDS)]
+    assert packed.hits == [first, second]
+    assert packed.tokens == estimate_tokens(packed.texts[0])
+
+
+def test_non_adjacent_or_short_overlaps_stay_separate():
+    first = hit(" ".join(WORDS[:25]), 0.5, chunk_number=1)
+    gap = hit(" ".join(WORDS[15:]), 0.9, chunk_number=3)
+    assert len(pack_context([first, gap]).texts) == 2
+
+    # A match shorter than MIN_OVERLAP_WORDS is coincidence, not overlap
+    coincidence = hit(" ".join(WORDS[22:]), 0.9, chunk_number=2)
+    assert len(pack_context([first, coincidence]).texts) == 2
+
+
+def test_other_documents_are_not_merged_and_duplicates_are_dropped():
+    text = " ".join(WORDS[:25])
+    hits = [
+        hit(text, 0.4, doc_id="a"),
+        hit(text, 0.8, doc_id="b"),
+        hit(" ".join(WORDS[15:]), 0.6, doc_id="b", chunk_number=5),
+        hit("", 0.99, doc_id="c"),
+    ]
+    packed = pack_context(hits)
+    assert packed.texts == [text, " ".join(WORDS[15:])]
+    assert [h.payload["doc_id"] for h in packed.hits] == ["b", "b"]
+
+
+def test_segments_are_added_best_first_within_the_budget():
+    big = "x" * 400  # 100 tokens
+    small = "y" * 40  # 10 tokens
+    hits = [
+        hit(small, 0.1, doc_id="small"),
+        hit(big, 0.9, doc_id="big"),
+        hit(big.replace("x", "z"), 0.5, doc_id="big2"),
+    ]
+    packed = pack_context(hits, token_budget=115)
+    assert packed.texts == [big, small]
+    assert packed.tokens == 110
+
+
+def test_best_segment_is_truncated_when_nothing_fits():
+    words = " ".join(["word"] * 200)
+    packed = pack_context([hit(words, 0.9)], token_budget=50)
+    assert len(packed.texts) == 1 and packed.texts[0].endswith("...")
+    assert packed.tokens <= 50
+
+
+def test_history_keeps_the_latest_turns_within_budget():
+    history = [{"user": f"q{i}", "ai": "a" * 40} for i in range(5)]
+    assert pack_history(history, token_budget=25) == history[-2:]
+
+    long_turn = [{"user": "why?", "ai": " ".join(["because"] * 100)}]
+    packed = pack_history(long_turn, token_budget=20)
+    assert packed[0]["user"] == "why?" and packed[0]["ai"].endswith("...")
+    assert estimate_tokens(packed[0]["ai"]) <= 19
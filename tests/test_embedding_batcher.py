@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from src.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEmbedder:
+    """Records each upstream call; calls block until `release` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        await self.release.wait()
+        return [[float(len(text))] for text in texts]
+
+
+def test_single_request_is_sent_immediately():
+    async def scenario():
+        embedder = FakeEmbedder()
+        embedder.release.set()
+        batcher = EmbeddingBatcher(embedder, window_ms=10_000)
+        assert await batcher.embed("abc") == [3.0]
+        assert embedder.calls == [["abc"]]
+
+    asyncio.run(scenario())
+
+
+def test_requests_queued_behind_a_batch_share_one_call():
+    async def scenario():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_ms=10_000)
+        first = asyncio.create_task(batcher.embed("a"))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(batcher.embed(t)) for t in ("bb", "ccc", "bb")]
+        await asyncio.sleep(0)
+        assert batcher.stats()["pending"] == 3
+
+        # The queued texts go out as soon as the in-flight batch finishes,
+        # without waiting for the window; duplicates are embedded once.
+        embedder.release.set()
+        assert await first == [1.0]
+        assert await asyncio.gather(*rest) == [[2.0], [3.0], [2.0]]
+        assert embedder.calls == [["a"], ["bb", "ccc"]]
+        stats = batcher.stats()
+        assert stats["requests"] == 4 and stats["batches"] == 2
+        assert stats["pending"] == 0 and stats["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def scenario():
+        embedder = FakeEmbedder()
+        embedder.release.set()
+        batcher = EmbeddingBatcher(embedder, window_ms=10_000, max_batch_size=2)
+        results = await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 6)))
+        assert results == [[float(n)] for n in range(1, 6)]
+        assert all(len(call) <= 2 for call in embedder.calls)
+        assert sum(len(call) for call in embedder.calls) == 5
+
+    asyncio.run(scenario())
+
+
+def test_upstream_errors_reach_every_caller():
+    async def scenario():
+        async def broken(texts):
+            return [[0.0]]
+
+        batcher = EmbeddingBatcher(broken, window_ms=10_000)
+        first = asyncio.create_task(batcher.embed("a"))
+        others = [asyncio.create_task(batcher.embed(t)) for t in ("b", "c")]
+        assert await first == [0.0]
+        for task in others:
+            with pytest.raises(ValueError):
+                await task
+        assert batcher.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_callers_are_dropped_from_the_batch():
+    async def scenario():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_ms=10_000)
+        first = asyncio.create_task(batcher.embed("a"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(batcher.embed("gone"))
+        kept = asyncio.create_task(batcher.embed("kept"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+
+        embedder.release.set()
+        assert await first == [1.0] and await kept == [4.0]
+        assert cancelled.cancelled()
+        assert embedder.calls == [["a"], ["kept"]]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_send_does_not_leave_callers_waiting():
+    async def scenario():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_ms=10_000)
+        caller = asyncio.create_task(batcher.embed("a"))
+        await asyncio.sleep(0)
+        for task in list(batcher._tasks):
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, timeout=1)
+        assert batcher.stats()["in_flight"] == 0 and not batcher._tasks
+
+    asyncio.run(scenario())
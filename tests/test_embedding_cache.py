@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import numpy as np
+
+import src.embedding_cache as embedding_cache
+from src.embedding_cache import EmbeddingCache
+from src.embedding_store import EmbeddingStore
+
+
+def vector(value: float, dim: int = 4) -> np.ndarray:
+    return np.full(dim, value, dtype=np.float32)
+
+
+def test_normalized_queries_share_an_entry():
+    cache = EmbeddingCache("model", disk_path=None)
+    stored = cache.put("  What is  ZMP? ", [1.0, 2.0])
+    assert stored.dtype == np.float32 and not stored.flags.writeable
+    assert cache.get("what is zmp?") is stored
+    assert cache.get("something else") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache("model", max_items=2, disk_path=None)
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    cache.get("a")
+    cache.put("c", vector(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_entries():
+    entry_bytes = vector(0, 64).nbytes + len("q0") + embedding_cache._ENTRY_OVERHEAD_BYTES
+    cache = EmbeddingCache("model", max_bytes=2 * entry_bytes, disk_path=None)
+    for i in range(3):
+        cache.put(f"q{i}", vector(i, 64))
+    assert cache.stats()["items"] == 2 and cache.stats()["bytes"] <= 2 * entry_bytes
+    assert cache.get("q0") is None
+
+    cache.put("huge", vector(0, 10_000))
+    assert cache.get("huge") is None and cache.stats()["items"] == 2
+
+
+def test_entries_expire_after_the_ttl():
+    cache = EmbeddingCache("model", ttl_seconds=0.01, disk_path=None)
+    cache.put("q", vector(1))
+    assert cache.contains("q")
+    time.sleep(0.02)
+    assert not cache.contains("q")
+    assert cache.get("q") is None and cache.stats()["items"] == 0
+
+
+def test_disk_tier_is_written_behind_and_read_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_FLUSH_INTERVAL_SECONDS", 0.01)
+    path = str(tmp_path / "cache.sqlite")
+
+    async def scenario():
+        cache = EmbeddingCache("model", disk_path=path)
+        for i in range(5):
+            cache.put(f"q{i}", vector(i))
+        assert cache.stats()["pending_writes"] == 5
+
+        # Pending entries are served before they reach the disk
+        cache.clear()
+        assert (await cache.aget("q1"))[0] == 1
+        await asyncio.sleep(0.1)
+        assert cache.stats()["pending_writes"] == 0
+
+        cache.clear()
+        found = await cache.aget_many(["q0", "missing", "q4"])
+        assert [None if v is None else float(v[0]) for v in found] == [0.0, None, 4.0]
+        assert cache.stats()["disk_hits"] == 3
+
+        # close() writes what is still pending
+        cache.put("late", vector(7))
+        cache.close()
+
+    asyncio.run(scenario())
+
+    reopened = EmbeddingCache("model", disk_path=path)
+    assert reopened.get("late")[0] == 7
+    reopened.close()
+    store = EmbeddingStore(path)
+    assert store.stats()[0]["entries"] == 6
+    store.close()
+
+
+def test_disk_entries_older_than_the_ttl_are_ignored(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache("model", disk_path=path)
+    cache.put("q", vector(1))  # no running loop: written through
+    cache.close()
+
+    expired = EmbeddingCache("model", ttl_seconds=0.0, disk_path=path)
+    time.sleep(0.01)
+    assert asyncio.run(expired.aget("q")) is None
+    expired.close()
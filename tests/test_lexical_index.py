@@ -0,0 +1,67 @@
+import numpy as np
+
+from src.lexical_index import BM25Builder, BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    "The zero moment point keeps a biped robot balanced while walking.",
+    "ROS 2 nodes communicate over topics, services and actions.",
+    "Inverse kinematics computes joint angles for a desired end effector pose.",
+    "Walking robots use the zero moment point and the center of mass.",
+]
+
+
+def build(docs=DOCS) -> BM25Index:
+    builder = BM25Builder()
+    for doc in docs:
+        builder.add(doc)
+    return builder.build()
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the Zero-Moment Point?") == ["zero", "moment", "point"]
+
+
+def test_search_ranks_matching_documents():
+    index = build()
+    results = index.search("zero moment point walking", limit=10)
+    assert [row for row, _ in results][:2] in ([0, 3], [3, 0])
+    assert all(score > 0 for _, score in results)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+    assert index.search("quaternion") == []
+    assert len(index.search("robot walking zero", limit=1)) == 1
+
+
+def test_rarer_terms_weigh_more():
+    index = build()
+    # "kinematics" occurs in a single document
+    (best, _), = index.search("kinematics", limit=1)
+    assert best == 2
+
+
+def test_search_restricted_to_rows():
+    index = build()
+    results = index.search("zero moment point", rows=np.array([3, 1]))
+    assert [row for row, _ in results] == [3]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    path = str(tmp_path / "bm25.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.n_docs == index.n_docs
+    assert loaded.search("ros 2 topics") == index.search("ros 2 topics")
+
+
+def test_empty_index():
+    assert build([]).search("anything") == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    # "b" is ranked well by both lists
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("a") < fused.index("d") < fused.index("c")
+    assert reciprocal_rank_fusion([]) == []
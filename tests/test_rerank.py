@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.rerank import mmr_rerank, mmr_select, relevance_filter
+
+
+def hit(score: float, vector=None, name: str = ""):
+    return SimpleNamespace(score=score, vector=vector, name=name)
+
+
+def naive_mmr(relevance, vectors, k, lambda_):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    selected = []
+    while len(selected) < min(k, len(relevance)):
+        best, best_gain = None, -np.inf
+        for i in range(len(relevance)):
+            if i in selected:
+                continue
+            redundancy = max((float(unit[i] @ unit[j]) for j in selected), default=0.0)
+            gain = lambda_ * relevance[i] - (1 - lambda_) * redundancy if selected else lambda_ * relevance[i]
+            if gain > best_gain:
+                best, best_gain = i, gain
+        selected.append(best)
+    return selected
+
+
+def test_relevance_filter_applies_absolute_and_relative_cutoffs():
+    hits = [hit(0.9, name="a"), hit(0.5, name="b"), hit(0.6, name="c"), hit(0.8, name="d")]
+    assert [h.name for h in relevance_filter(hits, threshold=0.5)] == ["a", "c", "d"]
+    assert [h.name for h in relevance_filter(hits, threshold=0.5, relative_cutoff=0.85)] == ["a", "d"]
+    assert relevance_filter([], threshold=0.5) == []
+    assert relevance_filter([hit(0.4)], threshold=0.5) == []
+
+
+def test_mmr_skips_near_duplicates():
+    relevance = np.array([0.9, 0.89, 0.7])
+    vectors = np.array([[1.0, 0.0], [0.999, 0.01], [0.0, 1.0]])
+    assert mmr_select(relevance, vectors, k=2, lambda_=0.7) == [0, 2]
+    # lambda 1.0 ranks by relevance alone
+    assert mmr_select(relevance, vectors, k=3, lambda_=1.0) == [0, 1, 2]
+
+
+def test_mmr_matches_the_textbook_definition():
+    rng = np.random.default_rng(23)
+    for _ in range(20):
+        n = int(rng.integers(1, 15))
+        relevance = rng.random(n)
+        vectors = rng.normal(size=(n, 8))
+        for lambda_ in (0.0, 0.5, 0.7):
+            assert mmr_select(relevance, vectors, 5, lambda_) == naive_mmr(relevance, vectors, 5, lambda_)
+
+
+def test_mmr_handles_edge_cases():
+    assert mmr_select(np.array([]), np.zeros((0, 2)), k=3) == []
+    assert mmr_select(np.array([0.5, 0.6]), np.zeros((2, 2)), k=5) == [1, 0]
+    assert mmr_select(np.array([0.5]), np.ones((1, 2)), k=0) == []
+
+
+def test_mmr_rerank_falls_back_to_scores_without_vectors():
+    with_vectors = [hit(0.9, [1.0, 0.0], "a"), hit(0.89, [1.0, 0.001], "b"), hit(0.7, [0.0, 1.0], "c")]
+    assert [h.name for h in mmr_rerank(with_vectors, k=2, lambda_=0.7)] == ["a", "c"]
+
+    missing = with_vectors[:2] + [hit(0.95, None, "d")]
+    assert [h.name for h in mmr_rerank(missing, k=2)] == ["d", "a"]
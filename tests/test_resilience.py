@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    hedged,
+    is_dependency_failure,
+    remaining_budget,
+    request_deadline,
+    stage_timeout,
+)
+
+
+async def fail():
+    raise ConnectionError("down")
+
+
+async def succeed():
+    return "ok"
+
+
+def test_breaker_opens_after_consecutive_failures():
+    async def scenario():
+        breaker = CircuitBreaker("test-open", failure_threshold=2, recovery_seconds=60)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(fail)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(succeed)
+        assert breaker.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_one_trial_and_closes_on_success():
+    async def scenario():
+        breaker = CircuitBreaker("test-half-open", failure_threshold=1, recovery_seconds=0.01)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        await asyncio.sleep(0.02)
+
+        assert breaker.allow() and breaker.state == "half_open"
+        # Only one trial at a time
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_and_cancelled_trial_frees_the_slot():
+    async def scenario():
+        breaker = CircuitBreaker("test-trial", failure_threshold=1, recovery_seconds=0.01)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        await asyncio.sleep(0.02)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.02)
+        trial = asyncio.create_task(breaker.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # Cancellation is not a failure, and the next call may be the trial
+        assert breaker.state == "half_open"
+        assert await breaker.call(succeed) == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_only_dependency_failures_count():
+    assert is_dependency_failure(asyncio.TimeoutError())
+    assert is_dependency_failure(ConnectionError())
+    assert is_dependency_failure(StatusError(503)) and is_dependency_failure(StatusError(429))
+    assert not is_dependency_failure(StatusError(400)) and not is_dependency_failure(StatusError(401))
+    assert not is_dependency_failure(ValueError("bug on our side"))
+
+    async def scenario():
+        breaker = CircuitBreaker("test-client-errors", failure_threshold=1, recovery_seconds=60)
+
+        async def bad_request():
+            raise StatusError(400)
+
+        for _ in range(3):
+            with pytest.raises(StatusError):
+                await breaker.call(bad_request)
+        assert breaker.state == "closed" and breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_timeouts_count_as_failures():
+    async def scenario():
+        breaker = CircuitBreaker("test-timeout", failure_threshold=1, recovery_seconds=60)
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1), timeout=0.01)
+        assert breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_stage_timeout_is_capped_by_the_request_deadline():
+    assert remaining_budget() is None
+    assert stage_timeout(3) == 3
+    with request_deadline(1.0):
+        assert stage_timeout(3) <= 1.0
+        # A nested scope never extends the outer deadline
+        with request_deadline(10.0):
+            assert remaining_budget() <= 1.0
+        assert stage_timeout(0.5) == 0.5
+    assert remaining_budget() is None
+
+
+def test_hedged_returns_the_first_success():
+    async def scenario():
+        calls = []
+
+        async def call():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+                return "slow"
+            return "fast"
+
+        hedges = []
+        result = await asyncio.wait_for(hedged(call, delay=0.01, on_hedge=lambda: hedges.append(1)), 1)
+        assert result == "fast" and len(calls) == 2 and hedges == [1]
+
+        # Finishing within the delay sends no second request
+        assert await hedged(succeed, delay=1) == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from src.local_index import LocalSnapshot
+from src.qdrant_backend import scope_filter
+from src.vector_db import SearchScope
+
+PAYLOADS = [
+    {"doc_id": "kinematics", "chapter_path": "fundamentals/kinematics"},
+    {"doc_id": "kinematics", "chapter_path": "fundamentals/kinematics"},
+    {"doc_id": "sensors", "chapter_path": "fundamentals/sensors"},
+    {"doc_id": "glossary", "chapter_path": "resources/glossary"},
+    {},
+]
+
+
+def test_create_normalizes_and_drops_empty_scopes():
+    scope = SearchScope.create(["b", "a", "b"], None)
+    assert scope == SearchScope(doc_ids=("a", "b"))
+    assert scope == SearchScope.create(["a", "b"], [])
+    assert hash(scope) == hash(SearchScope.create(["a", "b"]))
+    assert SearchScope.create() is None
+    assert SearchScope.create([], []) is None
+
+
+def test_conditions_list_only_restricted_fields():
+    assert SearchScope(doc_ids=("a",)).conditions() == {"doc_id": ("a",)}
+    assert SearchScope(("a",), ("x", "y")).conditions() == {"doc_id": ("a",), "chapter_path": ("x", "y")}
+
+
+def test_scope_filter_builds_match_any_conditions():
+    assert scope_filter(None) is None
+    query_filter = scope_filter(SearchScope(("a", "b"), ("x",)))
+    assert [(c.key, c.match.any) for c in query_filter.must] == [("doc_id", ["a", "b"]), ("chapter_path", ["x"])]
+
+
+def test_scope_filter_restricts_a_qdrant_search():
+    client = QdrantClient(":memory:")
+    client.create_collection("scope", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    client.upsert(
+        "scope",
+        points=[
+            models.PointStruct(id=i, vector=[1.0, float(i)], payload=payload)
+            for i, payload in enumerate(PAYLOADS)
+        ],
+    )
+
+    def search(scope):
+        response = client.query_points("scope", query=[1.0, 0.0], query_filter=scope_filter(scope), limit=10)
+        return sorted(point.id for point in response.points)
+
+    assert search(None) == [0, 1, 2, 3, 4]
+    assert search(SearchScope.create(["kinematics", "glossary"])) == [0, 1, 3]
+    assert search(SearchScope.create(["kinematics", "sensors"], ["fundamentals/sensors"])) == [2]
+    assert search(SearchScope.create(["missing"])) == []
+
+
+def test_local_snapshot_scope_rows_match_the_qdrant_semantics():
+    snapshot = LocalSnapshot("v1", {}, np.zeros((len(PAYLOADS), 2), dtype=np.float32),
+                             np.arange(len(PAYLOADS)), PAYLOADS)
+    assert snapshot.scope_rows(None) is None
+    assert snapshot.scope_rows(SearchScope.create(["kinematics", "glossary"])).tolist() == [0, 1, 3]
+    assert snapshot.scope_rows(SearchScope.create(["kinematics", "sensors"], ["fundamentals/sensors"])).tolist() == [2]
+    assert snapshot.scope_rows(SearchScope.create(["missing"])).tolist() == []
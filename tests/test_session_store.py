@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import src.session_store as session_store
+from src.session_store import SessionStore, SQLiteSessionBackend, extractive_summary
+
+LONG_ANSWER = "a" * 400  # 100 tokens
+
+
+def test_sync_compaction_folds_old_turns_into_an_extractive_summary():
+    store = SessionStore(backend=None, compact_threshold_tokens=250, keep_recent_turns=1)
+    session = store.create()
+    for i in range(3):
+        store.append_turn(session, f"question {i}", LONG_ANSWER)
+    assert len(session.turns) == 1 and session.turns[0]["user"] == "question 2"
+    assert "User asked: question 0" in session.summary
+    assert "User asked: question 1" in session.summary
+    assert store.stats()["compactions"] == 1
+
+
+def test_summarizer_output_replaces_the_folded_turns():
+    calls = []
+
+    async def summarizer(previous, turns):
+        calls.append((previous, [t["user"] for t in turns]))
+        return "  talked about walking  "
+
+    async def scenario():
+        store = SessionStore(
+            backend=None, summarizer=summarizer, compact_threshold_tokens=250, keep_recent_turns=2
+        )
+        session = store.create()
+        for i in range(3):
+            store.append_turn(session, f"q{i}", LONG_ANSWER)
+        await asyncio.gather(*store._tasks)
+        return session
+
+    session = asyncio.run(scenario())
+    assert calls == [("", ["q0"])]
+    assert session.summary == "talked about walking"
+    assert [t["user"] for t in session.turns] == ["q1", "q2"]
+
+
+def test_failing_summarizer_falls_back_to_extractive():
+    async def summarizer(previous, turns):
+        raise RuntimeError("LLM down")
+
+    async def scenario():
+        store = SessionStore(
+            backend=None, summarizer=summarizer, compact_threshold_tokens=150, keep_recent_turns=1
+        )
+        session = store.create()
+        store.append_turn(session, "q0", LONG_ANSWER)
+        store.append_turn(session, "q1", LONG_ANSWER)
+        await asyncio.gather(*store._tasks)
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.summary.startswith("- User asked: q0")
+
+
+def test_first_turn_of_a_seeded_session_does_not_compact():
+    store = SessionStore(backend=None, compact_threshold_tokens=150, keep_recent_turns=1)
+    session = store.create(chat_history=[{"user": "q0", "ai": LONG_ANSWER}])
+    assert session.seeded
+    store.append_turn(session, "q1", LONG_ANSWER)
+    assert len(session.turns) == 2 and not session.summary and not session.seeded
+
+    store.append_turn(session, "q2", LONG_ANSWER)
+    assert len(session.turns) == 1 and session.summary
+
+
+def test_extractive_summary_drops_the_oldest_lines_to_fit():
+    turns = [{"user": f"question {i}", "ai": "answer " * 50} for i in range(20)]
+    summary = extractive_summary("", turns, max_tokens=100)
+    assert len(summary) <= 400
+    assert "question 19" in summary and "question 0 " not in summary
+
+
+def test_sessions_persist_across_stores(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    store = SessionStore(backend=SQLiteSessionBackend(path))
+    session = store.create()
+    store.append_turn(session, "hello", "hi there")
+    store.close()
+
+    reopened = SessionStore(backend=SQLiteSessionBackend(path))
+    loaded = reopened.get(session.session_id)
+    assert loaded is not None and loaded.turns == [{"user": "hello", "ai": "hi there"}]
+    reopened.close()
+
+
+def test_changes_are_written_behind_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_FLUSH_INTERVAL_SECONDS", 0.01)
+    path = str(tmp_path / "sessions.sqlite")
+
+    async def scenario():
+        backend = SQLiteSessionBackend(path)
+        store = SessionStore(backend=backend, max_sessions=1)
+        session = store.create()
+        store.append_turn(session, "hello", "hi")
+        assert backend.load(session.session_id) is None
+        assert session.session_id in store._pending
+
+        # Evicted but not yet written: served from the pending snapshot
+        store.create()
+        loaded = await store.aget(session.session_id)
+        assert loaded.turns == [{"user": "hello", "ai": "hi"}]
+
+        await asyncio.sleep(0.1)
+        assert not store._pending
+        assert backend.load(session.session_id).turns == loaded.turns
+
+        store.delete(session.session_id)
+        await asyncio.sleep(0.1)
+        assert backend.load(session.session_id) is None
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_purge_removes_expired_sessions_from_memory_and_backend(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite"))
+    store = SessionStore(backend=backend, ttl_seconds=60)
+    old, fresh = store.create(), store.create()
+    old.updated_at = time.time() - 120
+    store._persist(old)
+
+    assert store.purge_expired() == 1
+    assert store.get(old.session_id) is None
+    assert backend.load(old.session_id) is None
+    assert store.get(fresh.session_id) is fresh
+    store.close()
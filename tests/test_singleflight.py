@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        single_flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"answer": 42}
+
+        results = await asyncio.gather(*(single_flight.do("key", work) for _ in range(5)))
+        assert len(calls) == 1 and all(result is results[0] for result in results)
+        assert single_flight.stats()["coalesced"] == 4
+
+        # Once finished, the key runs again
+        await single_flight.do("key", work)
+        assert len(calls) == 2 and single_flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_errors_and_timeouts_reach_every_waiter():
+    async def scenario():
+        single_flight = SingleFlight(timeout=0.01)
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(single_flight.do("error", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        results = await asyncio.gather(
+            *(single_flight.do("slow", lambda: asyncio.sleep(1)) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        assert single_flight.stats()["errors"] == 1 and single_flight.stats()["timeouts"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_per_call_timeout_overrides_the_default():
+    async def scenario():
+        single_flight = SingleFlight(timeout=10)
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await single_flight.do("short", work, timeout=0.01)
+        assert await single_flight.do("long", work) == "done"
+
+        # Followers join the leader's execution and its limit
+        leader = asyncio.create_task(single_flight.do("shared", work, timeout=0.01))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await single_flight.do("shared", work, timeout=10)
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_leader_cancellation_does_not_fail_other_waiters():
+    async def scenario():
+        single_flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        leader = asyncio.create_task(single_flight.do("key", work))
+        follower = asyncio.create_task(single_flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await asyncio.wait_for(follower, 1) == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_execution_releases_waiters():
+    async def scenario():
+        single_flight = SingleFlight()
+        waiters = [asyncio.create_task(single_flight.do("key", lambda: asyncio.sleep(10))) for _ in range(3)]
+        await asyncio.sleep(0)
+        for task in list(single_flight._tasks):
+            task.cancel()
+
+        results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert single_flight.stats()["in_flight"] == 0 and not single_flight._tasks
+
+    asyncio.run(scenario())